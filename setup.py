@@ -1,9 +1,27 @@
 """Setup for Metadata Validator."""
 
+from pathlib import Path
+
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 
 from validator import __author__, __title__, __version__
 
+
+class BuildWithSchemaPack(build_py):
+    """Build the package with the bundled schemas precompiled."""
+
+    def run(self) -> None:
+        """Copy the package and serialize the compiled schemas of the pack into the build."""
+        super().run()
+        try:
+            from validator.schema_pack import compile_pack
+        except ImportError:
+            # Build dependencies are missing, the pack is then compiled on first use instead
+            return
+        compile_pack(Path(self.build_lib) / "validator" / "schemas")
+
+
 with open("requirements.txt") as reqs:
     requirements = reqs.read().splitlines()
 
@@ -16,8 +34,14 @@ setup(
     author=__author__,  # Optional
     packages=find_packages(),
     include_package_data=True,
+    package_data={"validator": ["schemas/*.xsd"]},
+    cmdclass={"build_py": BuildWithSchemaPack},
     install_requires=requirements,
-    extras_require={"test": ["coverage==7.10.5", "pytest==8.4.1", "pytest-cov==6.2.1", "tox==4.28.4"]},
+    extras_require={
+        "zstd": ["zstandard"],
+        "lxml": ["lxml"],
+        "test": ["coverage==7.10.5", "pytest==8.4.1", "pytest-cov==6.2.1", "tox==4.28.4"],
+    },
     entry_points="""
         [console_scripts]
         xml-validate=validator.__main__:cli
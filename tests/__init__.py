@@ -0,0 +1,11 @@
+"""XML Validator tests."""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+# Keep the persistent caches written by the tests out of the user's cache directory
+if "XML_VALIDATE_CACHE_DIR" not in os.environ:
+    os.environ["XML_VALIDATE_CACHE_DIR"] = tempfile.mkdtemp(prefix="xml-validate-tests-")
+    atexit.register(shutil.rmtree, os.environ["XML_VALIDATE_CACHE_DIR"], ignore_errors=True)
@@ -0,0 +1,133 @@
+"""Batch validation tests."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.batch import expand_inputs, validate_many
+from validator.schema_cache import get_schema
+
+
+class TestBatchValidation(unittest.TestCase):
+    """Test for validating many XML files in one invocation."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Copy the submission test files into a temporary directory tree."""
+        self.runner = CliRunner()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / "nested").mkdir()
+        shutil.copy(self.TESTFILES_ROOT / "xml" / "SUBMISSION.xml", self.root / "a.xml")
+        shutil.copy(self.TESTFILES_ROOT / "xml" / "SUBMISSION.xml", self.root / "nested" / "b.xml")
+        (self.root / "notes.txt").write_text("not xml")
+        self.xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def test_single_file_is_not_batch(self):
+        """Test that a single path is validated in single file mode."""
+        documents, batch = expand_inputs([str(self.root / "a.xml")])
+
+        self.assertEqual(documents, [str(self.root / "a.xml")])
+        self.assertFalse(batch)
+
+    def test_expand_directory(self):
+        """Test that directories are searched recursively for XML files."""
+        documents, batch = expand_inputs([str(self.root)])
+
+        self.assertEqual(documents, [str(self.root / "a.xml"), str(self.root / "nested" / "b.xml")])
+        self.assertTrue(batch)
+
+    def test_expand_glob(self):
+        """Test that globs are expanded, including recursive ones."""
+        documents, batch = expand_inputs([str(self.root / "**" / "*.xml")])
+
+        self.assertEqual(documents, [str(self.root / "a.xml"), str(self.root / "nested" / "b.xml")])
+        self.assertTrue(batch)
+
+    def test_expand_listfile(self):
+        """Test that @listfile manifests are read line by line."""
+        manifest = self.root / "inputs.txt"
+        manifest.write_text(f"# submission files\n{self.root / 'a.xml'}\n\nhttp://example.com/c.xml\n")
+        documents, batch = expand_inputs([f"@{manifest}"])
+
+        self.assertEqual(documents, [str(self.root / "a.xml"), "http://example.com/c.xml"])
+        self.assertTrue(batch)
+
+    def test_cli_directory(self):
+        """Test validating a directory of valid XML files."""
+        result = self.runner.invoke(cli, [str(self.root), self.xsd])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn(f"{self.root / 'nested' / 'b.xml'}: valid\n", result.output)
+        self.assertIn("Validated 2 XML file(s): 2 valid, 0 invalid, 0 malformed, 0 failed.", result.output)
+
+    def test_cli_rejections_by_phase(self):
+        """Test that malformed files are rejected before schema validation and counted by phase."""
+        (self.root / "nested" / "c.xml").write_text("<SUBMISSION_SET>\n  <SUBMISSION>\n</SUBMISSION_SET>\n")
+        shutil.copy(self.TESTFILES_ROOT / "xml" / "invalid_SUBMISSION.xml", self.root / "d.xml")
+        result = self.runner.invoke(cli, ["-v", "-j", "1", str(self.root), self.xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(f"{self.root / 'nested' / 'c.xml'}: malformed\nmismatched tag: line 3, column 2\n", result.output)
+        self.assertIn("Validated 4 XML file(s): 2 valid, 1 invalid, 1 malformed, 0 failed.", result.output)
+        self.assertIn("Rejected by the well-formedness check: 1, by schema validation: 1.", result.output)
+        self.assertIn("checking well-formedness:", result.output)
+
+    def test_cli_missing_file_in_batch(self):
+        """Test that a missing file fails the batch without stopping it."""
+        result = self.runner.invoke(cli, [str(self.root / "a.xml"), str(self.root / "missing.xml"), self.xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn(f"{self.root / 'missing.xml'}: unavailable\n", result.output)
+        self.assertIn("Validated 2 XML file(s): 1 valid, 0 invalid, 0 malformed, 1 failed.", result.output)
+
+    def test_cli_missing_listfile(self):
+        """Test that a missing @listfile is reported."""
+        result = self.runner.invoke(cli, [f"@{self.root / 'missing.txt'}", self.xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Error: Invalid value for XML_FILE", result.output)
+
+    def test_validate_many_in_worker_processes(self):
+        """Test that a process pool gives the same results in input order."""
+        documents = [str(self.root / "a.xml"), str(self.root / "missing.xml"), str(self.root / "nested" / "b.xml")]
+        schema = get_schema(self.xsd)
+        sequential = list(validate_many(documents, schema))
+        parallel = list(validate_many(documents, schema, jobs=2, ordered=True))
+
+        self.assertEqual(
+            [(result.source, result.status) for result in parallel],
+            [(result.source, result.status) for result in sequential],
+        )
+        self.assertEqual([result.status.value for result in parallel], ["valid", "unavailable", "valid"])
+
+    def test_cli_jobs_unordered(self):
+        """Test validating with several jobs in completion order."""
+        result = self.runner.invoke(cli, ["--jobs", "2", str(self.root), self.xsd])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn(f"{self.root / 'a.xml'}: valid\n", result.output)
+        self.assertIn(f"{self.root / 'nested' / 'b.xml'}: valid\n", result.output)
+
+    def test_cli_jobs_ordered(self):
+        """Test validating with several jobs in input order."""
+        manifest = self.root / "inputs.txt"
+        manifest.write_text("\n".join(str(self.root / name) for name in ["nested/b.xml", "a.xml", "nested/b.xml"]))
+        result = self.runner.invoke(cli, ["-j", "3", "--ordered", f"@{manifest}", self.xsd])
+
+        self.assertEqual(result.exit_code, 0)
+        lines = result.output.splitlines()[:3]
+        self.assertEqual(lines, [f"{self.root / name}: valid" for name in ["nested/b.xml", "a.xml", "nested/b.xml"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Compressed input tests."""
+
+import bz2
+import gzip
+import lzma
+import tempfile
+import threading
+import unittest
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.batch import expand_inputs
+from validator.compression import decompress, detect_compression, zstandard
+from validator.fetch import xmlFromURL
+
+COMPRESSORS = {"gzip": (".gz", gzip.compress), "bz2": (".bz2", bz2.compress), "xz": (".xz", lzma.compress)}
+if zstandard is not None:
+    COMPRESSORS["zstd"] = (".zst", zstandard.ZstdCompressor().compress)
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Serve files without logging requests."""
+
+    def log_message(self, format, *args):
+        """Silence request logging."""
+
+
+class TestCompressedInput(unittest.TestCase):
+    """Test for validating compressed XML files and URLs."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Write compressed copies of the test documents into a temporary directory."""
+        self.runner = CliRunner()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        for name in ("SUBMISSION.xml", "invalid_SUBMISSION.xml", "bad_syntax.xml"):
+            data = (self.TESTFILES_ROOT / "xml" / name).read_bytes()
+            for suffix, compress in COMPRESSORS.values():
+                (self.root / (name + suffix)).write_bytes(compress(data))
+
+    def tearDown(self):
+        """Remove the compressed copies."""
+        self.tmp.cleanup()
+
+    def test_detect_compression(self):
+        """Test that compressed data is recognised by its magic bytes."""
+        for compression, (_, compress) in COMPRESSORS.items():
+            self.assertEqual(detect_compression(compress(b"<a/>")), compression)
+            self.assertEqual(decompress(compress(b"<a/>"), compression), b"<a/>")
+        self.assertIsNone(detect_compression(b"<?xml version='1.0'?>"))
+
+    def test_cli_compressed_files(self):
+        """Test that compressed files give the same verdicts as uncompressed ones."""
+        for suffix, _ in COMPRESSORS.values():
+            for options in ([], ["--fail-fast"], ["--stream"]):
+                for name, verdict in [("SUBMISSION.xml", "valid"), ("invalid_SUBMISSION.xml", "invalid")]:
+                    with self.subTest(suffix=suffix, options=options, name=name):
+                        xml = (self.root / (name + suffix)).as_posix()
+                        result = self.runner.invoke(cli, [*options, xml, self.xsd])
+
+                        self.assertEqual(result.exit_code, 0)
+                        self.assertIn(f"is {verdict}.\n", result.output)
+
+    def test_cli_compressed_malformed(self):
+        """Test that a syntax error inside a compressed file is reported as malformed."""
+        xml = (self.root / "bad_syntax.xml.gz").as_posix()
+        result = self.runner.invoke(cli, [xml, self.xsd])
+
+        self.assertEqual(result.output, "Faulty XML or XSD file was given.\n\n")
+
+    def test_cli_corrupt_archive(self):
+        """Test that a truncated compressed file is reported as unreadable."""
+        xml = self.root / "SUBMISSION.xml.gz"
+        xml.write_bytes(xml.read_bytes()[:40])
+        result = self.runner.invoke(cli, [xml.as_posix(), self.xsd])
+
+        self.assertIn("cannot be read", result.output)
+
+    def test_directory_expansion(self):
+        """Test that compressed XML files are found when expanding a directory."""
+        documents, _ = expand_inputs([self.tmp.name])
+
+        self.assertIn((self.root / "SUBMISSION.xml.gz").as_posix(), documents)
+        self.assertIn((self.root / "SUBMISSION.xml.xz").as_posix(), documents)
+
+    def test_compressed_url(self):
+        """Test that a compressed document downloaded over HTTP is decompressed."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=self.tmp.name))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/SUBMISSION.xml.gz"
+            content, _ = xmlFromURL(url, "XML_FILE")
+            result = self.runner.invoke(cli, [url, self.xsd])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertIn("<SUBMISSION_SET", content)
+        self.assertIn("is valid.\n", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
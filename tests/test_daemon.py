@@ -0,0 +1,170 @@
+"""Validation daemon tests."""
+
+import os
+import subprocess  # nosec
+import sys
+import tempfile
+import time
+import unittest
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.daemon import ValidationServer, run_command
+from validator.fetch import configure_session, get_session
+from validator.ftp import get_pool
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+class TestDaemon(unittest.TestCase):
+    """Test for running command lines in a resident validation process."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a daemon in a separate process."""
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.socket = os.path.join(cls.tmp.name, "validator.sock")
+        cls.daemon = subprocess.Popen(  # nosec
+            [sys.executable, "-m", "validator", "serve", "--socket", cls.socket],
+            cwd=Path(__file__).parent.parent,
+            stdout=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while not os.path.exists(cls.socket) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the daemon."""
+        cls.daemon.terminate()
+        cls.daemon.wait(10)
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        """Set paths to test files."""
+        self.runner = CliRunner()
+        self.xml = (TESTFILES_ROOT / "xml" / "invalid_SUBMISSION.xml").as_posix()
+        self.xsd = (TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+
+    def test_same_output(self):
+        """Test that the daemon prints the same output as a command run in this process."""
+        local = self.runner.invoke(cli, ["-v", self.xml, self.xsd])
+        for _ in range(2):
+            remote = self.runner.invoke(cli, ["--daemon", self.socket, "-v", self.xml, self.xsd])
+
+            self.assertEqual(remote.exit_code, local.exit_code)
+            self.assertEqual(remote.output, local.output)
+
+    def test_relative_paths(self):
+        """Test that relative paths are resolved from the directory of the client."""
+        previous = os.getcwd()
+        os.chdir(TESTFILES_ROOT)
+        self.addCleanup(os.chdir, previous)
+        result = self.runner.invoke(cli, ["--daemon", self.socket, "xml/SAMPLE.xml", "schemas/SRA.sample.xsd"])
+
+        self.assertEqual(result.output, "The XML file: SAMPLE.xml\nis valid.\n\n")
+
+    def test_exit_code(self):
+        """Test that the exit code of a batch is returned by the client."""
+        valid = (TESTFILES_ROOT / "xml" / "SUBMISSION.xml").as_posix()
+        result = self.runner.invoke(cli, ["--daemon", self.socket, "-j", "1", valid, self.xml, self.xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Validated 2 XML file(s): 1 valid, 1 invalid", result.output)
+
+    def test_usage_error(self):
+        """Test that a usage error is reported from the daemon."""
+        result = self.runner.invoke(cli, ["--daemon", self.socket, "--bogus", self.xml, self.xsd])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("No such option: --bogus", result.output)
+
+    def test_daemon_equals_form(self):
+        """Test that the socket may be given as --daemon=PATH."""
+        local = self.runner.invoke(cli, ["-v", self.xml, self.xsd])
+        remote = self.runner.invoke(cli, [f"--daemon={self.socket}", "-v", self.xml, self.xsd])
+
+        self.assertEqual(remote.output, local.output)
+
+    def test_client_environment(self):
+        """Test that the schema directory is taken from the environment of the client."""
+        env = {"XML_VALIDATE_SCHEMA_DIR": (TESTFILES_ROOT / "schemas").as_posix()}
+        result = self.runner.invoke(cli, ["--daemon", self.socket, "-v", self.xml], env=env)
+
+        self.assertIn("Schema: SRA.submission.xsd", result.output)
+        result = self.runner.invoke(cli, ["--daemon", self.socket, self.xml], env={"XML_VALIDATE_SCHEMA_DIR": None})
+        self.assertEqual(result.exit_code, 2)
+
+    def test_other_commands_refused(self):
+        """Test that only validations are sent to the daemon."""
+        for args in [["serve", "--socket", self.socket], ["serve-http"], ["cache", "prune"]]:
+            with self.subTest(command=args[0]):
+                result = self.runner.invoke(cli, ["--daemon", self.socket, *args])
+
+                self.assertEqual(result.exit_code, 2)
+                self.assertIn(f"--daemon only runs the validate command, not {args[0]}.", result.output)
+
+    def test_other_commands_run_here_from_environment(self):
+        """Test that $XML_VALIDATE_DAEMON leaves other commands to the calling process."""
+        result = self.runner.invoke(
+            cli, ["cache", "prune", "--max-size", "1GB"], env={"XML_VALIDATE_DAEMON": self.socket}
+        )
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Removed", result.output)
+
+    def test_watch_runs_here(self):
+        """Test that --watch is run by the client, leaving the daemon free for later commands."""
+
+        def changes(watcher):
+            raise KeyboardInterrupt
+            yield
+
+        with patch("validator.watch.debounced", changes):
+            result = self.runner.invoke(cli, ["--daemon", self.socket, "--watch", self.xml, self.xsd])
+
+        self.assertIn("Watching 1 XML file(s)", result.output)
+        remote = self.runner.invoke(cli, ["--daemon", self.socket, self.xml, self.xsd])
+        self.assertIn("is invalid.", remote.output)
+
+    def test_watch_refused_in_daemon(self):
+        """Test that a watch request reaching the daemon is refused instead of blocking it."""
+        wfile = BytesIO()
+        request = {"args": ["validate", "--watch", self.xml, self.xsd], "cwd": os.getcwd(), "color": False}
+        code = run_command(cli, request, wfile)
+
+        self.assertEqual(code, 2)
+        self.assertIn(b"--watch cannot run in the validation daemon", wfile.getvalue())
+
+    def test_connections_kept_between_commands(self):
+        """Test that the HTTP session and FTP pool of the process serve all commands with the same settings."""
+        self.addCleanup(configure_session)
+        request = {"args": ["validate", self.xml, self.xsd], "cwd": os.getcwd(), "color": False}
+        run_command(cli, request, BytesIO())
+        session, pool = get_session(), get_pool()
+        run_command(cli, request, BytesIO())
+
+        self.assertIs(get_session(), session)
+        self.assertIs(get_pool(), pool)
+        run_command(cli, request | {"args": ["validate", "--http-pool-size", "2", self.xml, self.xsd]}, BytesIO())
+        self.assertIsNot(get_session(), session)
+
+    def test_second_daemon_refused(self):
+        """Test that a socket a daemon is listening on is not taken over."""
+        with self.assertRaises(OSError):
+            ValidationServer(self.socket, cli)
+
+    def test_daemon_unavailable(self):
+        """Test that a missing daemon is reported."""
+        result = self.runner.invoke(cli, ["--daemon", os.path.join(self.tmp.name, "missing.sock"), self.xml, self.xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Cannot use the validation daemon", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
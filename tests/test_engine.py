@@ -0,0 +1,105 @@
+"""Validation engine tests."""
+
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.engine import lxml_available, lxml_schema
+from validator.fetch import FetchedDocument
+from validator.schema_cache import SchemaCache
+from validator.validation import Status, ValidationOptions, validate_fetched
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+@unittest.skipUnless(lxml_available(), "lxml is not installed")
+class TestEngineConformance(unittest.TestCase):
+    """Test that xmlschema and libxml2 agree on the test files."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile the test schemas once."""
+        cache = SchemaCache()
+        cls.schemas = {
+            path.name: cache.get(path.as_posix(), persistent=False)
+            for path in sorted((TESTFILES_ROOT / "schemas").glob("*.xsd"))
+        }
+
+    def validate(self, xml: Path, schema, engine: str):
+        """Validate a test file against a schema with an engine."""
+        document = FetchedDocument(xml.name, xml.as_posix(), False)
+        return validate_fetched(document, schema, ValidationOptions(max_errors=10, engine=engine))
+
+    def test_engines_agree(self):
+        """Test that both engines give each test file the same status against every schema, in the same format."""
+        for xml in sorted((TESTFILES_ROOT / "xml").glob("*.xml")):
+            for schema_name, schema in self.schemas.items():
+                with self.subTest(xml=xml.name, schema=schema_name):
+                    self.assertIsNotNone(lxml_schema(schema))
+                    expected = self.validate(xml, schema, "xmlschema")
+                    result = self.validate(xml, schema, "lxml")
+
+                    self.assertEqual(result.status, expected.status)
+                    self.assertEqual(bool(result.errors), bool(expected.errors))
+                    if result.status is Status.INVALID:
+                        for error in [*expected.errors, *result.errors]:
+                            self.assertRegex(error, r"^failed validating /\S+.*:\n\nReason: .+\n$")
+
+    def test_downloaded_content(self):
+        """Test that libxml2 validates content downloaded from an URL."""
+        xml = TESTFILES_ROOT / "xml" / "SAMPLE.xml"
+        document = FetchedDocument("https://example.org/SAMPLE.xml", xml.read_text(), True)
+        result = validate_fetched(document, self.schemas["SRA.sample.xsd"], ValidationOptions(engine="lxml"))
+
+        self.assertIs(result.status, Status.VALID)
+
+    def test_schema_without_file_uses_xmlschema(self):
+        """Test that a schema compiled from downloaded text is left to xmlschema."""
+        xsd = TESTFILES_ROOT / "schemas" / "SRA.receipt.xsd"
+        schema = SchemaCache().get(xsd.read_text(), "https://example.org/SRA.receipt.xsd", persistent=False)
+        with patch("validator.validation.lxml_errors") as lxml_errors:
+            result = self.validate(TESTFILES_ROOT / "xml" / "SAMPLE.xml", schema, "lxml")
+
+        self.assertIsNone(lxml_schema(schema))
+        lxml_errors.assert_not_called()
+        self.assertIs(result.status, Status.INVALID)
+
+    def test_cli_engine(self):
+        """Test the engine option of the command line."""
+        xml = (TESTFILES_ROOT / "xml" / "invalid_SUBMISSION.xml").as_posix()
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        result = CliRunner().invoke(cli, ["--engine", "lxml", "--verbose", xml, xsd])
+
+        self.assertIn("is invalid.\n\nError:\nfailed validating /SUBMISSION_SET/SUBMISSION/ACTIONS/", result.output)
+        self.assertIn("(line 11):\n\nReason: Element 'FRACTION': This element is not expected.", result.output)
+
+
+class TestEngineOption(unittest.TestCase):
+    """Test for choosing the validation engine."""
+
+    def test_lxml_required(self):
+        """Test that the lxml engine is refused when lxml is not installed."""
+        xml = (TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        with patch("validator.__main__.lxml_available", return_value=False):
+            result = CliRunner().invoke(cli, ["--engine", "lxml", xml, xsd])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--engine lxml needs the lxml package", result.output)
+
+    def test_auto_without_lxml(self):
+        """Test that the auto engine validates with xmlschema when lxml is not installed."""
+        schema = SchemaCache().get((TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix(), persistent=False)
+        document = FetchedDocument("SAMPLE.xml", (TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix(), False)
+        with patch("validator.engine.lxml_available", return_value=False):
+            result = validate_fetched(document, schema, ValidationOptions(engine="auto"))
+            self.assertIsNone(lxml_schema(schema))
+
+        self.assertIs(result.status, Status.VALID)
+
+
+if __name__ == "__main__":
+    unittest.main()
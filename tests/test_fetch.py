@@ -0,0 +1,141 @@
+"""URL fetching tests."""
+
+import threading
+import unittest
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.fetch import configure_session, fetch_document, pool_stats, prefetch_documents, xmlFromURL
+
+
+class KeepAliveHandler(SimpleHTTPRequestHandler):
+    """Serve the test files over HTTP/1.1 with persistent connections."""
+
+    protocol_version = "HTTP/1.1"
+    extensions_map = {".xml": "application/xml", ".xsd": "application/xml"}
+
+    def log_message(self, format, *args):
+        """Silence request logging."""
+
+
+class TestHTTPConnectionPool(unittest.TestCase):
+    """Test for reusing HTTP connections across fetches."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a local HTTP server for the test files."""
+        handler = partial(KeepAliveHandler, directory=str(cls.TESTFILES_ROOT))
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local HTTP server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Start every test with a fresh session."""
+        configure_session(reset=True)
+
+    def test_connection_reused(self):
+        """Test that fetching many documents from one host reuses one connection."""
+        for _ in range(5):
+            content, _ = xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+            self.assertIn("<SAMPLE_SET>", content)
+        stats = pool_stats()
+
+        self.assertEqual(stats.hosts, 1)
+        self.assertEqual(stats.connections, 1)
+        self.assertEqual(stats.requests, 5)
+
+    def test_fetch_phases(self):
+        """Test that decoding a download is timed apart from fetching it."""
+        document = fetch_document(f"{self.base_url}/xml/SAMPLE.xml")
+
+        self.assertEqual(document.phases.phases(), ["fetch", "decode"])
+        self.assertLessEqual(document.phases.wall["fetch"] + document.phases.wall["decode"], document.fetch_time)
+
+    def test_no_stats_before_requests(self):
+        """Test that pool statistics are empty before anything is fetched."""
+        stats = pool_stats()
+
+        self.assertEqual((stats.hosts, stats.connections, stats.requests), (0, 0, 0))
+
+    def test_cli_verbose_pool_stats(self):
+        """Test that verbose output reports connection reuse for URL inputs."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        urls = [f"{self.base_url}/xml/SAMPLE.xml"] * 3
+        result = CliRunner().invoke(cli, ["-v", "-j", "1", "--fetch-workers", "0", "--http-pool-size", "2", *urls, xsd])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("HTTP connection pool: 3 request(s) over 1 connection(s) to 1 host(s).", result.output)
+
+    def test_streamed_document(self):
+        """Test that a streamed document is read from the network while validating."""
+        document = fetch_document(f"{self.base_url}/xml/SAMPLE.xml", stream=True)
+        with document.stream:
+            self.assertTrue(document.from_url)
+            self.assertEqual(document.stream.read(), (self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").read_bytes())
+
+        # The connection goes back to the pool once the stream is closed
+        fetch_document(f"{self.base_url}/xml/SAMPLE.xml", stream=True).stream.close()
+        self.assertEqual(pool_stats().connections, 1)
+
+    def test_streamed_document_errors(self):
+        """Test that HTTP errors are raised before a streamed document is returned."""
+        with self.assertRaises(Exception) as error:
+            fetch_document(f"{self.base_url}/xml/missing.xml", stream=True)
+        self.assertIn("404", str(error.exception))
+
+    def test_cli_streamed_url(self):
+        """Test validating a streamed URL in every validation mode."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        for options in ([], ["--fail-fast"], ["--stream"]):
+            with self.subTest(options=options):
+                result = CliRunner().invoke(cli, [*options, f"{self.base_url}/xml/SAMPLE.xml", xsd])
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn("is valid.\n", result.output)
+
+    def test_prefetch_documents(self):
+        """Test concurrent fetching with a per-host limit."""
+        urls = [f"{self.base_url}/xml/SAMPLE.xml"] * 6 + [f"{self.base_url}/xml/missing.xml"]
+        fetched = list(prefetch_documents(urls, workers=4, per_host=1, queue_size=2))
+        errors = [source for source, document in fetched if isinstance(document, Exception)]
+
+        self.assertEqual(len(fetched), 7)
+        self.assertEqual(errors, [f"{self.base_url}/xml/missing.xml"])
+        # A single connection at a time to the host is enough to serve every document
+        self.assertEqual(pool_stats().connections, 1)
+
+    def test_prefetch_stops_with_consumer(self):
+        """Test that fetching stops when the consumer stops reading."""
+        urls = [f"{self.base_url}/xml/SAMPLE.xml"] * 20
+        fetched = prefetch_documents(urls, workers=2, per_host=2, queue_size=1)
+        next(fetched)
+        fetched.close()
+
+        self.assertLess(pool_stats().requests, 20)
+
+    def test_cli_prefetch_ordered(self):
+        """Test validating URLs fetched concurrently, reported in input order."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        urls = [f"{self.base_url}/xml/SAMPLE.xml", f"{self.base_url}/xml/missing.xml"] * 3
+        result = CliRunner().invoke(cli, ["-v", "-j", "1", "--ordered", "--fetch-workers", "3", *urls, xsd])
+
+        self.assertEqual(result.exit_code, 1)
+        statuses = [line.rsplit(": ", 1)[1] for line in result.output.splitlines() if line.startswith(self.base_url)]
+        self.assertEqual(statuses, ["valid", "unavailable"] * 3)
+        self.assertIn("Time spent fetching:", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,245 @@
+"""FTP fetching tests."""
+
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.batch import expand_inputs
+from validator.fetch import fetch_document, xmlFromURL
+from validator.ftp import configure_ftp, ftp_pool_stats
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+class FTPHandler(socketserver.StreamRequestHandler):
+    """Serve the test files over a minimal anonymous FTP control connection."""
+
+    # Commands received by the server, over all connections
+    commands: list = []
+    # Bytes sent by each transfer before it is cut off, transfers beyond the list are complete
+    cut_after: list = []
+    # Close the control connection after each transfer, as a server timing out idle clients
+    drop_idle = False
+
+    def reply(self, line):
+        """Send a reply line."""
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        """Answer commands until the client quits."""
+        self.reply("220 Test FTP server")
+        data_listener = data_address = None
+        rest = 0
+        for raw in self.rfile:
+            command, _, argument = raw.decode("ascii").strip().partition(" ")
+            type(self).commands.append(f"{command} {argument}".strip())
+            path = TESTFILES_ROOT / argument.lstrip("/")
+            if command == "USER":
+                self.reply("331 Password required")
+            elif command in ("PASS", "TYPE", "NOOP"):
+                self.reply("230 OK" if command == "PASS" else "200 OK")
+            elif command == "SIZE":
+                self.reply(f"213 {path.stat().st_size}" if path.is_file() else "550 No such file")
+            elif command == "PASV":
+                data_listener = socket.create_server(("127.0.0.1", 0))
+                port = data_listener.getsockname()[1]
+                self.reply(f"227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 255})")
+            elif command == "PORT":
+                numbers = argument.split(",")
+                data_address = (".".join(numbers[:4]), int(numbers[4]) * 256 + int(numbers[5]))
+                self.reply("200 OK")
+            elif command == "REST":
+                rest = int(argument)
+                self.reply("350 Restarting")
+            elif command == "NLST":
+                self.reply("150 Opening data connection")
+                conn = data_listener.accept()[0] if data_listener else socket.create_connection(data_address)
+                with conn:
+                    conn.sendall("".join(f"{child.name}\r\n" for child in path.iterdir()).encode("ascii"))
+                self.reply("226 Transfer complete")
+                data_listener.close()
+                data_listener = None
+            elif command == "RETR":
+                if not path.is_file():
+                    self.reply("550 No such file")
+                    continue
+                self.reply("150 Opening data connection")
+                conn = data_listener.accept()[0] if data_listener else socket.create_connection(data_address)
+                body = path.read_bytes()[rest:]
+                cut = type(self).cut_after.pop(0) if type(self).cut_after else None
+                with conn:
+                    conn.sendall(body if cut is None else body[:cut])
+                self.reply("226 Transfer complete" if cut is None else "426 Transfer aborted")
+                if data_listener:
+                    data_listener.close()
+                data_listener = data_address = None
+                rest = 0
+                if self.drop_idle:
+                    return
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Not implemented")
+
+
+class TestFTPFetch(unittest.TestCase):
+    """Test for streaming and resuming FTP downloads."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a local FTP server for the test files."""
+        cls.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FTPHandler)
+        cls.server.daemon_threads = True
+        cls.base_url = f"ftp://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local FTP server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Reset the server and the FTP settings."""
+        FTPHandler.commands = []
+        FTPHandler.cut_after = []
+        FTPHandler.drop_idle = False
+        configure_ftp(reset=True)
+
+    def test_streamed_document(self):
+        """Test that an FTP document is read from the data connection while validating."""
+        document = fetch_document(f"{self.base_url}/xml/SAMPLE.xml", stream=True)
+        with document.stream:
+            self.assertTrue(document.from_url)
+            self.assertEqual(document.stream.read(), (TESTFILES_ROOT / "xml" / "SAMPLE.xml").read_bytes())
+        self.assertIn("PASV", FTPHandler.commands)
+
+    def test_resume_interrupted_transfer(self):
+        """Test that an interrupted transfer is resumed where it stopped."""
+        FTPHandler.cut_after = [1000, 2000]
+        content, _ = xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+
+        self.assertEqual(content, (TESTFILES_ROOT / "xml" / "SAMPLE.xml").read_text("UTF-8"))
+        self.assertEqual([cmd for cmd in FTPHandler.commands if cmd.startswith("REST")], ["REST 1000", "REST 3000"])
+
+    def test_retries_exhausted(self):
+        """Test that a transfer interrupted more often than allowed is reported."""
+        configure_ftp(retries=1)
+        FTPHandler.cut_after = [1000, 1000]
+
+        with self.assertRaises(OSError) as error:
+            xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+        self.assertIn("Download interrupted", str(error.exception))
+
+    def test_missing_file(self):
+        """Test that a missing FTP file is reported with the URL."""
+        with self.assertRaises(Exception) as error:
+            fetch_document(f"{self.base_url}/xml/missing.xml", stream=True)
+        self.assertIn("550 No such file", str(error.exception))
+
+    def test_cli_active_mode(self):
+        """Test validating an FTP URL in active mode with a small block size."""
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        url = f"{self.base_url}/xml/SAMPLE.xml"
+        result = CliRunner().invoke(cli, ["--ftp-active", "--ftp-block-size", "1K", url, xsd])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("is valid.\n", result.output)
+        self.assertTrue(any(cmd.startswith("PORT") for cmd in FTPHandler.commands))
+
+    def test_connection_reused(self):
+        """Test that downloads from one host share one logged-in connection."""
+        for _ in range(3):
+            xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+        stats = ftp_pool_stats()
+
+        self.assertEqual((stats.hosts, stats.connections, stats.transfers), (1, 1, 3))
+        self.assertEqual(FTPHandler.commands.count("USER anonymous"), 1)
+
+    def test_idle_connection_checked(self):
+        """Test that an idle connection is checked with NOOP before it is reused."""
+        with patch("validator.ftp.KEEPALIVE_INTERVAL", 0):
+            xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+            xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+
+        self.assertIn("NOOP", FTPHandler.commands)
+        self.assertEqual(ftp_pool_stats().connections, 1)
+
+    def test_closed_connection_replaced(self):
+        """Test that an idle connection closed by the server is replaced by a new one."""
+        FTPHandler.drop_idle = True
+        with patch("validator.ftp.KEEPALIVE_INTERVAL", 0):
+            xmlFromURL(f"{self.base_url}/xml/SAMPLE.xml", "XML_FILE")
+            content, _ = xmlFromURL(f"{self.base_url}/xml/STUDY.xml", "XML_FILE")
+
+        self.assertIn("<STUDY_SET>", content)
+        self.assertEqual(ftp_pool_stats().connections, 2)
+
+    def test_connection_limit(self):
+        """Test that concurrent downloads from one host wait for a connection."""
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        urls = [f"{self.base_url}/xml/SAMPLE.xml"] * 6
+        result = CliRunner().invoke(
+            cli, ["-v", "-j", "1", "--ftp-connections", "1", "--fetch-workers", "4", *urls, xsd]
+        )
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("FTP connection pool: 6 transfer(s) over 1 connection(s) to 1 host(s).", result.output)
+
+    def test_glob_expansion(self):
+        """Test that a glob in an FTP URL is expanded from one directory listing."""
+        documents, batch = expand_inputs([f"{self.base_url}/xml/*SUBMISSION.xml", f"{self.base_url}/xml/"])
+
+        self.assertTrue(batch)
+        self.assertEqual(
+            documents[:2], [f"{self.base_url}/xml/SUBMISSION.xml", f"{self.base_url}/xml/invalid_SUBMISSION.xml"]
+        )
+        self.assertEqual(len(documents), 2 + len(list((TESTFILES_ROOT / "xml").glob("*.xml"))))
+        self.assertEqual(len([cmd for cmd in FTPHandler.commands if cmd.startswith("NLST")]), 2)
+        self.assertEqual(ftp_pool_stats().connections, 1)
+
+    def test_percent_encoded_url(self):
+        """Test that the credentials and path of an FTP URL are decoded before they are sent to the server."""
+        directory = Path(tempfile.mkdtemp(prefix="dir ", dir=TESTFILES_ROOT))
+        self.addCleanup(shutil.rmtree, directory)
+        shutil.copy(TESTFILES_ROOT / "xml" / "SAMPLE.xml", directory / "SAMPLE 1.xml")
+        base = (
+            self.base_url.replace("ftp://", "ftp://anonymous:me%40example.org@")
+            + "/"
+            + directory.name.replace(" ", "%20")
+        )
+        content, _ = xmlFromURL(f"{base}/SAMPLE%201.xml", "XML_FILE")
+        documents, _ = expand_inputs([f"{base}/"])
+
+        self.assertIn("<SAMPLE_SET>", content)
+        self.assertIn("PASS me@example.org", FTPHandler.commands)
+        self.assertIn(f"RETR /{directory.name}/SAMPLE 1.xml", FTPHandler.commands)
+        self.assertIn(f"NLST /{directory.name}", FTPHandler.commands)
+        self.assertEqual(documents, [f"{base}/SAMPLE%201.xml"])
+
+    def test_glob_without_matches(self):
+        """Test that an FTP glob without matches is kept to be reported as missing."""
+        documents, _ = expand_inputs([f"{self.base_url}/xml/*.json"])
+
+        self.assertEqual(documents, [f"{self.base_url}/xml/*.json"])
+
+    def test_cli_invalid_block_size(self):
+        """Test that an invalid block size is rejected."""
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        result = CliRunner().invoke(cli, ["--ftp-block-size", "big", f"{self.base_url}/xml/SAMPLE.xml", xsd])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid size: big", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""HTTP cache tests."""
+
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.fetch import configure_http_cache
+from validator.http_cache import HTTPCache
+
+
+class SchemaHandler(BaseHTTPRequestHandler):
+    """Serve a document and the test schemas with configurable caching headers."""
+
+    protocol_version = "HTTP/1.1"
+    body = b""
+    # Bytes of the body actually sent before closing the connection, all of it when None
+    sent: "int | None" = None
+    headers_to_send: dict = {}
+    requests: list = []
+
+    def do_GET(self):
+        """Answer with the document, or 304 when the conditional request matches."""
+        type(self).requests.append(dict(self.headers))
+        schema = Path(__file__).parent / "test_files" / "schemas" / Path(self.path).name
+        body = schema.read_bytes() if schema.suffix == ".xsd" else self.body
+        etag = self.headers_to_send.get("ETag")
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in self.headers_to_send.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.sent is not None:
+            body = body[: self.sent]
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Silence request logging."""
+
+
+class TestHTTPCache(unittest.TestCase):
+    """Test for caching and revalidating downloads."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    @classmethod
+    def setUpClass(cls):
+        """Start a local HTTP server."""
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), SchemaHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/SAMPLE.xml"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the local HTTP server."""
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        """Create an empty cache and reset the served document."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = HTTPCache(Path(self.tmp.name))
+        self.session = requests.Session()
+        SchemaHandler.body = (self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").read_bytes()
+        SchemaHandler.sent = None
+        SchemaHandler.headers_to_send = {}
+        SchemaHandler.requests = []
+
+    def tearDown(self):
+        """Remove the cache and restore the default HTTP cache."""
+        self.session.close()
+        self.tmp.cleanup()
+        configure_http_cache()
+
+    def test_revalidate_with_etag(self):
+        """Test that a cached response is revalidated with If-None-Match."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        first = self.cache.get(self.session, self.url)
+        second = self.cache.get(self.session, self.url)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(SchemaHandler.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual((self.cache.misses, self.cache.revalidated), (1, 1))
+
+    def test_changed_response_downloaded(self):
+        """Test that a changed document is downloaded again."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        self.cache.get(self.session, self.url)
+        SchemaHandler.headers_to_send = {"ETag": '"v2"'}
+        SchemaHandler.body = b"<SAMPLE_SET/>"
+        response = self.cache.get(self.session, self.url)
+
+        self.assertEqual(response.content, b"<SAMPLE_SET/>")
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_fresh_response_not_requested(self):
+        """Test that a response within its max-age is served without a request."""
+        SchemaHandler.headers_to_send = {"Cache-Control": "max-age=3600"}
+        self.cache.get(self.session, self.url)
+        response = self.cache.get(self.session, self.url)
+
+        self.assertEqual(response.text, SchemaHandler.body.decode("UTF-8"))
+        self.assertEqual(len(SchemaHandler.requests), 1)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_no_store(self):
+        """Test that responses marked no-store are not cached."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"', "Cache-Control": "no-store"}
+        self.cache.get(self.session, self.url)
+        self.cache.get(self.session, self.url)
+
+        self.assertNotIn("If-None-Match", SchemaHandler.requests[1])
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_offline(self):
+        """Test that offline mode serves stale responses and refuses missing ones."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"', "Cache-Control": "no-cache"}
+        self.cache.get(self.session, self.url)
+        offline = HTTPCache(Path(self.tmp.name), offline=True)
+        response = offline.get(self.session, self.url)
+
+        self.assertEqual(response.content, SchemaHandler.body)
+        self.assertEqual(len(SchemaHandler.requests), 1)
+        with self.assertRaises(Exception) as error:
+            offline.get(self.session, self.url + "?missing")
+        self.assertIn("offline mode", str(error.exception))
+
+    def test_streamed_response_stored(self):
+        """Test that a streamed download is stored once read to the end and then streamed from the cache."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        first = self.cache.get(self.session, self.url, stream=True)
+        body = b"".join(first.iter_content(1024))
+        first.close()
+        second = self.cache.get(self.session, self.url, stream=True)
+
+        self.assertEqual(body, SchemaHandler.body)
+        self.assertEqual(b"".join(second.iter_content(1024)), SchemaHandler.body)
+        second.raw.close()
+        self.assertEqual(SchemaHandler.requests[1]["If-None-Match"], '"v1"')
+        self.assertEqual((self.cache.misses, self.cache.revalidated), (1, 1))
+
+    def test_partly_streamed_response_not_stored(self):
+        """Test that a streamed download closed before its end is not cached."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        response = self.cache.get(self.session, self.url, stream=True)
+        next(response.iter_content(16))
+        response.close()
+
+        self.assertEqual(list(Path(self.tmp.name).iterdir()), [])
+        self.cache.get(self.session, self.url)
+        self.assertNotIn("If-None-Match", SchemaHandler.requests[1])
+
+    def test_pruned_to_max_size(self):
+        """Test that stored and streamed responses evict the least recently used ones beyond the maximum size."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        cache = HTTPCache(Path(self.tmp.name), max_size=3 * len(SchemaHandler.body) + 1000)
+        for number in range(6):
+            response = cache.get(self.session, f"{self.url}?{number}", stream=number % 2 == 1)
+            b"".join(response.iter_content(1024))
+            response.close()
+            time.sleep(0.02)
+
+        self.assertEqual(len(list(Path(self.tmp.name).glob("*.entry"))), 3)
+        self.assertFalse(cache._entry(f"{self.url}?2").exists())
+        self.assertTrue(cache._entry(f"{self.url}?3").exists())
+        self.assertTrue(cache._entry(f"{self.url}?5").exists())
+
+    def test_cli_interrupted_download(self):
+        """Test that a download cut off while it is validated is reported as unreadable."""
+        SchemaHandler.sent = 100
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        result = CliRunner().invoke(cli, ["--no-http-cache", self.url, xsd])
+
+        self.assertIn(f"Error: {self.url} cannot be read: Download interrupted", result.output)
+
+    def test_cli_offline_schema(self):
+        """Test validating against a schema URL cached by an earlier run."""
+        SchemaHandler.headers_to_send = {"ETag": '"v1"'}
+        schema_url = self.url.replace("SAMPLE.xml", "SRA.study.xsd")
+        xml = (self.TESTFILES_ROOT / "xml" / "STUDY.xml").as_posix()
+        runner = CliRunner()
+        runner.invoke(cli, [xml, schema_url])
+        result = runner.invoke(cli, ["-v", "--offline", xml, schema_url])
+
+        # The schema and its SRA.common.xsd import are downloaded only by the first run
+        self.assertEqual(len(SchemaHandler.requests), 2)
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("The XML file: STUDY.xml\nis valid.\n", result.output)
+        self.assertIn("HTTP cache: 1 hit(s), 0 revalidated, 0 miss(es).", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Memory-mapped input tests."""
+
+import codecs
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.mapped import MappedFile, scan_prolog
+
+
+class TestPrologScan(unittest.TestCase):
+    """Test for finding the root element without parsing the document."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def test_plain_document(self):
+        """Test the root element of a document without namespaces."""
+        prolog = scan_prolog((self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").read_bytes())
+
+        self.assertEqual((prolog.encoding, prolog.root, prolog.schema_location), ("utf-8", "SAMPLE_SET", None))
+
+    def test_prolog_skipped(self):
+        """Test that comments, processing instructions and a document type declaration are skipped."""
+        head = (
+            b"<?xml version='1.0' encoding='ISO-8859-1'?>\n<!-- exported -->\n<?style x?>\n<!DOCTYPE a>\n"
+            b'<ena:RUN_SET xmlns:ena="urn:ena" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            b'xsi:noNamespaceSchemaLocation="SRA.run.xsd"><ena:RUN'
+        )
+        prolog = scan_prolog(head)
+
+        self.assertEqual(prolog.encoding, "iso-8859-1")
+        self.assertEqual(prolog.root, "{urn:ena}RUN_SET")
+        self.assertEqual(prolog.schema_location, "SRA.run.xsd")
+
+    def test_byte_order_mark(self):
+        """Test that the encoding is taken from a byte order mark."""
+        prolog = scan_prolog(codecs.BOM_UTF16_LE + "<STUDY_SET>".encode("utf-16-le"))
+
+        self.assertEqual((prolog.encoding, prolog.root), ("utf-16-le", "STUDY_SET"))
+
+    def test_not_understood(self):
+        """Test that no prolog is returned when the root element cannot be found reliably."""
+        self.assertIsNone(scan_prolog(b"<!DOCTYPE a [<!ENTITY x 'y'>]><a/>"))
+        self.assertIsNone(scan_prolog(b"<ena:RUN_SET>"))
+        self.assertIsNone(scan_prolog(b"not xml"))
+
+
+class TestMappedInput(unittest.TestCase):
+    """Test for validating large local files through a memory map."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Map every local file, whatever its size."""
+        self.runner = CliRunner()
+        patcher = patch("validator.validation.MMAP_THRESHOLD", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_mapped_file(self):
+        """Test reading and seeking a mapped file."""
+        path = self.TESTFILES_ROOT / "xml" / "SAMPLE.xml"
+        with MappedFile(path) as mapped:
+            self.assertEqual(mapped.read(5), path.read_bytes()[:5])
+            mapped.seek(-3, 2)
+            self.assertEqual(mapped.read(), path.read_bytes()[-3:])
+            self.assertEqual(mapped.read(), b"")
+            mapped.seek(0)
+            self.assertEqual(mapped.read(), path.read_bytes())
+        self.assertTrue(mapped.closed)
+
+    def test_cli_mapped_files(self):
+        """Test that mapped files give the same verdicts in every validation mode."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        for options in ([], ["--fail-fast"], ["--stream"]):
+            for name, verdict in [("SUBMISSION.xml", "is valid."), ("invalid_SUBMISSION.xml", "is invalid.")]:
+                with self.subTest(options=options, name=name):
+                    xml = (self.TESTFILES_ROOT / "xml" / name).as_posix()
+                    result = self.runner.invoke(cli, [*options, xml, xsd])
+
+                    self.assertEqual(result.exit_code, 0)
+                    self.assertIn(verdict, result.output)
+
+    def test_cli_mapped_malformed(self):
+        """Test that a syntax error in a mapped file is reported as malformed."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        xml = (self.TESTFILES_ROOT / "xml" / "bad_syntax.xml").as_posix()
+        for options in ([], ["--stream"]):
+            with self.subTest(options=options):
+                result = self.runner.invoke(cli, [*options, xml, xsd])
+
+                self.assertEqual(result.output, "Faulty XML or XSD file was given.\n\n")
+
+    def test_malformed_rejected_before_validation(self):
+        """Test that a malformed mapped file is rejected with its position without being validated."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        xml = (self.TESTFILES_ROOT / "xml" / "bad_syntax.xml").as_posix()
+        with patch("xmlschema.XMLSchema.iter_errors") as iter_errors:
+            result = self.runner.invoke(cli, ["-v", xml, xsd])
+
+        iter_errors.assert_not_called()
+        self.assertIn("Error: no element found: line 3, column 0", result.output)
+
+    def test_no_check_for_lazy_parses(self):
+        """Test that documents parsed lazily or record by record are not read a second time for the check."""
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.submission.xsd").as_posix()
+        xml = (self.TESTFILES_ROOT / "xml" / "bad_syntax.xml").as_posix()
+        for option in ["--fail-fast", "--stream"]:
+            with self.subTest(option=option):
+                with patch("validator.validation._check_well_formed") as check:
+                    result = self.runner.invoke(cli, [option, xml, xsd])
+
+                check.assert_not_called()
+                self.assertIn("Faulty XML or XSD file was given.", result.output)
+
+    def test_cli_undeclared_root(self):
+        """Test that a document for another schema is rejected from its root element."""
+        xml = (self.TESTFILES_ROOT / "xml" / "SUBMISSION.xml").as_posix()
+        xsd = (self.TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        with patch("xmlschema.XMLSchema.iter_errors") as iter_errors:
+            result = self.runner.invoke(cli, ["-v", xml, xsd])
+
+        iter_errors.assert_not_called()
+        self.assertIn("is invalid.\n", result.output)
+        self.assertIn("'SUBMISSION_SET' is not an element of the schema", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Schema auto-detection tests."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.mapped import Prolog
+from validator.registry import SchemaNotFound, SchemaRegistry
+
+
+class TestSchemaRegistry(unittest.TestCase):
+    """Test for indexing a schema directory by root element."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Copy the test schemas into a temporary directory."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.schemas = Path(self.tmp.name)
+        for path in (self.TESTFILES_ROOT / "schemas").glob("*.xsd"):
+            shutil.copy(path, self.schemas)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def test_global_elements_indexed(self):
+        """Test that schemas are found from the global elements they declare."""
+        registry = SchemaRegistry.build(self.schemas)
+
+        self.assertEqual(registry.lookup(Prolog("utf-8", "SAMPLE_SET")), self.schemas.resolve() / "SRA.sample.xsd")
+        self.assertEqual(registry.lookup(Prolog("utf-8", "DAC")), self.schemas.resolve() / "EGA.dac.xsd")
+        self.assertIsNone(registry.lookup(Prolog("utf-8", "TITLE")))
+        self.assertIsNone(registry.lookup(None))
+
+    def test_index_persisted(self):
+        """Test that the index is loaded from the cache directory while the schemas are unchanged."""
+        first = SchemaRegistry.load(self.schemas)
+        with patch("validator.registry._declared_elements") as declared:
+            second = SchemaRegistry.load(self.schemas)
+
+        declared.assert_not_called()
+        self.assertEqual(first.elements, second.elements)
+
+    def test_index_rebuilt_on_change(self):
+        """Test that adding a schema file rebuilds the index."""
+        SchemaRegistry.load(self.schemas)
+        (self.schemas / "extra.xsd").write_text(
+            '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:extra">'
+            '<xs:element name="EXTRA_SET"/></xs:schema>'
+        )
+        registry = SchemaRegistry.load(self.schemas)
+
+        self.assertEqual(registry.elements["{urn:extra}EXTRA_SET"], "extra.xsd")
+
+    def test_unknown_root(self):
+        """Test that a root element declared by no schema is reported."""
+        with self.assertRaises(SchemaNotFound) as error:
+            SchemaRegistry.build(self.schemas).schema_for(Prolog("utf-8", "UNKNOWN_SET"))
+        self.assertIn("'UNKNOWN_SET'", str(error.exception))
+
+
+class TestSchemaDetection(unittest.TestCase):
+    """Test for validating documents against the schema of their root element."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Set paths to test files."""
+        self.runner = CliRunner()
+        self.xml_path = self.TESTFILES_ROOT / "xml"
+        self.schema_dir = (self.TESTFILES_ROOT / "schemas").as_posix()
+
+    def test_cli_single_file(self):
+        """Test that a single file is validated against the schema of its root element."""
+        for name, verdict in [("SAMPLE.xml", "is valid.\n"), ("invalid_SUBMISSION.xml", "is invalid.\n")]:
+            with self.subTest(name=name):
+                xml = (self.xml_path / name).as_posix()
+                result = self.runner.invoke(cli, ["-v", "--schema-dir", self.schema_dir, xml])
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn(verdict, result.output)
+        self.assertIn("Schema: SRA.submission.xsd\n", result.output)
+
+    def test_cli_unknown_root(self):
+        """Test that a document with a root element declared by no schema is reported."""
+        with tempfile.TemporaryDirectory() as tmp:
+            xml = Path(tmp) / "other.xml"
+            xml.write_text("<OTHER_SET><OTHER/></OTHER_SET>")
+            result = self.runner.invoke(cli, ["--schema-dir", self.schema_dir, str(xml)])
+
+        self.assertIn("declares the root element 'OTHER_SET' of the document.", result.output)
+
+    def test_cli_batch(self):
+        """Test that each file of a batch is validated against its own schema."""
+        xml_files = [(self.xml_path / name).as_posix() for name in ["SAMPLE.xml", "STUDY.xml", "SUBMISSION.xml"]]
+        for jobs in ("1", "2"):
+            with self.subTest(jobs=jobs):
+                result = self.runner.invoke(cli, ["-j", jobs, "--schema-dir", self.schema_dir, *xml_files])
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn("SAMPLE.xml: valid (SRA.sample.xsd)\n", result.output)
+                self.assertIn("STUDY.xml: valid (SRA.study.xsd)\n", result.output)
+                self.assertIn("SUBMISSION.xml: valid (SRA.submission.xsd)\n", result.output)
+
+    def test_cli_schema_file_required(self):
+        """Test that the schema argument is still required without a schema directory."""
+        result = self.runner.invoke(cli, [(self.xml_path / "SAMPLE.xml").as_posix()])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("SCHEMA_FILE", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
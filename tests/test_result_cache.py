@@ -0,0 +1,183 @@
+"""Validation result cache tests."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.result_cache import _ROW_OVERHEAD, RACY_INTERVAL, ResultCache
+from validator.schema_cache import SchemaCache
+from validator.validation import Status, ValidationOptions, validate_document
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+OPTIONS = ValidationOptions(result_cache=True)
+
+
+class TestResultCache(unittest.TestCase):
+    """Test for the persistent cache of validation verdicts."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Compile the test schema once."""
+        cls.schema = SchemaCache().get((TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix(), persistent=False)
+
+    def setUp(self):
+        """Create an empty cache and copy test files older than the racy interval into a temporary directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.cache = ResultCache(self.tmp / "results.sqlite3")
+        self.addCleanup(self.cache.close)
+        patcher = patch("validator.result_cache.result_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        for name in ["SAMPLE.xml", "STUDY.xml"]:
+            self.copy(name)
+
+    def copy(self, name: str) -> str:
+        """Copy a test file, dated long enough ago for its modification time to be trusted."""
+        path = self.tmp / name
+        shutil.copy(TESTFILES_ROOT / "xml" / name, path)
+        past = time.time() - 2 * RACY_INTERVAL
+        os.utime(path, (past, past))
+        return str(path)
+
+    def test_hit_skips_validation(self):
+        """Test that an unchanged document gets its verdict and errors without being read again."""
+        for name, status in [("SAMPLE.xml", Status.VALID), ("STUDY.xml", Status.INVALID)]:
+            with self.subTest(name=name):
+                xml = str(self.tmp / name)
+                first = validate_document(xml, self.schema, OPTIONS)
+                with patch("validator.validation.fetch_document") as fetch:
+                    second = validate_document(xml, self.schema, OPTIONS)
+
+                fetch.assert_not_called()
+                self.assertIs(first.status, status)
+                self.assertFalse(first.cached)
+                self.assertTrue(second.cached)
+                self.assertIs(second.status, status)
+                self.assertEqual(second.errors, first.errors)
+
+    def test_disabled_by_default(self):
+        """Test that documents are validated each time unless the cache is enabled."""
+        xml = str(self.tmp / "SAMPLE.xml")
+        validate_document(xml, self.schema)
+        result = validate_document(xml, self.schema)
+
+        self.assertFalse(result.cached)
+        self.assertFalse(self.cache.path.exists())
+
+    def test_changed_document_misses(self):
+        """Test that editing a document gives a fresh verdict."""
+        xml = self.tmp / "SAMPLE.xml"
+        validate_document(str(xml), self.schema, OPTIONS)
+        xml.write_text(xml.read_text().replace("</SAMPLE_SET>", "<SAMPLE/></SAMPLE_SET>"))
+        result = validate_document(str(xml), self.schema, OPTIONS)
+
+        self.assertFalse(result.cached)
+        self.assertIs(result.status, Status.INVALID)
+
+    def test_options_and_schema_in_key(self):
+        """Test that verdicts are kept apart for other options and schemas, and shared by copies of a document."""
+        xml = str(self.tmp / "SAMPLE.xml")
+        key = self.cache.key(xml, self.schema, OPTIONS)
+        study = SchemaCache().get((TESTFILES_ROOT / "schemas" / "SRA.study.xsd").as_posix(), persistent=False)
+        copy = self.tmp / "copy.xml"
+        shutil.copy(xml, copy)
+
+        self.assertNotEqual(self.cache.key(xml, self.schema, ValidationOptions(max_errors=5)), key)
+        self.assertNotEqual(self.cache.key(xml, self.schema, ValidationOptions(stream=True)), key)
+        self.assertNotEqual(self.cache.key(xml, study, OPTIONS), key)
+        self.assertEqual(self.cache.key(str(copy), self.schema, OPTIONS), key)
+
+    def test_changed_schema_misses(self):
+        """Test that editing the schema, or a schema it imports, changes the key."""
+        for name in ["SRA.sample.xsd", "SRA.common.xsd"]:
+            shutil.copy(TESTFILES_ROOT / "schemas" / name, self.tmp)
+        xml = str(self.tmp / "SAMPLE.xml")
+        xsd, common = self.tmp / "SRA.sample.xsd", self.tmp / "SRA.common.xsd"
+        key = self.cache.key(xml, SchemaCache().get(str(xsd), persistent=False), OPTIONS)
+        common.write_text(common.read_text() + "\n")
+
+        self.assertNotEqual(self.cache.key(xml, SchemaCache().get(str(xsd), persistent=False), OPTIONS), key)
+
+    def test_remote_documents_not_cached(self):
+        """Test that documents other than local files have no key."""
+        self.assertIsNone(self.cache.key("https://example.org/SAMPLE.xml", self.schema, OPTIONS))
+
+    def test_unchanged_file_not_hashed_again(self):
+        """Test that the hash of a file is reused while its size and modification time are unchanged."""
+        xml = str(self.tmp / "SAMPLE.xml")
+        with patch("hashlib.file_digest", wraps=hashlib.file_digest) as digest:
+            first = self.cache.key(xml, self.schema, OPTIONS)
+            second = self.cache.key(xml, self.schema, OPTIONS)
+
+        self.assertEqual(first, second)
+        self.assertEqual(digest.call_count, 1)
+
+    def test_recently_modified_file_hashed_again(self):
+        """Test that a file modified within the racy interval is hashed on each use."""
+        xml = self.tmp / "recent.xml"
+        shutil.copy(TESTFILES_ROOT / "xml" / "SAMPLE.xml", xml)
+        with patch("hashlib.file_digest", wraps=hashlib.file_digest) as digest:
+            self.cache.key(str(xml), self.schema, OPTIONS)
+            self.cache.key(str(xml), self.schema, OPTIONS)
+
+        self.assertEqual(digest.call_count, 2)
+
+    def test_prune_by_size(self):
+        """Test that pruning by size removes the least recently used verdicts and file hashes first."""
+        validate_document(str(self.tmp / "SAMPLE.xml"), self.schema, OPTIONS)
+        time.sleep(0.01)
+        newest = validate_document(str(self.tmp / "STUDY.xml"), self.schema, OPTIONS)
+        rows = self.cache._db().execute("SELECT key, size FROM results ORDER BY used").fetchall()
+        (oldest_key, _), (newest_key, newest_size) = rows
+        removed, freed = self.cache.prune(max_size=newest_size + len(newest.source) + _ROW_OVERHEAD)
+
+        self.assertEqual(removed, 2)
+        self.assertGreater(freed, 0)
+        self.assertIsNone(self.cache.load(oldest_key))
+        self.assertIsNotNone(self.cache.load(newest_key))
+
+    def test_prune_by_age(self):
+        """Test that pruning by age removes entries not used recently."""
+        validate_document(str(self.tmp / "SAMPLE.xml"), self.schema, OPTIONS)
+        removed, _ = self.cache.prune(max_age=60)
+        self.assertEqual(removed, 0)
+
+        time.sleep(0.01)
+        removed, _ = self.cache.prune(max_age=0)
+        # The verdict and the hash of the file
+        self.assertEqual(removed, 2)
+
+    def test_cli_batch(self):
+        """Test that a second batch run reads every verdict from the cache."""
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        args = ["--result-cache", "--verbose", "--jobs", "2", str(self.tmp), xsd]
+        first = CliRunner().invoke(cli, args)
+        second = CliRunner().invoke(cli, args)
+
+        self.assertIn("Result cache: 0 hit(s).", first.output)
+        self.assertIn("Result cache: 2 hit(s).", second.output)
+        self.assertIn("1 valid, 1 invalid", second.output)
+        self.assertEqual(second.exit_code, 1)
+
+    def test_cli_cache_prune(self):
+        """Test that the cache prune subcommand evicts verdicts."""
+        validate_document(str(self.tmp / "SAMPLE.xml"), self.schema, OPTIONS)
+        result = CliRunner().invoke(cli, ["cache", "prune", "--max-size", "0"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Removed 2 cached result(s)", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""Compiled schema cache tests."""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import xmlschema
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.schema_cache import SchemaCache, SchemaStore, schema_cache
+
+
+class TestSchemaCache(unittest.TestCase):
+    """Test for the in-process compiled schema cache."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Create an empty cache and set paths to test files."""
+        self.cache = SchemaCache()
+        self.xml_path = self.TESTFILES_ROOT / "xml"
+        self.xsd_path = self.TESTFILES_ROOT / "schemas"
+
+    def test_schema_compiled_once(self):
+        """Test that the same schema is compiled only once."""
+        xsd = (self.xsd_path / "SRA.sample.xsd").as_posix()
+        first = self.cache.get(xsd)
+        second = self.cache.get(xsd)
+
+        self.assertIs(first, second)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_changed_schema_is_recompiled(self):
+        """Test that editing a schema file gives a freshly compiled schema."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["SRA.sample.xsd", "SRA.common.xsd"]:
+                shutil.copy(self.xsd_path / name, tmp)
+            xsd = Path(tmp) / "SRA.sample.xsd"
+            first = self.cache.get(str(xsd))
+            xsd.write_text(xsd.read_text() + "\n")
+            second = self.cache.get(str(xsd))
+
+        self.assertIsNot(first, second)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_imported_schema_shared(self):
+        """Test that schemas importing the same schema share its compiled components."""
+        with patch("xmlschema.XMLSchema", wraps=xmlschema.XMLSchema) as compile_schema:
+            sample = self.cache.get((self.xsd_path / "SRA.sample.xsd").as_posix())
+            study = self.cache.get((self.xsd_path / "SRA.study.xsd").as_posix())
+
+        self.assertEqual(compile_schema.call_count, 3)
+        self.assertIs(sample.maps.parent, study.maps.parent)
+        self.assertIs(sample.maps.types["{SRA.common}AttributeType"], study.maps.types["{SRA.common}AttributeType"])
+        self.assertTrue(sample.is_valid((self.xml_path / "SAMPLE.xml").as_posix()))
+        self.assertFalse(study.is_valid((self.xml_path / "SAMPLE.xml").as_posix()))
+
+    def test_changed_import_rebuilt(self):
+        """Test that editing an imported schema gives the schemas importing it fresh components."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["SRA.sample.xsd", "SRA.study.xsd", "SRA.common.xsd"]:
+                shutil.copy(self.xsd_path / name, tmp)
+            first = self.cache.get(str(Path(tmp) / "SRA.sample.xsd"))
+            common = Path(tmp) / "SRA.common.xsd"
+            common.write_text(common.read_text() + "\n")
+            second = self.cache.get(str(Path(tmp) / "SRA.study.xsd"))
+
+        self.assertIsNot(first.maps.parent, second.maps.parent)
+
+    def test_cached_schema_with_changed_import_recompiled(self):
+        """Test that a cached schema is compiled again when a file it imports is edited."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in ["SRA.sample.xsd", "SRA.common.xsd"]:
+                shutil.copy(self.xsd_path / name, tmp)
+            xsd = str(Path(tmp) / "SRA.sample.xsd")
+            first = self.cache.get(xsd)
+            common = Path(tmp) / "SRA.common.xsd"
+            common.write_text(common.read_text() + "\n")
+            second = self.cache.get(xsd)
+            third = self.cache.get(xsd)
+
+        self.assertIsNot(first, second)
+        self.assertIs(second, third)
+        self.assertIsNot(first.maps.parent, second.maps.parent)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_schema_from_text(self):
+        """Test that schema text fetched from an URL is cached by URL and content."""
+        xsd = (self.xsd_path / "SRA.sample.xsd").read_text()
+        url = (self.xsd_path / "SRA.sample.xsd").as_uri()
+        first = self.cache.get(xsd, url)
+        second = self.cache.get(xsd, url)
+
+        self.assertIs(first, second)
+        self.assertTrue(first.is_valid((self.xml_path / "SAMPLE.xml").as_posix()))
+
+    def test_cli_uses_shared_cache(self):
+        """Test that repeated CLI runs reuse the process wide cache."""
+        schema_cache.clear()
+        xml = (self.xml_path / "SAMPLE.xml").as_posix()
+        xsd = (self.xsd_path / "SRA.sample.xsd").as_posix()
+        runner = CliRunner()
+        runner.invoke(cli, [xml, xsd])
+        result = runner.invoke(cli, [xml, xsd])
+
+        self.assertEqual("The XML file: SAMPLE.xml\nis valid.\n\n", result.output)
+        self.assertEqual(schema_cache.misses, 1)
+        self.assertEqual(schema_cache.hits, 1)
+
+
+class TestSchemaStore(unittest.TestCase):
+    """Test for the persistent compiled schema store."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Create a store in a temporary directory with a copy of the test schemas."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SchemaStore(Path(self.tmp.name) / "store")
+        self.xsd_path = Path(self.tmp.name) / "schemas"
+        shutil.copytree(self.TESTFILES_ROOT / "schemas", self.xsd_path)
+        self.xml = (self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.tmp.cleanup()
+
+    def test_schema_loaded_from_store(self):
+        """Test that a new process wide cache loads the schema from the store."""
+        xsd = str(self.xsd_path / "SRA.sample.xsd")
+        SchemaCache(self.store).get(xsd)
+        schema = SchemaCache(self.store).get(xsd)
+
+        self.assertEqual(self.store.misses, 1)
+        self.assertEqual(self.store.hits, 1)
+        self.assertTrue(schema.is_valid(self.xml))
+
+    def test_store_not_used_when_disabled(self):
+        """Test that the store is bypassed for non-persistent lookups."""
+        xsd = str(self.xsd_path / "SRA.sample.xsd")
+        SchemaCache(self.store).get(xsd, persistent=False)
+
+        self.assertFalse(self.store.path.exists())
+
+    def test_changed_import_invalidates_entry(self):
+        """Test that editing an imported schema discards the stored schema."""
+        xsd = str(self.xsd_path / "SRA.sample.xsd")
+        SchemaCache(self.store).get(xsd)
+        common = self.xsd_path / "SRA.common.xsd"
+        common.write_text(common.read_text() + "\n")
+        SchemaCache(self.store).get(xsd)
+
+        self.assertEqual(self.store.misses, 2)
+        self.assertEqual(self.store.hits, 0)
+
+    def test_prune_evicts_least_recently_used(self):
+        """Test that pruning by size removes the oldest entries first."""
+        SchemaCache(self.store).get(str(self.xsd_path / "SRA.sample.xsd"))
+        oldest = next(self.store.path.glob("*.pickle"))
+        os.utime(oldest, (time.time() - 60, time.time() - 60))
+        SchemaCache(self.store).get(str(self.xsd_path / "SRA.study.xsd"))
+        newest = next(entry for entry in self.store.path.glob("*.pickle") if entry != oldest)
+        oldest_size = oldest.stat().st_size
+        removed, freed = self.store.prune(max_size=newest.stat().st_size)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(freed, oldest_size)
+        self.assertEqual(list(self.store.path.glob("*.pickle")), [newest])
+
+    def test_prune_by_age(self):
+        """Test that pruning by age removes entries not used recently."""
+        SchemaCache(self.store).get(str(self.xsd_path / "SRA.sample.xsd"))
+        removed, _ = self.store.prune(max_age=60)
+        self.assertEqual(removed, 0)
+
+        time.sleep(0.01)
+        removed, _ = self.store.prune(max_age=0)
+        self.assertEqual(removed, 1)
+
+    def test_cli_cache_prune(self):
+        """Test the cache prune subcommand."""
+        SchemaCache(self.store).get(str(self.xsd_path / "SRA.sample.xsd"))
+        with patch.object(schema_cache, "store", self.store):
+            result = CliRunner().invoke(cli, ["cache", "prune", "--max-size", "0"])
+
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Removed 1 cached schema(s)", result.output)
+        self.assertEqual(list(self.store.path.glob("*.pickle")), [])
+
+    def test_cli_cache_prune_bad_size(self):
+        """Test the cache prune subcommand with an invalid size."""
+        result = CliRunner().invoke(cli, ["cache", "prune", "--max-size", "lots"])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("Invalid size: lots", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""Bundled schema pack tests."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.engine import lxml_available, lxml_schema
+from validator.schema_pack import PACK_DIR, compile_pack, compiled_dir, load_pack_schema, pack_schemas
+
+
+class TestSchemaPack(unittest.TestCase):
+    """Test for validating against the schemas shipped with the package."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Copy the pack into a temporary directory and forget the loaded schemas."""
+        self.runner = CliRunner()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pack = Path(self.tmp.name)
+        for path in PACK_DIR.glob("*.xsd"):
+            shutil.copy(path, self.pack)
+        for patcher in [
+            patch("validator.schema_pack.PACK_DIR", self.pack),
+            patch.dict("validator.schema_pack._loaded"),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_pack_names(self):
+        """Test that the schemas of the pack are named after their files."""
+        names = pack_schemas()
+
+        self.assertIn("sra.sample", names)
+        self.assertIn("ega.dac", names)
+        self.assertEqual(names["ena.checklist"].name, "ENA.checklist.xsd")
+
+    def test_precompiled_schema_loaded(self):
+        """Test that a precompiled schema is loaded without compiling its schema file."""
+        compile_pack(self.pack)
+        with patch("validator.schema_cache.get_schema") as get_schema:
+            schema = load_pack_schema("SRA.sample")
+
+        get_schema.assert_not_called()
+        self.assertTrue(schema.is_valid((self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()))
+        self.assertIs(load_pack_schema("sra.sample"), schema)
+
+    @unittest.skipUnless(lxml_available(), "lxml is not installed")
+    def test_precompiled_schema_compiled_by_libxml2(self):
+        """Test that libxml2 finds the installed file of a schema precompiled in another tree."""
+        with tempfile.TemporaryDirectory() as tmp:
+            build = Path(tmp) / "build"
+            shutil.copytree(self.pack, build)
+            compile_pack(build)
+            shutil.copytree(compiled_dir(build), compiled_dir(self.pack))
+        schema = load_pack_schema("sra.sample")
+
+        self.assertIn("/build/", schema.url)
+        self.assertIsNotNone(lxml_schema(schema))
+
+    def test_schema_file_compiled_without_pack(self):
+        """Test that a pack built without precompiled schemas compiles the bundled schema file."""
+        schema = load_pack_schema("sra.study", persistent=False)
+
+        self.assertEqual(Path(schema.url.replace("file://", "")).name, "SRA.study.xsd")
+        self.assertTrue(schema.is_valid((self.TESTFILES_ROOT / "xml" / "STUDY.xml").as_posix()))
+
+    def test_unknown_name(self):
+        """Test that a name missing from the pack is rejected."""
+        with self.assertRaises(KeyError):
+            load_pack_schema("sra.unknown")
+
+    def test_cli_pack_schema(self):
+        """Test validating against a schema of the pack without a schema file."""
+        for xml, verdict in [("SAMPLE.xml", "is valid.\n"), ("STUDY.xml", "is invalid.\n")]:
+            with self.subTest(xml=xml):
+                result = self.runner.invoke(
+                    cli, ["--schema", "sra.sample", (self.TESTFILES_ROOT / "xml" / xml).as_posix()]
+                )
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn(verdict, result.output)
+
+    def test_cli_invalid_pack_schema(self):
+        """Test that an unknown schema name and a schema directory together with a name are rejected."""
+        xml = (self.TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()
+        result = self.runner.invoke(cli, ["--schema", "sra.unknown", xml])
+        self.assertEqual(result.exit_code, 2)
+
+        result = self.runner.invoke(cli, ["--schema", "sra.sample", "--schema-dir", str(self.pack), xml])
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("cannot be used together", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
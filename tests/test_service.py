@@ -0,0 +1,123 @@
+"""HTTP validation service tests."""
+
+import gzip
+import threading
+import unittest
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+from validator.service import ValidationService
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+class TestValidationService(unittest.TestCase):
+    """Test for validating documents posted to the HTTP service."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Start the service and a web server for the test files."""
+        cls.service = ValidationService(("127.0.0.1", 0), workers=1, queue_size=1)
+        cls.url = f"http://127.0.0.1:{cls.service.server_address[1]}"
+        threading.Thread(target=cls.service.serve_forever, daemon=True).start()
+        handler = partial(SimpleHTTPRequestHandler, directory=str(TESTFILES_ROOT))
+        cls.files = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        cls.files_url = f"http://127.0.0.1:{cls.files.server_address[1]}"
+        threading.Thread(target=cls.files.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the servers."""
+        for server in (cls.service, cls.files):
+            server.shutdown()
+            server.server_close()
+
+    def post(self, file_name, **params):
+        """Post a test file to the service."""
+        body = (TESTFILES_ROOT / "xml" / file_name).read_bytes()
+        return requests.post(f"{self.url}/validate", params=params, data=body, timeout=30)
+
+    def test_valid_body(self):
+        """Test that a posted document is validated against the schema of an id."""
+        response = self.post("SAMPLE.xml", schema="SRA.sample")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "valid")
+        self.assertEqual(response.json()["schema"], "sra.sample")
+
+    def test_invalid_body(self):
+        """Test that the errors of an invalid document are returned."""
+        response = self.post("invalid_SUBMISSION.xml", schema="sra.submission", max_errors=2, name="sub.xml")
+        result = response.json()
+
+        self.assertEqual((result["source"], result["status"], result["valid"]), ("sub.xml", "invalid", False))
+        self.assertEqual(len(result["errors"]), 2)
+
+    def test_malformed_body(self):
+        """Test that a document with a syntax error is reported as malformed."""
+        self.assertEqual(self.post("bad_syntax.xml", schema="sra.submission").json()["status"], "malformed")
+
+    def test_detected_schema(self):
+        """Test that a compressed document without schema id is validated against the schema of its root element."""
+        body = gzip.compress((TESTFILES_ROOT / "xml" / "STUDY.xml").read_bytes())
+        result = requests.post(f"{self.url}/validate", data=body, timeout=30).json()
+
+        self.assertEqual((result["status"], result["schema"]), ("valid", "sra.study"))
+
+    def test_large_body_spooled(self):
+        """Test that a large body is spooled to a file which the worker validates."""
+        with patch("validator.service.MMAP_THRESHOLD", 0):
+            response = self.post("SUBMISSION.xml", schema="sra.submission")
+
+        self.assertEqual(response.json()["status"], "valid")
+
+    def test_url(self):
+        """Test that the document at an URL is validated."""
+        url = f"{self.files_url}/xml/SAMPLE.xml"
+        result = requests.post(f"{self.url}/validate", params={"schema": "sra.sample", "url": url}, timeout=30).json()
+
+        self.assertEqual((result["source"], result["status"]), (url, "valid"))
+
+    def test_rejected_requests(self):
+        """Test that invalid requests are answered with client errors."""
+        self.assertEqual(self.post("SAMPLE.xml", schema="sra.unknown").status_code, 400)
+        self.assertEqual(self.post("SAMPLE.xml", max_errors="many").status_code, 400)
+        response = requests.post(f"{self.url}/validate", params={"url": "file:///etc/passwd"}, timeout=30)
+        self.assertEqual(response.status_code, 400)
+        response = requests.post(f"{self.url}/validate", data=iter([b"<a/>"]), timeout=30)
+        self.assertEqual(response.status_code, 411)
+        self.assertEqual(requests.post(f"{self.url}/other", data=b"", timeout=30).status_code, 404)
+
+    def test_body_size_limit(self):
+        """Test that a body larger than the limit is rejected before it is read."""
+        with patch.object(self.service, "max_body_size", 100):
+            response = self.post("SAMPLE.xml", schema="sra.sample")
+
+        self.assertEqual(response.status_code, 413)
+
+    def test_overload(self):
+        """Test that requests beyond the worker and queue capacity are answered with 503."""
+        for _ in range(self.service.capacity):
+            self.service.slots.acquire()
+        try:
+            response = self.post("SAMPLE.xml", schema="sra.sample")
+        finally:
+            for _ in range(self.service.capacity):
+                self.service.slots.release()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertEqual(self.post("SAMPLE.xml", schema="sra.sample").status_code, 200)
+
+    def test_schemas(self):
+        """Test that the schema ids and the load of the service are listed."""
+        self.assertIn("sra.sample", requests.get(f"{self.url}/schemas", timeout=30).json()["schemas"])
+        self.assertEqual(requests.get(f"{self.url}/health", timeout=30).json()["workers"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
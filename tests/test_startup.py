@@ -0,0 +1,74 @@
+"""Command line startup time tests."""
+
+import re
+import subprocess  # nosec
+import sys
+import unittest
+from pathlib import Path
+from typing import Dict, Tuple
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+# Import time allowed for `xml-validate --help`, about twice what it takes without the validation engine
+HELP_BUDGET = 0.15
+
+NETWORK_MODULES = ("requests", "urllib3", "ftplib")
+
+
+def import_times(*args: str) -> Tuple[float, Dict[str, int]]:
+    """Run the command line with ``-X importtime``.
+
+    :returns: Seconds spent importing modules other than those of the interpreter startup, and the
+        cumulative import time of each imported module in microseconds
+    """
+    process = subprocess.run(  # nosec
+        [sys.executable, "-X", "importtime", "-m", "validator", *args],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+    )
+    modules = {}
+    total = 0
+    for line in process.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)$", line)
+        if match is None:
+            continue
+        modules[match.group(3)] = int(match.group(1))
+        # Modules imported at the top level, as the others are included in their time
+        if len(match.group(2)) == 1 and match.group(3) not in ("site", "encodings"):
+            total += int(match.group(1))
+    return total / 1e6, modules
+
+
+class TestStartup(unittest.TestCase):
+    """Test that the command line only imports the libraries a command needs."""
+
+    def test_help_imports_no_engine(self):
+        """Test that the help loads neither the validation engine nor the network libraries."""
+        _, modules = import_times("--help")
+
+        for module in ("xmlschema", *NETWORK_MODULES):
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+    def test_help_within_budget(self):
+        """Test that the help starts within the import time budget, taking the best of a few runs."""
+        best = min(import_times("--help")[0] for _ in range(3))
+
+        self.assertLess(best, HELP_BUDGET)
+
+    def test_local_file_imports_no_network(self):
+        """Test that validating a local file loads the validation engine but not the network libraries."""
+        _, modules = import_times(
+            (TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix(),
+            (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix(),
+        )
+
+        self.assertIn("xmlschema", modules)
+        for module in NETWORK_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
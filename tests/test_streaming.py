@@ -0,0 +1,81 @@
+"""Streaming record validation tests."""
+
+import unittest
+from io import BytesIO
+from pathlib import Path
+from xml.etree.ElementTree import ParseError
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.schema_cache import get_schema
+from validator.streaming import iter_record_errors
+
+
+class TestStreamingValidation(unittest.TestCase):
+    """Test for validating record set documents record by record."""
+
+    TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+    def setUp(self):
+        """Set paths to test files."""
+        self.runner = CliRunner()
+        self.xml_path = self.TESTFILES_ROOT / "xml"
+        self.xsd_path = self.TESTFILES_ROOT / "schemas"
+
+    def test_valid_record_set(self):
+        """Test that a valid record set gives no errors."""
+        schema = get_schema((self.xsd_path / "SRA.sample.xsd").as_posix())
+        errors = list(iter_record_errors((self.xml_path / "SAMPLE.xml").as_posix(), schema))
+
+        self.assertEqual(errors, [])
+
+    def test_many_records(self):
+        """Test that every record of a large record set is validated."""
+        schema = get_schema((self.xsd_path / "SRA.submission.xsd").as_posix())
+        text = (self.xml_path / "SUBMISSION.xml").read_text()
+        start, end = text.index("<SUBMISSION "), text.index("</SUBMISSION_SET>")
+        invalid = (self.xml_path / "invalid_SUBMISSION.xml").read_text()
+        invalid_start, invalid_end = invalid.index("<SUBMISSION "), invalid.index("</SUBMISSION_SET>")
+        document = text[:start] + text[start:end] * 50 + invalid[invalid_start:invalid_end] + text[end:]
+        errors = list(iter_record_errors(BytesIO(document.encode("UTF-8")), schema))
+
+        self.assertTrue(errors)
+        self.assertIn("value must be one of", str(errors[0]))
+
+    def test_unknown_root_element(self):
+        """Test that a root element not declared in the schema is an error."""
+        schema = get_schema((self.xsd_path / "SRA.sample.xsd").as_posix())
+        errors = list(iter_record_errors((self.xml_path / "SUBMISSION.xml").as_posix(), schema))
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("is not an element of the schema", str(errors[0]))
+
+    def test_unexpected_record(self):
+        """Test that a record not allowed under the root element is an error."""
+        schema = get_schema((self.xsd_path / "SRA.sample.xsd").as_posix())
+        document = b"<SAMPLE_SET><STUDY/></SAMPLE_SET>"
+        errors = list(iter_record_errors(BytesIO(document), schema))
+
+        self.assertEqual(len(errors), 1)
+        self.assertIn("Unexpected child element 'STUDY'", str(errors[0]))
+
+    def test_malformed_document(self):
+        """Test that a syntax error is raised as a parse error."""
+        schema = get_schema((self.xsd_path / "SRA.submission.xsd").as_posix())
+        with self.assertRaises(ParseError):
+            list(iter_record_errors((self.xml_path / "bad_syntax.xml").as_posix(), schema))
+
+    def test_cli_stream(self):
+        """Test the stream option gives the same verdicts as full validation."""
+        xsd = (self.xsd_path / "SRA.submission.xsd").as_posix()
+        for xml_name, verdict in [("SUBMISSION.xml", "valid"), ("invalid_SUBMISSION.xml", "invalid")]:
+            xml = (self.xml_path / xml_name).as_posix()
+            result = self.runner.invoke(cli, ["--stream", xml, xsd])
+
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(f"The XML file: {xml_name}\nis {verdict}.\n\n", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Phase timing and profiling tests."""
+
+import json
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.registry import SchemaRegistry
+from validator.schema_cache import SchemaCache
+from validator.timing import PhaseTimes, phase, recording
+from validator.validation import ValidationOptions, validate_document
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+class TestPhaseTimes(unittest.TestCase):
+    """Test for measuring the time spent in each phase."""
+
+    def test_nested_phases_excluded(self):
+        """Test that the time of a nested phase is not counted in the enclosing phase."""
+        with recording(PhaseTimes()) as times:
+            with phase("fetch"):
+                with phase("decode"):
+                    time.sleep(0.05)
+            with phase("fetch"):
+                pass
+
+        self.assertEqual(times.phases(), ["fetch", "decode"])
+        self.assertGreaterEqual(times.wall["decode"], 0.05)
+        self.assertLess(times.wall["fetch"], 0.05)
+        # Sleeping takes no CPU time
+        self.assertLess(times.cpu["decode"], 0.05)
+
+    def test_not_recording(self):
+        """Test that phases outside a recording are not measured."""
+        times = PhaseTimes()
+        with phase("validate"):
+            pass
+        with recording(times):
+            pass
+
+        self.assertEqual(times.as_dict(), {})
+        self.assertEqual(str(times), "-")
+
+    def test_validation_phases(self):
+        """Test that validating a document measures each phase it goes through, only when requested."""
+        schema = SchemaCache().get((TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix(), persistent=False)
+        xml = (TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()
+        result = validate_document(xml, schema, ValidationOptions(timings=True))
+
+        self.assertEqual(result.phases.phases(), ["fetch", "check", "parse", "validate"])
+        self.assertIsNone(validate_document(xml, schema).phases)
+
+    def test_registry_schema_phase(self):
+        """Test that compiling the schema chosen by a registry is measured for the document."""
+        registry = SchemaRegistry.build(TESTFILES_ROOT / "schemas", persistent=False)
+        xml = (TESTFILES_ROOT / "xml" / "STUDY.xml").as_posix()
+        result = validate_document(xml, registry, ValidationOptions(timings=True))
+
+        self.assertIn("schema", result.phases.phases())
+
+
+class TestTimingOptions(unittest.TestCase):
+    """Test for the timing and profiling options of the command line."""
+
+    def setUp(self):
+        """Set paths to test files."""
+        self.xml = (TESTFILES_ROOT / "xml").as_posix()
+        self.xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+
+    def test_cli_timings_json(self):
+        """Test that the JSON report has the phases of the run and of each file on standard error."""
+        result = CliRunner(mix_stderr=False).invoke(cli, ["--timings", "json", "--jobs", "2", self.xml, self.xsd])
+        report = json.loads(result.stderr)
+
+        self.assertIn("Validated 5 XML file(s)", result.stdout)
+        self.assertEqual(list(report["run"]), ["fetch", "schema"])
+        self.assertEqual(len(report["files"]), 5)
+        statuses = {Path(entry["source"]).name: entry["status"] for entry in report["files"]}
+        self.assertEqual(statuses["bad_syntax.xml"], "malformed")
+        self.assertIn("parse", report["files"][0]["phases"] | report["files"][1]["phases"])
+        self.assertEqual(set(report["total"]), {"fetch", "schema", "check", "parse", "validate"})
+        self.assertGreater(report["elapsed"], 0)
+
+    def test_cli_timings_text(self):
+        """Test the text report of a single file."""
+        xml = (TESTFILES_ROOT / "xml" / "SAMPLE.xml").as_posix()
+        result = CliRunner(mix_stderr=False).invoke(cli, ["--timings", "text", xml, self.xsd])
+
+        self.assertIn("Before validating: fetch ", result.stderr)
+        self.assertRegex(result.stderr, rf"{xml}: fetch [\d.]+/[\d.]+ s, check .*, parse .*, validate ")
+        self.assertIn("Total: ", result.stderr)
+
+    def test_cli_profile(self):
+        """Test that the profile of the run includes the validation of the documents."""
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "run.prof"
+            result = CliRunner().invoke(cli, ["--profile", str(out), self.xml, self.xsd])
+            stats = pstats.Stats(str(out))
+
+        self.assertEqual(result.exit_code, 1)
+        functions = {name for _, _, name in stats.stats}
+        self.assertIn("validate_document", functions)
+        self.assertIn("get_schema", functions)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,12 @@
 """XML Validator tests."""
 
 import unittest
+import warnings
 import responses
-from unittest.mock import patch, Mock
+from io import BytesIO
+from unittest.mock import MagicMock, patch
 from click.testing import CliRunner
+from xmlschema import XMLSchemaImportWarning
 from pathlib import Path
 
 from validator.__main__ import cli
@@ -38,6 +41,21 @@ class TestXMLValidator(unittest.TestCase):
         # The specific error message in output
         self.assertIn("Error: Missing argument 'XML_FILE'", result.output)
 
+    def test_group_help(self):
+        """Test that the help lists the commands and group options, and each command has its own help."""
+        for args in [["--help"], ["--daemon", "validator.sock", "--help"]]:
+            with self.subTest(args=args):
+                result = self.runner.invoke(cli, args)
+
+                self.assertEqual(result.exit_code, 0)
+                self.assertIn("--daemon SOCKET", result.output)
+                for command in ["validate", "serve", "serve-http", "cache"]:
+                    self.assertRegex(result.output, rf"\n  {command} +\w")
+
+        result = self.runner.invoke(cli, ["validate", "--help"])
+        self.assertIn("XML_FILE... SCHEMA_FILE", result.output)
+        self.assertIn("--schema-dir", result.output)
+
     def test_one_arg(self):
         """Test case where only one arg is passed."""
         filename = "SUBMISSION.xml"
@@ -49,18 +67,20 @@ class TestXMLValidator(unittest.TestCase):
         # The specific error message in output
         self.assertIn("Error: Missing argument 'SCHEMA_FILE'", result.output)
 
-    def test_too_many_args(self):
-        """Test case where three args are passed."""
-        xml_name = "SUBMISSION.xml"
+    def test_multiple_xml_files(self):
+        """Test case where several XML files are validated against one schema."""
         xsd_name = "SRA.submission.xsd"
-        xml = (self.xml_path / xml_name).as_posix()
+        valid = (self.xml_path / "SUBMISSION.xml").as_posix()
+        invalid = (self.xml_path / "invalid_SUBMISSION.xml").as_posix()
         xsd = (self.xsd_path / xsd_name).as_posix()
-        result = self.runner.invoke(cli, [xml, xsd, xsd])
+        result = self.runner.invoke(cli, [valid, invalid, xsd])
 
-        # Exit with code 2 (UsageError)
-        self.assertEqual(result.exit_code, 2)
-        # The specific error message in output
-        self.assertIn("Error: Got unexpected extra argument", result.output)
+        # Exit with code 1 as one of the files is invalid
+        self.assertEqual(result.exit_code, 1)
+        # A status line per file and a summary in output
+        self.assertIn(f"{valid}: valid\n", result.output)
+        self.assertIn(f"{invalid}: invalid\n", result.output)
+        self.assertIn("Validated 2 XML file(s): 1 valid, 1 invalid, 0 malformed, 0 failed.", result.output)
 
     def test_bad_filepath(self):
         """Test case where an incorrect file path is given as an arg."""
@@ -167,6 +187,29 @@ class TestXMLValidator(unittest.TestCase):
         # The correct output is given
         self.assertIn("Error:\nfailed validating", result.output)
 
+    def test_fail_fast_option(self):
+        """Test lazy validation reports the first error of an invalid XML."""
+        xml = (self.xml_path / "invalid_SUBMISSION.xml").as_posix()
+        xsd = (self.xsd_path / "SRA.submission.xsd").as_posix()
+        result = self.runner.invoke(cli, ["-v", "--fail-fast", xml, xsd])
+
+        # Exit correctly with code 0
+        self.assertEqual(result.exit_code, 0)
+        # Only the first error is given
+        self.assertIn("The XML file: invalid_SUBMISSION.xml\nis invalid.\n\nError:\nfailed validating", result.output)
+        self.assertEqual(result.output.count("Reason:"), 1)
+
+    def test_max_errors_option(self):
+        """Test that up to the requested number of errors are reported."""
+        xml = (self.xml_path / "invalid_SUBMISSION.xml").as_posix()
+        xsd = (self.xsd_path / "SRA.submission.xsd").as_posix()
+        result = self.runner.invoke(cli, ["-v", "--max-errors", "2", xml, xsd])
+
+        # Exit correctly with code 0
+        self.assertEqual(result.exit_code, 0)
+        # Two of the errors are given
+        self.assertEqual(result.output.count("Reason:"), 2)
+
     def test_valid_xml_from_url(self):
         """Test validating XML from URL."""
         with responses.RequestsMock() as rsps:
@@ -221,29 +264,39 @@ class TestXMLValidator(unittest.TestCase):
             # The correct output is given
             self.assertIn("Error: Content of the URL", result.output)
 
-    @patch("_io.BytesIO", autospec=True)
     @patch("ftplib.FTP", autospec=True)
-    def test_ftp_url(self, mock_ftp_constructor, mock_stringio):
-        """Test validating with schema from FTP URL."""
+    def test_ftp_url(self, mock_ftp_constructor):
+        """Test validating with schema from FTP URL, whose imports are downloaded over FTP as well."""
         xml_name = "SUBMISSION.xml"
         xml = (self.xml_path / xml_name).as_posix()
-        xsd_name = "SRA.submission.xsd"
-        xsd = (self.xsd_path / xsd_name).as_posix()
-        f = open(xsd, "rb")
-        schema = f.read()
-        f.close()
+        files = {
+            "/test_files/schema.xsd": (self.xsd_path / "SRA.submission.xsd").read_bytes(),
+            "/test_files/SRA.common.xsd": (self.xsd_path / "SRA.common.xsd").read_bytes(),
+        }
+
+        def transfer(cmd, rest=None):
+            conn = MagicMock()
+            conn.recv_into.side_effect = BytesIO(files[cmd.split(" ", 1)[1]]).readinto
+            return conn
 
         xsd_url = "ftp://ftp.local.server/test_files/schema.xsd"
         mock_ftp = mock_ftp_constructor.return_value
-        mock_stringio = Mock()
-        mock_stringio.read.return_value = schema
-        self.runner.invoke(cli, [xml, xsd_url])
-        mock_ftp_constructor.assert_called_with("ftp.local.server")
+        mock_ftp.size.side_effect = lambda path: len(files[path])
+        mock_ftp.transfercmd.side_effect = transfer
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            result = self.runner.invoke(cli, ["--no-schema-cache", xml, xsd_url])
+
+        self.assertEqual([str(w.message) for w in caught if issubclass(w.category, XMLSchemaImportWarning)], [])
+        self.assertIn("is valid.", result.output)
+        mock_ftp.connect.assert_called_with("ftp.local.server", 0)
 
         # enough to assert these lines are called and the coverage is achieved
         self.assertTrue(mock_ftp.login.called)
-        self.assertTrue(mock_ftp.retrbinary.called)
-        self.assertTrue(mock_ftp.close.called)
+        mock_ftp.transfercmd.assert_any_call("RETR /test_files/schema.xsd", None)
+        mock_ftp.transfercmd.assert_any_call("RETR /test_files/SRA.common.xsd", None)
+        # The connection is kept for later downloads once the server has confirmed the transfer
+        self.assertTrue(mock_ftp.voidresp.called)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+"""Watch mode tests."""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from xml.etree.ElementTree import ParseError
+
+from click.testing import CliRunner
+
+from validator.__main__ import cli
+from validator.batch import validate_many
+from validator.registry import SchemaRegistry
+from validator.schema_cache import get_schema, local_schema_files
+from validator.validation import Status
+from validator.watch import InotifyWatcher, PollingWatcher, WatchSession, debounced
+
+TESTFILES_ROOT = Path(__file__).parent / "test_files"
+
+
+class FakeWatcher:
+    """Watcher reporting a fixed sequence of changes."""
+
+    def __init__(self, changes):
+        """Initialise with the sets of paths returned by successive waits."""
+        self.changes = list(changes)
+
+    def wait(self, timeout):
+        """Return the next set of changed paths."""
+        return self.changes.pop(0)
+
+
+class TestWatchers(unittest.TestCase):
+    """Test for detecting changed files."""
+
+    def setUp(self):
+        """Create a temporary directory with a test file."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.xml = self.tmp / "SAMPLE.xml"
+        shutil.copy(TESTFILES_ROOT / "xml" / "SAMPLE.xml", self.xml)
+
+    def test_polling(self):
+        """Test that polling reports modified, created and deleted files."""
+        watcher = PollingWatcher([str(self.tmp)], interval=0.01)
+        self.assertEqual(watcher.wait(0.05), set())
+
+        with self.xml.open("a") as f:
+            f.write("\n")
+        (self.tmp / "new.xml").write_text("<SAMPLE_SET/>")
+        self.assertEqual(watcher.wait(1), {str(self.xml), str(self.tmp / "new.xml")})
+
+        self.xml.unlink()
+        self.assertEqual(watcher.wait(1), {str(self.xml)})
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "inotify is only available on Linux")
+    def test_inotify(self):
+        """Test that inotify reports files replaced by a rename and files of new subdirectories."""
+        watcher = InotifyWatcher([str(self.tmp)])
+        self.addCleanup(watcher.close)
+        self.assertEqual(watcher.wait(0.05), set())
+
+        saved = self.tmp / ".SAMPLE.xml.swp"
+        saved.write_text("<SAMPLE_SET/>")
+        os.replace(saved, self.xml)
+        self.assertIn(str(self.xml), watcher.wait(1) | watcher.wait(0.1))
+
+        (self.tmp / "sub").mkdir()
+        (self.tmp / "sub" / "STUDY.xml").write_text("<STUDY_SET/>")
+        changed = watcher.wait(1) | watcher.wait(0.1)
+        (self.tmp / "sub" / "STUDY.xml").write_text("<STUDY_SET></STUDY_SET>")
+        changed |= watcher.wait(1)
+        self.assertIn(str(self.tmp / "sub" / "STUDY.xml"), changed)
+
+    def test_debounced(self):
+        """Test that a burst of changes is reported once."""
+        watcher = FakeWatcher([{"a.xml"}, {"a.xml", "b.xml"}, set(), {"c.xml"}, set()])
+        changes = debounced(watcher)
+
+        self.assertEqual(next(changes), {"a.xml", "b.xml"})
+        self.assertEqual(next(changes), {"c.xml"})
+
+
+class TestWatchSession(unittest.TestCase):
+    """Test for choosing the documents to validate again after a change."""
+
+    def setUp(self):
+        """Copy the test documents and schemas into a temporary directory."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name).resolve()
+        self.xml = self.tmp / "xml"
+        self.xsd = self.tmp / "xsd"
+        self.xml.mkdir()
+        self.xsd.mkdir()
+        for name in ["SAMPLE.xml", "STUDY.xml"]:
+            shutil.copy(TESTFILES_ROOT / "xml" / name, self.xml)
+        for name in ["SRA.sample.xsd", "SRA.study.xsd", "SRA.common.xsd"]:
+            shutil.copy(TESTFILES_ROOT / "schemas" / name, self.xsd)
+        self.validated = []
+
+    def validate(self, documents, schema):
+        """Validate documents in this process, recording their names."""
+        self.validated.extend(Path(document).name for document in documents)
+        return validate_many(documents, schema)
+
+    def session(self, schema, schema_file=None):
+        """Start a session over the XML directory, with the results of a first validation."""
+        session = WatchSession([str(self.xml)], schema, schema_file, self.validate, persistent=False)
+        session.add(self.validate(sorted(str(path) for path in self.xml.iterdir()), schema))
+        self.validated.clear()
+        return session
+
+    def test_local_schema_files(self):
+        """Test that the files a schema depends on are found without compiling it."""
+        self.assertEqual(
+            local_schema_files(str(self.xsd / "SRA.sample.xsd")),
+            {str(self.xsd / "SRA.sample.xsd"), str(self.xsd / "SRA.common.xsd")},
+        )
+
+    def test_changed_document(self):
+        """Test that only a changed document and new documents are validated again."""
+        schema_file = str(self.xsd / "SRA.sample.xsd")
+        session = self.session(get_schema(schema_file, persistent=False), schema_file)
+        shutil.copy(self.xml / "SAMPLE.xml", self.xml / "NEW.xml")
+        results = session.update({str(self.xml / "SAMPLE.xml"), str(self.xml / "NEW.xml")})
+
+        self.assertEqual(self.validated, ["NEW.xml", "SAMPLE.xml"])
+        self.assertEqual([result.status for result in results], [Status.VALID, Status.VALID])
+        self.assertEqual(len(session.results), 3)
+        self.assertIn(str(self.xsd / "SRA.common.xsd"), session.paths())
+
+    def test_removed_document(self):
+        """Test that a removed document is forgotten."""
+        schema_file = str(self.xsd / "SRA.sample.xsd")
+        session = self.session(get_schema(schema_file, persistent=False), schema_file)
+        (self.xml / "STUDY.xml").unlink()
+
+        self.assertEqual(session.update({str(self.xml / "STUDY.xml")}), [])
+        self.assertEqual(list(session.results), [str(self.xml / "SAMPLE.xml")])
+
+    def test_changed_import(self):
+        """Test that a change of an imported schema compiles the schema again and validates all documents."""
+        schema_file = str(self.xsd / "SRA.sample.xsd")
+        schema = get_schema(schema_file, persistent=False)
+        session = self.session(schema, schema_file)
+        common = self.xsd / "SRA.common.xsd"
+        common.write_text(common.read_text() + "\n")
+        session.update({str(common)})
+
+        self.assertEqual(sorted(self.validated), ["SAMPLE.xml", "STUDY.xml"])
+        self.assertIsNot(session.schema, schema)
+
+    def test_registry_dependents(self):
+        """Test that a change of a registry schema validates only the documents depending on it."""
+        registry = SchemaRegistry.load(self.xsd, persistent=False)
+        session = self.session(registry)
+        study = self.xsd / "SRA.study.xsd"
+        study.write_text(study.read_text() + "\n")
+        session.update({str(study)})
+        self.assertEqual(self.validated, ["STUDY.xml"])
+
+        self.validated.clear()
+        session.update({str(self.xsd / "SRA.common.xsd")})
+        self.assertEqual(self.validated, ["SAMPLE.xml", "STUDY.xml"])
+
+    def test_faulty_schema(self):
+        """Test that a schema made malformed raises and keeps the previous schema."""
+        schema_file = str(self.xsd / "SRA.sample.xsd")
+        schema = get_schema(schema_file, persistent=False)
+        session = self.session(schema, schema_file)
+        Path(schema_file).write_text("<xs:schema")
+
+        with self.assertRaises(ParseError):
+            session.update({schema_file})
+        self.assertIs(session.schema, schema)
+        self.assertEqual(self.validated, [])
+
+
+class TestWatchOption(unittest.TestCase):
+    """Test for the watch option of the command line."""
+
+    def test_urls_refused(self):
+        """Test that URLs cannot be watched."""
+        xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+        result = CliRunner().invoke(cli, ["--watch", "https://example.org/SAMPLE.xml", xsd])
+
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("--watch only watches local XML files", result.output)
+
+    def test_cli_watch(self):
+        """Test that a changed file is validated again and reported until interrupted."""
+        with tempfile.TemporaryDirectory() as tmp:
+            xml = Path(tmp) / "SAMPLE.xml"
+            shutil.copy(TESTFILES_ROOT / "xml" / "SAMPLE.xml", xml)
+            xsd = (TESTFILES_ROOT / "schemas" / "SRA.sample.xsd").as_posix()
+
+            def changes(watcher):
+                xml.write_text(xml.read_text().replace("</SAMPLE_SET>", "<SAMPLE/></SAMPLE_SET>"))
+                yield {str(xml)}
+                raise KeyboardInterrupt
+
+            with patch("validator.watch.debounced", changes):
+                result = CliRunner().invoke(cli, ["--watch", "--jobs", "1", tmp, xsd])
+
+        self.assertIn("Watching 1 XML file(s)", result.output)
+        self.assertIn(f"{xml}: valid\n", result.output)
+        self.assertIn(f"{xml}: invalid\n", result.output)
+        self.assertIn("Validated 1 XML file(s): 0 valid, 1 invalid", result.output)
+        self.assertEqual(result.exit_code, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
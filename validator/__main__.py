@@ -1,147 +1,712 @@
 """XML Validator against XML Schema."""
 
-from typing import Tuple
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple, Union
 import click
 import os
-import requests
-import xmlschema
-import ftplib
-from urllib.parse import urlparse
-from xml.etree.ElementTree import ParseError
-from io import BytesIO
-from pathlib import Path
-
-# Change environment variables for Click commands to work
-os.environ["LC_ALL"] = "en_US.utf-8"
-os.environ["LANG"] = "en_US.utf-8"
-
-
-def _process_http_reponse(url: str, scheme: str) -> str:
-    """Process response from HTTP/HTTPS url."""
-    resp = requests.get(url)
-    cnt_type = ["text/plain", "xml"]
-    result = ""
-    if resp.status_code != requests.codes.ok:
-        resp.raise_for_status()
-    # we only raise upon error of protocol and content type
-    # content type can also be text/plain
-    elif scheme in ["http", "https"] and not any(x in resp.headers["Content-Type"] for x in cnt_type):
-        error = (
-            f"Error: Content of the URL ({resp.url})\n" + "is not in XML format. " + "Make sure the URL is correct.\n"
+import signal
+import time
+from click.core import ParameterSource
+
+# Only modules that load no network or validation library are imported here, so that the help
+# and commands that do not validate start quickly; the others are imported where they are used.
+from .engine import ENGINES, lxml_available
+from .fetch import DEFAULT_POOL_SIZE, configure_http_cache, configure_session, http_cache, pool_stats
+from .ftp import configure_ftp, ftp_pool_stats
+from .schema_pack import PACK_VERSION, pack_schemas
+from .timing import PhaseTimes, phase, recording
+from .utils import parse_size
+
+if TYPE_CHECKING:
+    from .batch import BatchSummary
+    from .validation import ValidationResult
+    from .watch import WatchSession
+
+
+class DefaultCommandGroup(click.Group):
+    """Command group that runs its default command unless a subcommand is named.
+
+    This keeps ``xml-validate XML_FILE SCHEMA_FILE`` working next to subcommands
+    such as ``xml-validate cache prune``.
+    """
+
+    default_command = "validate"
+
+    def parse_args(self, ctx: click.Context, args: List[str]) -> List[str]:
+        """Prepend the default command when the first argument after the group options is not a subcommand or --help."""
+        position = 0
+        while position < len(args) and (args[position] == "--daemon" or args[position].startswith("--daemon=")):
+            position += 2 if args[position] == "--daemon" else 1
+        # The help of the group itself lists the commands, the default one included
+        if position >= len(args) or args[position] not in (*self.commands, *ctx.help_option_names):
+            args.insert(min(position, len(args)), self.default_command)
+        remaining = super().parse_args(ctx, args)
+        # Kept for forwarding to a daemon, as click clears them before running the group callback
+        ctx.meta["validator.command_line"] = [*ctx.protected_args, *ctx.args]
+        return remaining
+
+
+@click.group(cls=DefaultCommandGroup)
+@click.option(
+    "--daemon",
+    metavar="SOCKET",
+    envvar="XML_VALIDATE_DAEMON",
+    help="Run the command in the validation daemon listening on this socket, see `xml-validate serve --help`.",
+)
+@click.pass_context
+def cli(ctx: click.Context, daemon: Optional[str]) -> None:
+    """Validate XML files against XSD Schemas.
+
+    Without a command, XML_FILE... SCHEMA_FILE are given to the validate command, see
+    `xml-validate validate --help` for its options.
+    """
+    if daemon is None:
+        return None
+    if ctx.invoked_subcommand != DefaultCommandGroup.default_command:
+        if ctx.get_parameter_source("daemon") is ParameterSource.ENVIRONMENT:
+            # $XML_VALIDATE_DAEMON only sends validations, other commands run here
+            return None
+        raise click.UsageError(f"--daemon only runs the validate command, not {ctx.invoked_subcommand}.")
+    command_line = ctx.meta["validator.command_line"]
+    with validate.make_context(command_line[0], command_line[1:], parent=ctx, resilient_parsing=True) as sub:
+        if sub.params.get("watch"):
+            # The daemon answers one client at a time, a watch loop would keep it from all others
+            return None
+    from .daemon import send_request
+
+    try:
+        code = send_request(daemon, command_line)
+    except OSError as err:
+        raise click.ClickException(f"Cannot use the validation daemon on {daemon}: {err}")
+    ctx.exit(code)
+
+
+def _echo_result(result: "ValidationResult", verbose: bool) -> None:
+    """Print the result of validating a single XML document."""
+    from .validation import Status
+
+    if result.status in (Status.UNAVAILABLE, Status.UNKNOWN):
+        click.echo(result.errors[0])
+        return None
+
+    if result.status is Status.MALFORMED:
+        # If there is a syntax error with the file
+        click.echo("Faulty XML or XSD file was given.\n")
+        if verbose:
+            click.echo(f"Error: {result.errors[0]}")
+        return None
+
+    if result.status is Status.ERROR:
+        _echo_unexpected_error(result.errors[0], verbose)
+        return None
+
+    if result.from_url:
+        click.echo(f"The XML from the URL:\n{result.source}")
+    else:
+        click.echo("The XML file: " + click.format_filename(result.source, shorten=True))
+    if verbose and result.schema is not None:
+        click.echo(f"Schema: {result.schema}")
+    if result.valid:
+        click.secho("is valid.\n", fg="green")
+    else:
+        click.secho("is invalid.\n", fg="red")
+        if verbose:
+            click.secho("Error:", bold=True)
+            click.echo("\n".join(result.errors))
+
+
+def _echo_batch_result(result: "ValidationResult", verbose: bool) -> None:
+    """Print the status line of one XML document validated in batch mode."""
+    click.echo(f"{result.source}: ", nl=False)
+    click.secho(result.status.value, fg="green" if result.valid else "red", nl=result.schema is None)
+    if result.schema is not None:
+        click.echo(f" ({result.schema})")
+    if verbose:
+        for error in result.errors:
+            click.echo(error)
+
+
+def _echo_unexpected_error(error: str, verbose: bool) -> None:
+    """Print an unexpected validation error."""
+    if not verbose:
+        click.echo(
+            "\nValidation ran into an unexpected error." + " Run command with --verbose option for more details\n"
         )
-        raise Exception(error)
     else:
-        result = resp.text
-    return result
+        click.echo(f"Error: {error}")
+
+
+def _echo_pool_stats(verbose: bool) -> None:
+    """Print HTTP and FTP connection and cache use when anything was downloaded."""
+    stats = pool_stats()
+    if verbose and stats.requests:
+        click.echo(str(stats))
+    ftp_stats = ftp_pool_stats()
+    if verbose and ftp_stats.transfers:
+        click.echo(str(ftp_stats))
+    downloads = http_cache()
+    if verbose and downloads is not None and downloads.hits + downloads.revalidated + downloads.misses:
+        click.echo(
+            f"HTTP cache: {downloads.hits} hit(s), {downloads.revalidated} revalidated, {downloads.misses} miss(es)."
+        )
+
+
+def _echo_result_cache(enabled: bool, hits: int, verbose: bool) -> None:
+    """Print how many verdicts came from the result cache, and keep the cache within its size."""
+    if not enabled:
+        return None
+    from .result_cache import result_cache
+
+    if verbose:
+        click.echo(f"Result cache: {hits} hit(s).")
+    result_cache.prune(result_cache.max_size)
+    result_cache.close()
+
+
+def _echo_timings(fmt: str, run_times: PhaseTimes, results: List["ValidationResult"], elapsed: float) -> None:
+    """Print the wall and CPU time of each phase, for the run and each document, on standard error.
+
+    :param fmt: ``text`` for one line per document, or ``json`` for a JSON object
+    :param run_times: Time spent before validating documents, such as building the schema
+    :param results: Results of the documents, with their phase times
+    :param elapsed: Wall time of the whole run, less than the sum of the documents with several jobs
+    """
+    import json
+
+    total = PhaseTimes()
+    total.add(run_times)
+    for result in results:
+        if result.phases is not None:
+            total.add(result.phases)
+    if fmt == "json":
+        report = {
+            "elapsed": round(elapsed, 6),
+            "run": run_times.as_dict(),
+            "files": [
+                {
+                    "source": result.source,
+                    "status": result.status.value,
+                    "cached": result.cached,
+                    "phases": result.phases.as_dict() if result.phases is not None else {},
+                }
+                for result in results
+            ],
+            "total": total.as_dict(),
+        }
+        click.echo(json.dumps(report, indent=2), err=True)
+        return None
+    click.echo("\nTime per phase (wall/CPU):", err=True)
+    click.echo(f"Before validating: {run_times}", err=True)
+    for result in results:
+        click.echo(f"{result.source}: {'cached' if result.cached else result.phases}", err=True)
+    click.echo(f"Total: {total}, elapsed {elapsed:.3f} s", err=True)
+
+
+def _start_profile(path: str) -> Callable[[], None]:
+    """Start profiling this process with cProfile.
+
+    :returns: Function stopping the profiler and writing its statistics to a file
+    """
+    import cProfile
+
+    profiler = cProfile.Profile()
+
+    def stop() -> None:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+    profiler.enable()
+    return stop
+
+
+def _watch(session: "WatchSession", batch: bool, verbose: bool) -> "BatchSummary":
+    """Validate the documents of a watch session again whenever they change, until interrupted.
 
+    :returns: Summary of the latest results of all documents
+    """
+    from xml.etree.ElementTree import ParseError
 
-def xmlFromURL(url: str, arg_type: str) -> Tuple[str, str]:
-    """Deterimine if argument is an URL and return content from the URL."""
-    scheme = urlparse(url).scheme
+    import xmlschema
 
+    from .watch import debounced, open_watcher
+
+    watcher = open_watcher(session.paths())
+    click.echo(f"\nWatching {len(session.results)} XML file(s) and their schemas for changes, press Ctrl-C to stop.")
     try:
-        # Handle FTP or file URLs
-        if scheme == "file":
-            raise ValueError
-        elif scheme == "ftp":
-            host = urlparse(url).netloc
-            path = urlparse(url).path
-            ftp = ftplib.FTP(host)
-            ftp.login()
-            r = BytesIO()
-            ftp.retrbinary("RETR " + path, r.write)
-            byte_str = r.read()
-            content = byte_str.decode("UTF-8")  # Or use the encoding you expect
-            r.close()
-            ftp.close()
-            return content, url
-        else:
-            content = _process_http_reponse(url, scheme)
-            return content, url
-
-    except ValueError:
-        # If argument is a file URL type or not an URL at all
-        if scheme == "file":
-            url = url.replace("file://", "")
-
-        file_path = Path(url)
-        if not file_path.is_file():
-            error = f"Error: Invalid value for {arg_type}\n" + f"Path {url} does not exist.\n"
-            raise Exception(error)
-        else:
-            return str(file_path.absolute()), url
-
-    except requests.exceptions.HTTPError as err:
-        # If request responds with HTTP error
-        error = str(err) + "" + url + "\nMake sure the URL is correct.\n"
-        raise Exception(error)
-
-    except ftplib.Error as err:
-        # If request responds with FTP error
-        error = str(err) + f" ({url})\nMake sure the URL is correct.\n"
-        raise Exception(error)
-
-
-@click.command()
-@click.argument("xml_file")
-@click.argument("schema_file")
+        for changed in debounced(watcher):
+            try:
+                results = session.update(changed)
+            except ParseError as err:
+                click.echo("Faulty XML or XSD file was given.\n")
+                if verbose:
+                    click.echo(f"Error: {err}")
+                continue
+            except xmlschema.exceptions.XMLSchemaException as err:
+                _echo_unexpected_error(str(err), verbose)
+                continue
+            except Exception as error:
+                click.echo(error)
+                continue
+            if not results:
+                continue
+            click.echo()
+            for result in results:
+                if batch:
+                    _echo_batch_result(result, verbose)
+                else:
+                    _echo_result(result, verbose)
+            if batch:
+                click.echo(f"\n{_latest_summary(session)}")
+            # Documents or imported schemas added since the watches were set up
+            watcher.add(session.paths())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return _latest_summary(session)
+
+
+def _latest_summary(session: "WatchSession") -> "BatchSummary":
+    """Return the summary of the latest results of the documents of a watch session."""
+    from .batch import BatchSummary
+
+    summary = BatchSummary()
+    for result in session.results.values():
+        summary.add(result)
+    return summary
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, metavar="XML_FILE... SCHEMA_FILE")
 @click.option("-v", "--verbose", is_flag=True, help="Verbose printout for XML validation errors.")
-def cli(xml_file: str, schema_file: str, verbose: str) -> None:
-    """Validate an XML against an XSD SCHEMA."""
-    xml_from_url = False
+@click.option(
+    "--schema",
+    "schema_name",
+    type=click.Choice(sorted(pack_schemas()), case_sensitive=False),
+    help=f"Validate against this schema of the bundled ENA/SRA/EGA schema pack {PACK_VERSION}, instead of SCHEMA_FILE.",
+)
+@click.option(
+    "--schema-dir",
+    type=click.Path(exists=True, file_okay=False),
+    envvar="XML_VALIDATE_SCHEMA_DIR",
+    help="Choose the schema of each XML file from this directory by its root element, instead of SCHEMA_FILE.",
+)
+@click.option("--no-schema-cache", is_flag=True, help="Compile the schema without using the persistent schema cache.")
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help="Number of worker processes for validating several XML files.  [default: number of CPUs]",
+)
+@click.option("--ordered", is_flag=True, help="Report results in input order instead of completion order.")
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Validate large *_SET documents record by record in bounded memory (skips checks spanning records).",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    help="Parse the XML lazily and stop at the first validation error, or after --max-errors errors.",
+)
+@click.option(
+    "--max-errors",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of validation errors collected for an invalid XML file.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default="xmlschema",
+    show_default=True,
+    help="Validate with xmlschema, or with libxml2 from the optional lxml package; auto uses lxml when installed.",
+)
+@click.option(
+    "--http-pool-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_POOL_SIZE,
+    show_default=True,
+    help="Number of kept-alive HTTP connections per host for URL inputs.",
+)
+@click.option(
+    "--fetch-workers",
+    type=click.IntRange(min=0),
+    default=8,
+    show_default=True,
+    help="Number of URL inputs downloaded concurrently while others are validated, 0 to download one at a time.",
+)
+@click.option(
+    "--per-host",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of concurrent downloads from any single host.",
+)
+@click.option("--no-http-cache", is_flag=True, help="Download URLs without using the persistent HTTP cache.")
+@click.option("--offline", is_flag=True, help="Serve URLs only from the HTTP cache, without network access.")
+@click.option(
+    "--ftp-block-size",
+    default="64K",
+    show_default=True,
+    help="Bytes read at a time from FTP data connections (e.g. 8K, 1M).",
+)
+@click.option("--ftp-active", is_flag=True, help="Use active instead of passive mode for FTP downloads.")
+@click.option(
+    "--ftp-retries",
+    type=click.IntRange(min=0),
+    default=3,
+    show_default=True,
+    help="Number of times an interrupted FTP download is resumed where it stopped.",
+)
+@click.option(
+    "--ftp-connections",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of logged-in FTP connections per host, reused for later downloads.",
+)
+@click.option(
+    "--result-cache",
+    is_flag=True,
+    envvar="XML_VALIDATE_RESULT_CACHE",
+    help="Reuse the verdicts of local XML files unchanged since they were last validated against the same schema.",
+)
+@click.option(
+    "--timings",
+    type=click.Choice(["text", "json"]),
+    help="Report the wall and CPU time of each phase, for each XML file and in total, on standard error.",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, writable=True),
+    metavar="OUT",
+    help="Write cProfile statistics of the run to OUT, for pstats. Validates in one process unless --jobs is given.",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Keep running and validate XML files again when they or their local schemas change.",
+)
+@click.pass_context
+def validate(
+    ctx: click.Context,
+    paths: Tuple[str, ...],
+    verbose: bool,
+    schema_name: Optional[str],
+    schema_dir: Optional[str],
+    no_schema_cache: bool,
+    jobs: Optional[int],
+    ordered: bool,
+    stream: bool,
+    fail_fast: bool,
+    max_errors: int,
+    engine: str,
+    http_pool_size: int,
+    fetch_workers: int,
+    per_host: int,
+    no_http_cache: bool,
+    offline: bool,
+    ftp_block_size: str,
+    ftp_active: bool,
+    ftp_retries: int,
+    ftp_connections: int,
+    result_cache: bool,
+    timings: Optional[str],
+    profile_path: Optional[str],
+    watch: bool,
+) -> None:
+    """Validate XML files against an XSD SCHEMA.
 
-    try:
-        xml_file, requested_url = xmlFromURL(xml_file, "XML_FILE")
-        if not xml_file.startswith("/"):
-            xml_from_url = True
+    Each XML_FILE can be a path, an URL, a glob, a directory searched recursively for *.xml
+    files, or @FILE naming a list of inputs, one per line. When more than one XML file is given,
+    every file gets a status line followed by a summary, and the exit code is 1 unless all files are valid.
 
-        xsd_resp, _ = xmlFromURL(schema_file, "SCHEMA_FILE")
-        if xsd_resp:
-            schema_file = str(xsd_resp)
+    With --schema, SCHEMA_FILE is left out and the XML files are validated against a schema of the bundled
+    pack, such as sra.sample, which is loaded precompiled and without network access.
 
-    except Exception as error:
-        click.echo(error)
-        return None
+    With --schema-dir, SCHEMA_FILE is left out and each XML file is validated against the schema of the
+    directory declaring its root element, such as SRA.sample.xsd for a SAMPLE_SET.
+
+    With --engine lxml or auto, documents are validated by libxml2, which is many times faster on large
+    documents. Schemas libxml2 does not support, such as XSD 1.1 or remote schemas, and --stream are
+    validated by xmlschema.
+
+    With --watch, the XML files, the directories they are in and the local schema files are watched after the
+    first validation, and each file is validated again against the schema kept in memory as soon as it or a
+    schema it depends on changes, until Ctrl-C.
+
+    With --timings, the time spent fetching, decoding, building the schema, checking well-formedness, parsing
+    and validating is reported for each XML file. With --profile, the run is profiled with cProfile.
 
+    With --result-cache, the verdict of each local XML file is kept, and reused until the file, the schema
+    or the validation engine changes.
+
+    Compiled schemas are cached under ~/.cache/xml-validate, see `xml-validate cache prune --help`.
+    """
+    from xml.etree.ElementTree import ParseError
+
+    import xmlschema
+
+    from .batch import BatchSummary, default_jobs, expand_inputs, is_url, validate_many
+    from .engine import lxml_schema
+    from .fetch import xmlFromURL
+    from .registry import SchemaRegistry
+    from .schema_cache import get_schema
+    from .schema_pack import load_pack_schema
+    from .validation import ValidationOptions, ValidationResult, validate_document
+
+    start = time.perf_counter()
+    if profile_path is not None:
+        ctx.call_on_close(_start_profile(profile_path))
+        # Validation in worker processes would be missing from the profile
+        jobs = jobs or 1
+    configure_session(http_pool_size)
+    configure_http_cache(enabled=not no_http_cache, offline=offline)
     try:
-        xmlschema.validate(xml_file, schema=schema_file)  # type: ignore
-        # When validation succeeds
-        if xml_from_url:
-            click.echo(f"The XML from the URL:\n{requested_url}")
-            click.secho("is valid.\n", fg="green")
-        else:
-            click.echo("The XML file: " + click.format_filename(str(xml_file), shorten=True))
-            click.secho("is valid.\n", fg="green")
-
-    except xmlschema.validators.exceptions.XMLSchemaValidationError as err:
-        # When validation does not succeed
-        if xml_from_url:
-            click.echo(f"The XML from the URL:\n{requested_url}")
-            click.secho("is invalid.\n", fg="red")
-        else:
-            click.echo("The XML file: " + click.format_filename(str(xml_file), shorten=True))
-            click.secho("is invalid.\n", fg="red")
-        if verbose:
-            click.secho("Error:", bold=True)
-            click.echo(err)
+        block_size = parse_size(ftp_block_size)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="'--ftp-block-size'")
+    configure_ftp(max(block_size, 1), passive=not ftp_active, retries=ftp_retries, connections=ftp_connections)
+    if not paths:
+        raise click.MissingParameter(ctx=ctx, param_hint="'XML_FILE'", param_type="argument")
+    if schema_name is not None and ctx.get_parameter_source("schema_dir") is ParameterSource.ENVIRONMENT:
+        schema_dir = None
+    if schema_name is not None and schema_dir is not None:
+        raise click.UsageError("--schema and --schema-dir cannot be used together.", ctx=ctx)
+    if engine == "lxml" and not lxml_available():
+        raise click.UsageError("--engine lxml needs the lxml package, install it with `pip install .[lxml]`.", ctx=ctx)
+    implicit_schema = schema_name is not None or schema_dir is not None
+    if len(paths) == 1 and not implicit_schema:
+        raise click.MissingParameter(ctx=ctx, param_hint="'SCHEMA_FILE'", param_type="argument")
+    xml_files, schema_file = (list(paths), None) if implicit_schema else (list(paths[:-1]), paths[-1])
+
+    try:
+        documents, batch = expand_inputs(xml_files)
+    except OSError as err:
+        click.echo(f"Error: Invalid value for XML_FILE\n{err}\n")
+        ctx.exit(1)
+    if watch and ctx.find_root().obj is not None:
+        # The root context of a command run by the validation daemon carries the request of its client
+        raise click.UsageError("--watch cannot run in the validation daemon, run it without --daemon.", ctx=ctx)
+    if watch and any(is_url(document) for document in documents):
+        raise click.UsageError("--watch only watches local XML files, not URLs.", ctx=ctx)
+
+    schema_url = None
+    schema: Union[xmlschema.XMLSchema, SchemaRegistry]
+    run_times = PhaseTimes()
+    try:
+        with recording(run_times):
+            if schema_name is not None:
+                with phase("schema"):
+                    schema = load_pack_schema(schema_name, persistent=not no_schema_cache)
+            elif schema_file is None:
+                with phase("schema"):
+                    schema = SchemaRegistry.load(str(schema_dir), persistent=not no_schema_cache)
+            else:
+                with phase("fetch"):
+                    xsd_resp, requested_schema = xmlFromURL(schema_file, "SCHEMA_FILE")
+                if not xsd_resp.startswith("/"):
+                    schema_url = requested_schema
+                with phase("schema"):
+                    schema = get_schema(xsd_resp, schema_url, persistent=not no_schema_cache)
 
     except ParseError as err:
-        # If there is a syntax error with either file
+        # If there is a syntax error with the schema
         click.echo("Faulty XML or XSD file was given.\n")
         if verbose:
             click.echo(f"Error: {err}")
+        ctx.exit(1 if batch else 0)
 
     except xmlschema.exceptions.XMLSchemaException as err:
-        if not verbose:
-            click.echo(
-                "\nValidation ran into an unexpected error." + " Run command with --verbose option for more details\n"
-            )
-        else:
-            click.echo(f"Error: {err}")
+        _echo_unexpected_error(str(err), verbose)
+        ctx.exit(1 if batch else 0)
+
+    except Exception as error:
+        click.echo(error)
+        ctx.exit(1 if batch else 0)
+
+    options = ValidationOptions(
+        stream=stream,
+        fail_fast=fail_fast,
+        max_errors=max_errors,
+        engine=engine,
+        result_cache=result_cache,
+        timings=timings is not None,
+    )
+    if isinstance(schema, xmlschema.XMLSchema) and engine != "xmlschema" and not stream:
+        # Compiled before the batch workers are forked, which then share it
+        with recording(run_times), phase("schema"):
+            lxml_schema(schema)
+    timed: List[ValidationResult] = []
+    session = None
+    if watch:
+        from .watch import WatchSession
+
+        session = WatchSession(
+            xml_files,
+            schema,
+            xsd_resp if schema_file is not None and schema_url is None else None,
+            lambda changed, current: validate_many(
+                changed, current, jobs or default_jobs(), True, options, fetch_workers, per_host
+            ),
+            persistent=not no_schema_cache,
+        )
+    if not batch:
+        result = validate_document(documents[0], schema, options)
+        _echo_result(result, verbose)
+        _echo_pool_stats(verbose)
+        _echo_result_cache(result_cache, int(result.cached), verbose)
+        if timings is not None:
+            _echo_timings(timings, run_times, [result], time.perf_counter() - start)
+        if session is not None:
+            session.add([result])
+            _watch(session, batch, verbose)
+        return None
+
+    summary = BatchSummary()
+    for result in validate_many(documents, schema, jobs or default_jobs(), ordered, options, fetch_workers, per_host):
+        summary.add(result)
+        _echo_batch_result(result, verbose)
+        if timings is not None:
+            timed.append(result)
+        if session is not None:
+            session.add([result])
+    click.echo(f"\n{summary}")
+    click.echo(summary.phases)
+    if verbose:
+        click.echo(summary.times)
+    _echo_pool_stats(verbose)
+    _echo_result_cache(result_cache, summary.cached, verbose)
+    if timings is not None:
+        _echo_timings(timings, run_times, timed, time.perf_counter() - start)
+    if session is not None:
+        summary = _watch(session, batch, verbose)
+    if not summary.all_valid:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.option("--socket", "socket_path", required=True, metavar="PATH", help="Unix socket to listen on.")
+def serve(socket_path: str) -> None:
+    """Run a validation daemon keeping compiled schemas in memory between commands.
+
+    Commands given with `xml-validate --daemon PATH ...` are run by the daemon one at a time, in the
+    directory of the client and with the same output, without paying for starting Python, importing
+    the validator and compiling the schema on each call. Stop the daemon with Ctrl-C or SIGTERM.
+    """
+    from .daemon import ValidationServer
+
+    # Commands run by the daemon are never forwarded to it again
+    os.environ.pop("XML_VALIDATE_DAEMON", None)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server = ValidationServer(socket_path, cli)
+    except OSError as err:
+        raise click.ClickException(str(err))
+    click.echo(f"Validation daemon listening on {socket_path}")
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.command("serve-http")
+@click.option("--host", default="127.0.0.1", show_default=True, help="Address to listen on.")
+@click.option("--port", default=8080, show_default=True, type=click.IntRange(0, 65535), help="Port to listen on.")
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    help="Number of worker processes validating requests. [default: number of CPUs]",
+)
+@click.option(
+    "--queue-size",
+    default=16,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Number of requests waiting for a worker before further requests are answered with 503.",
+)
+@click.option("--max-body-size", default="100M", show_default=True, help="Largest request body accepted.")
+@click.option(
+    "--schema-dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Offer the schemas of this directory in addition to the bundled schema pack.",
+)
+@click.option("-v", "--verbose", is_flag=True, help="Log each request.")
+def serve_http(
+    host: str,
+    port: int,
+    workers: Optional[int],
+    queue_size: int,
+    max_body_size: str,
+    schema_dir: Optional[str],
+    verbose: bool,
+) -> None:
+    """Run an HTTP service validating XML documents posted to it.
+
+    POST an XML document to /validate?schema=sra.sample, or POST to /validate?schema=sra.sample&url=URL,
+    and get the result as JSON. Without the schema parameter the schema is chosen by the root element
+    of the document. GET /schemas lists the schema ids and GET /health the load of the service.
+    """
+    try:
+        body_limit = parse_size(max_body_size)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="'--max-body-size'")
+    from .batch import default_jobs
+    from .service import ValidationService
+
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        service = ValidationService(
+            (host, port), workers or default_jobs(), queue_size, body_limit, schema_dir, verbose
+        )
+    except OSError as err:
+        raise click.ClickException(str(err))
+    click.echo(f"Validation service listening on http://{host}:{service.server_address[1]}")
+    with service:
+        try:
+            service.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.group()
+def cache() -> None:
+    """Manage the persistent caches of compiled schemas, downloads and validation results."""
+
+
+@cache.command()
+@click.option(
+    "--max-size",
+    default="256M",
+    show_default=True,
+    help="Evict least recently used entries until each cache fits in this size (e.g. 512K, 100M, 1G).",
+)
+@click.option("--max-age", type=float, help="Evict entries not used within this many days.")
+def prune(max_size: str, max_age: Optional[float]) -> None:
+    """Evict compiled schemas, downloads and validation results from the persistent caches."""
+    try:
+        size_limit = parse_size(max_size)
+    except ValueError as err:
+        raise click.BadParameter(str(err), param_hint="'--max-size'")
+
+    from .result_cache import result_cache
+    from .schema_cache import schema_cache
+
+    age_limit = max_age * 24 * 60 * 60 if max_age is not None else None
+    store = schema_cache.store
+    if store is not None:
+        removed, freed = store.prune(size_limit, age_limit)
+        click.echo(f"Removed {removed} cached schema(s), freed {freed / 1024**2:.1f} MiB.")
+    downloads = http_cache()
+    if downloads is not None:
+        removed, freed = downloads.prune(size_limit, age_limit)
+        click.echo(f"Removed {removed} cached download(s), freed {freed / 1024**2:.1f} MiB.")
+    removed, freed = result_cache.prune(size_limit, age_limit)
+    click.echo(f"Removed {removed} cached result(s), freed {freed / 1024**2:.1f} MiB.")
 
 
 if __name__ == "__main__":
     cli()
-    # Revert environment variables back
-    os.unsetenv("LC_ALL")
-    os.unsetenv("LANG")
@@ -0,0 +1,279 @@
+"""Validation of many XML documents against one shared schema."""
+
+import fnmatch
+import glob
+import multiprocessing
+import posixpath
+import os
+import signal
+from collections import Counter, defaultdict, deque
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, DefaultDict, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+import xmlschema
+
+from .compression import COMPRESSED_SUFFIXES
+from .fetch import FetchedDocument, http_cache, prefetch_documents
+from .ftp import list_ftp_directory
+from .registry import SchemaRegistry
+from .validation import Status, ValidationOptions, ValidationResult, validate_document, validate_fetched
+
+XML_SUFFIXES = (".xml",) + tuple(".xml" + suffix for suffix in COMPRESSED_SUFFIXES)
+
+
+def is_url(arg: str) -> bool:
+    """Return whether an input argument is an URL rather than a local path."""
+    return urlparse(arg).scheme in ("http", "https", "ftp", "file")
+
+
+def _is_remote(arg: str) -> bool:
+    """Return whether an input argument is fetched over the network."""
+    return urlparse(arg).scheme in ("http", "https", "ftp")
+
+
+def _expand_ftp(url: str) -> Tuple[List[str], bool]:
+    """Expand an FTP directory or a glob in the file name of an FTP URL by listing the directory once.
+
+    :returns: Expanded documents and whether the URL named more than a single document
+    """
+    pattern = posixpath.basename(urlparse(url).path)
+    if pattern and not glob.has_magic(pattern):
+        return [url], False
+    downloads = http_cache()
+    if downloads is not None and downloads.offline:
+        raise OSError(f"{url} cannot be listed in offline mode")
+    import ftplib
+
+    try:
+        entries = list_ftp_directory(url.rsplit("/", 1)[0] + "/" if pattern else url)
+    except ftplib.all_errors as err:
+        raise OSError(f"Cannot list {url}: {err}") from err
+    if not pattern:
+        return [entry for entry in entries if entry.lower().endswith(XML_SUFFIXES)], True
+    # A pattern without matches is kept so that it is reported as a missing file
+    return [entry for entry in entries if fnmatch.fnmatchcase(posixpath.basename(entry), pattern)] or [url], True
+
+
+def _expand(arg: str) -> Tuple[List[str], bool]:
+    """Expand one input argument into XML document paths or URLs.
+
+    :returns: Expanded documents and whether the argument named more than a single document
+    """
+    if urlparse(arg).scheme == "ftp":
+        return _expand_ftp(arg)
+    if is_url(arg):
+        return [arg], False
+
+    path = Path(arg)
+    if path.is_dir():
+        documents = sorted(
+            str(child) for child in path.rglob("*") if child.is_file() and child.name.lower().endswith(XML_SUFFIXES)
+        )
+        return documents, True
+    if not path.exists() and glob.has_magic(arg):
+        # A pattern without matches is kept so that it is reported as a missing file
+        return sorted(glob.glob(arg, recursive=True)) or [arg], True
+    return [arg], False
+
+
+def expand_inputs(args: Iterable[str]) -> Tuple[List[str], bool]:
+    """Expand XML paths, globs, directories and ``@listfile`` manifests.
+
+    Directories are searched recursively for ``*.xml`` files, compressed or not. FTP directory URLs, ending with a
+    ``/``, and FTP URLs with a glob in the file name are expanded from a single listing of the directory on the
+    server, without descending into subdirectories. A manifest named with a leading
+    ``@`` lists one input per line, blank lines and lines starting with ``#`` are skipped.
+
+    :param args: Input arguments as given on the command line
+    :returns: XML documents to validate and whether the inputs are a batch of documents
+    """
+    documents: List[str] = []
+    batch = False
+    for arg in args:
+        if arg.startswith("@"):
+            batch = True
+            with open(arg[1:], encoding="UTF-8") as manifest:
+                entries = [line.strip() for line in manifest]
+            for entry in entries:
+                if entry and not entry.startswith("#"):
+                    documents.extend(_expand(entry)[0])
+            continue
+        expanded, multiple = _expand(arg)
+        documents.extend(expanded)
+        batch = batch or multiple
+    return documents, batch or len(documents) > 1
+
+
+# Compiled schema or schema registry of a worker process, set once by the pool initializer
+_worker_schema: Optional[Union[xmlschema.XMLSchema, SchemaRegistry]] = None
+
+
+def default_jobs() -> int:
+    """Return the number of CPUs available to this process."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _init_worker(schema: Union[xmlschema.XMLSchema, SchemaRegistry]) -> None:
+    """Keep the compiled schema for all documents validated by this worker."""
+    global _worker_schema
+    _worker_schema = schema
+    # Workers forked from the validation daemon would otherwise inherit its SIGTERM handler
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _in_worker(item: object, task: Callable[[Any, Any], ValidationResult]) -> ValidationResult:
+    """Run a validation task against the schema of this worker."""
+    assert _worker_schema is not None  # nosec
+    return task(item, _worker_schema)
+
+
+def _validate_prefetched(
+    item: Tuple[str, Union[FetchedDocument, Exception]],
+    schema: Union[xmlschema.XMLSchema, SchemaRegistry],
+    options: ValidationOptions,
+) -> ValidationResult:
+    """Validate a document handed over by the fetch stage."""
+    source, document = item
+    if isinstance(document, Exception):
+        return ValidationResult(source, Status.UNAVAILABLE, [str(document)])
+    return validate_fetched(document, schema, options)
+
+
+def _picklable(
+    items: Iterable[Tuple[str, Union[FetchedDocument, Exception]]],
+) -> Iterator[Tuple[str, Union[FetchedDocument, Exception]]]:
+    """Replace fetch errors, which may hold unpicklable state, by plain exceptions."""
+    for source, document in items:
+        yield source, Exception(str(document)) if isinstance(document, Exception) else document
+
+
+def _in_input_order(results: Iterable[ValidationResult], documents: List[str]) -> Iterator[ValidationResult]:
+    """Reorder results arriving in completion order into the order of the documents."""
+    positions: DefaultDict[str, Deque[int]] = defaultdict(deque)
+    for position, document in enumerate(documents):
+        positions[document].append(position)
+    waiting: Dict[int, ValidationResult] = {}
+    next_position = 0
+    for result in results:
+        waiting[positions[result.source].popleft()] = result
+        while next_position in waiting:
+            yield waiting.pop(next_position)
+            next_position += 1
+
+
+def validate_many(
+    documents: List[str],
+    schema: Union[xmlschema.XMLSchema, SchemaRegistry],
+    jobs: int = 1,
+    ordered: bool = True,
+    options: ValidationOptions = ValidationOptions(),
+    fetch_workers: int = 8,
+    per_host: int = 4,
+) -> Iterator[ValidationResult]:
+    """Validate XML documents against the same compiled schema.
+
+    With more than one job the documents are validated in a pool of worker processes. Each worker
+    receives the compiled schema once when it starts, which costs nothing when the platform forks
+    the workers and one deserialization per worker otherwise.
+
+    Given a schema registry instead of a compiled schema, each document is validated against the schema
+    declaring its root element. Workers then compile each schema they need once, or load it from the
+    persistent store.
+
+    When any document is an URL, documents are fetched by a separate pool of threads that feeds
+    the validation stage through a bounded queue, see :func:`prefetch_documents`.
+
+    :param documents: Paths or URLs of the XML documents
+    :param schema: Compiled schema to validate against, or a registry to choose it from for each document
+    :param jobs: Number of worker processes
+    :param ordered: Yield results in input order instead of completion order
+    :param options: How to validate each document
+    :param fetch_workers: Number of concurrent fetches, 0 to fetch each document when it is validated
+    :param per_host: Number of concurrent fetches from any single host
+    :returns: Iterator over the validation results
+    """
+    jobs = min(jobs, len(documents))
+    items: Iterable[Any] = documents
+    task: Callable[[Any, Any], ValidationResult] = partial(validate_document, options=options)
+    prefetch = fetch_workers > 0 and any(_is_remote(document) for document in documents)
+    if prefetch:
+        queue_size = 2 * max(jobs, fetch_workers)
+        items = _picklable(prefetch_documents(documents, fetch_workers, per_host, queue_size))
+        task = partial(_validate_prefetched, options=options)
+
+    results: Iterator[ValidationResult]
+    if jobs <= 1:
+        results = (task(item, schema) for item in items)
+        yield from _in_input_order(results, documents) if prefetch and ordered else results
+        return
+
+    # Small chunks keep results streaming while amortizing the inter-process overhead
+    chunksize = 1 if prefetch else max(1, min(16, len(documents) // (jobs * 4)))
+    with multiprocessing.Pool(jobs, _init_worker, (schema,)) as pool:
+        if prefetch:
+            # Fetched documents already arrive in completion order
+            results = pool.imap(partial(_in_worker, task=task), items, chunksize)
+            yield from _in_input_order(results, documents) if ordered else results
+        elif ordered:
+            yield from pool.imap(partial(_in_worker, task=task), items, chunksize)
+        else:
+            yield from pool.imap_unordered(partial(_in_worker, task=task), items, chunksize)
+
+
+class BatchSummary:
+    """Running count of validation results by status."""
+
+    def __init__(self) -> None:
+        """Initialise an empty summary."""
+        self.counts: Counter = Counter()
+        self.fetch_time = 0.0
+        self.check_time = 0.0
+        self.validate_time = 0.0
+        # Documents whose verdict was read from the result cache
+        self.cached = 0
+
+    def add(self, result: ValidationResult) -> None:
+        """Count a validation result."""
+        self.counts[result.status] += 1
+        self.fetch_time += result.fetch_time
+        self.check_time += result.check_time
+        self.validate_time += result.validate_time
+        self.cached += result.cached
+
+    @property
+    def times(self) -> str:
+        """Return a one line summary of the time spent in each stage."""
+        return (
+            f"Time spent fetching: {self.fetch_time:.2f} s, checking well-formedness: {self.check_time:.2f} s, "
+            f"validating: {self.validate_time:.2f} s."
+        )
+
+    @property
+    def phases(self) -> str:
+        """Return a one line summary of the documents rejected by each phase."""
+        return (
+            f"Rejected by the well-formedness check: {self.counts[Status.MALFORMED]}, "
+            f"by schema validation: {self.counts[Status.INVALID]}."
+        )
+
+    @property
+    def total(self) -> int:
+        """Number of documents counted."""
+        return sum(self.counts.values())
+
+    @property
+    def all_valid(self) -> bool:
+        """Whether every counted document was valid."""
+        return self.counts[Status.VALID] == self.total
+
+    def __str__(self) -> str:
+        """Return a one line summary of the counts."""
+        failed = self.total - self.counts[Status.VALID] - self.counts[Status.INVALID] - self.counts[Status.MALFORMED]
+        return (
+            f"Validated {self.total} XML file(s): {self.counts[Status.VALID]} valid, "
+            f"{self.counts[Status.INVALID]} invalid, {self.counts[Status.MALFORMED]} malformed, {failed} failed."
+        )
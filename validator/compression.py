@@ -0,0 +1,171 @@
+"""Transparent decompression of gzip, bzip2, xz and zstd compressed XML documents."""
+
+import bz2
+import gzip
+import io
+import lzma
+from pathlib import Path
+from typing import IO, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None  # type: ignore[assignment]
+
+# Leading bytes identifying each supported compression format
+_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+# File name suffixes of compressed documents
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+# Errors raised while reading a corrupt or truncated compressed document
+DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError)
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """Return the compression format of a document from its first bytes, if it is compressed."""
+    for compression, magic in _MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def file_compression(path: Union[str, Path]) -> Optional[str]:
+    """Return the compression format of a local file, if it is compressed."""
+    with open(path, "rb") as f:
+        return detect_compression(f.read(6))
+
+
+class _ZstdReader(io.RawIOBase):
+    """Decompressing reader of a zstd stream.
+
+    Unlike the reader of the ``zstandard`` package it can be rewound, which xmlschema needs
+    to parse a document lazily. Like :class:`gzip.GzipFile`, seeking backwards decompresses
+    the stream again from the start.
+    """
+
+    def __init__(self, fileobj: IO[bytes]) -> None:
+        """Initialise a reader of the zstd stream starting at the current position of a file."""
+        super().__init__()
+        self._fileobj = fileobj
+        self._start = fileobj.tell()
+        self._rewind()
+
+    def _rewind(self) -> None:
+        """Start decompressing from the beginning of the stream."""
+        self._fileobj.seek(self._start)
+        self._reader = zstandard.ZstdDecompressor().stream_reader(self._fileobj, read_across_frames=True, closefd=False)
+        self._position = 0
+
+    def readable(self) -> bool:
+        """Return whether the stream can be read."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return whether the stream can be rewound."""
+        return self._fileobj.seekable()
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Decompress data into a buffer, returning the number of bytes read."""
+        try:
+            count = self._reader.readinto(buffer)
+        except zstandard.ZstdError as err:
+            raise OSError(f"Invalid zstd data: {err}") from err
+        self._position += count
+        return count
+
+    def tell(self) -> int:
+        """Return the position in the decompressed data."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a position in the decompressed data."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Can only seek from the start or the current position")
+        if offset < self._position:
+            self._rewind()
+        while self._position < offset and self.read(min(offset - self._position, io.DEFAULT_BUFFER_SIZE)):
+            pass
+        return self._position
+
+    def close(self) -> None:
+        """Close the reader, the underlying file is left open."""
+        if not self.closed:
+            self._reader.close()
+        super().close()
+
+
+def decompressing_reader(fileobj: IO[bytes], compression: str) -> io.BufferedIOBase:
+    """Return a binary reader decompressing a compressed stream on the fly.
+
+    :param fileobj: Compressed data, the caller remains responsible for closing it
+    :param compression: Compression format, see :func:`detect_compression`
+    :raises OSError: If zstd data is given and the ``zstandard`` package is not installed
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(fileobj, mode="rb")
+    if compression == "xz":
+        return lzma.LZMAFile(fileobj, mode="rb")
+    if compression == "zstd":
+        if zstandard is None:
+            raise OSError("Reading zstd compressed XML requires the zstandard package: pip install zstandard")
+        return io.BufferedReader(_ZstdReader(fileobj))  # type: ignore[type-var]
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class _DecompressedFile(io.BufferedReader):
+    """Reader of a compressed file or download, which closes the compressed stream with the reader."""
+
+    def __init__(self, reader: io.BufferedIOBase, fileobj: IO[bytes]) -> None:
+        """Wrap a decompressing reader of an opened file."""
+        super().__init__(reader)  # type: ignore[type-var]
+        self._fileobj = fileobj
+
+    def seekable(self) -> bool:
+        """Return whether the reader can be rewound."""
+        # xmlschema checks this when finalizing a lazy parse, which may happen after closing
+        return not self.closed and super().seekable()
+
+    def close(self) -> None:
+        """Close the reader and the file."""
+        try:
+            super().close()
+        finally:
+            self._fileobj.close()
+
+
+def decompressed(fileobj: IO[bytes], compression: str) -> io.BufferedIOBase:
+    """Return a reader of the decompressed content of a compressed stream, which closes the stream with the reader.
+
+    :param fileobj: Compressed data
+    :param compression: Compression format, see :func:`detect_compression`
+    """
+    try:
+        return _DecompressedFile(decompressing_reader(fileobj, compression), fileobj)
+    except BaseException:
+        fileobj.close()
+        raise
+
+
+def open_decompressed(path: Union[str, Path], compression: str) -> io.BufferedIOBase:
+    """Open a compressed local file for reading its decompressed content.
+
+    :param path: Path of the compressed file
+    :param compression: Compression format, see :func:`file_compression`
+    """
+    return decompressed(open(path, "rb"), compression)
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    """Decompress a downloaded document held in memory."""
+    with decompressing_reader(io.BytesIO(data), compression) as reader:
+        return reader.read()
@@ -0,0 +1,194 @@
+"""Resident validation process serving command lines over a Unix socket, and its client."""
+
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from typing import Any, Dict, Iterator, List, Optional
+
+import click
+
+# Environment variables read by the validate command, taken from the client rather than the daemon
+FORWARDED_ENVIRONMENT = ("XML_VALIDATE_SCHEMA_DIR", "XML_VALIDATE_RESULT_CACHE")
+
+
+class _RemoteStream(io.TextIOBase):
+    """Text stream forwarding everything written to it to a client, as one message per write."""
+
+    def __init__(self, kind: str, wfile: io.BufferedIOBase) -> None:
+        """Initialise a stream sending ``kind`` messages, such as ``out`` or ``err``, to a client."""
+        super().__init__()
+        self.kind = kind
+        self._wfile = wfile
+        self.broken = False
+
+    @property
+    def encoding(self) -> str:  # type: ignore[override]
+        """Return the encoding the client decodes messages with."""
+        return "utf-8"
+
+    def writable(self) -> bool:
+        """Return whether the stream can be written."""
+        return True
+
+    def write(self, text: str) -> int:
+        """Send text to the client, dropping it once the client has gone away."""
+        if not isinstance(text, str):
+            # Click probes streams with an empty bytes write to tell binary from text ones
+            raise TypeError(f"write() argument must be str, not {type(text).__name__}")
+        if text and not self.broken:
+            try:
+                self._wfile.write(json.dumps({self.kind: text}).encode("UTF-8") + b"\n")
+                self._wfile.flush()
+            except OSError:
+                # The command still runs to the end, so that the server keeps a consistent state
+                self.broken = True
+        return len(text)
+
+
+@contextmanager
+def _environment(values: Dict[str, Optional[str]]) -> Iterator[None]:
+    """Set the forwarded environment variables of a client, or unset those it has not set, while running."""
+    previous = {name: os.environ.get(name) for name in FORWARDED_ENVIRONMENT}
+
+    def apply(values: Dict[str, Optional[str]]) -> None:
+        for name in FORWARDED_ENVIRONMENT:
+            value = values.get(name)
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    apply(values)
+    try:
+        yield
+    finally:
+        apply(previous)
+
+
+def run_command(command: click.Command, request: Dict[str, Any], wfile: io.BufferedIOBase) -> int:
+    """Run a command line sent by a client as if it had been run in the directory of the client.
+
+    Output and errors are forwarded to the client while the command runs.
+
+    :param command: Command the arguments are parsed by
+    :param request: Arguments, working directory, environment and whether the client shows colors
+    :param wfile: Connection to the client
+    :returns: Exit code of the command
+    """
+    out, err = _RemoteStream("out", wfile), _RemoteStream("err", wfile)
+    previous = os.getcwd()
+    try:
+        os.chdir(request["cwd"])
+        with _environment(request.get("env", {})), redirect_stdout(out), redirect_stderr(err):  # type: ignore[type-var]
+            try:
+                # The request is the object of the root context, which tells commands they run in the daemon
+                code = command.main(
+                    list(request["args"]),
+                    prog_name="xml-validate",
+                    standalone_mode=False,
+                    color=request["color"],
+                    obj=request,
+                )
+                return code if isinstance(code, int) else 0
+            except click.ClickException as error:
+                error.show()
+                return error.exit_code
+            except click.Abort:
+                return 1
+            except Exception as error:
+                # An unexpected error fails the request, not the server
+                click.echo(f"Error: {error}", err=True)
+                return 1
+    finally:
+        os.chdir(previous)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handle one command line sent by a client."""
+
+    server: "ValidationServer"
+
+    def handle(self) -> None:
+        """Read the request, run it and send the exit code."""
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        code = run_command(self.server.command, request, self.wfile)
+        try:
+            self.wfile.write(json.dumps({"exit": code}).encode("UTF-8") + b"\n")
+        except OSError:
+            pass
+
+
+class ValidationServer(socketserver.UnixStreamServer):
+    """Server running the command lines of clients one at a time in this process.
+
+    Compiled schemas, the index of schema directories and the HTTP and FTP connections stay in
+    memory between requests, so that a client only pays for validating its documents. Requests
+    are handled in turn, as each changes the working directory and redirects the output of the
+    process; a batch request still validates its documents in parallel.
+    """
+
+    def __init__(self, path: str, command: click.Command) -> None:
+        """Listen on a Unix socket, readable and writable by the current user only.
+
+        :param path: Path of the socket, replaced if a previous server left it behind
+        :param command: Command the requests are run by
+        :raises OSError: If another server is listening on the socket
+        """
+        if os.path.exists(path):
+            try:
+                with socket.socket(socket.AF_UNIX) as probe:
+                    probe.connect(path)
+            except OSError:
+                os.unlink(path)
+            else:
+                raise OSError(f"A validation daemon is already listening on {path}")
+        self.command = command
+        previous = os.umask(0o177)
+        try:
+            super().__init__(path, _RequestHandler)
+        finally:
+            os.umask(previous)
+
+    def server_close(self) -> None:
+        """Stop listening and remove the socket."""
+        super().server_close()
+        try:
+            os.unlink(self.server_address)  # type: ignore[arg-type]
+        except OSError:
+            pass
+
+
+def send_request(path: str, args: List[str]) -> int:
+    """Run a command line in the daemon listening on a socket, printing its output here.
+
+    :param path: Path of the socket of the daemon
+    :param args: Command line arguments, relative paths are resolved from the current directory
+        and the environment variables of :data:`FORWARDED_ENVIRONMENT` are read from this process
+    :returns: Exit code of the command
+    :raises OSError: If the daemon cannot be reached or goes away before answering
+    """
+    request = {
+        "args": args,
+        "cwd": os.getcwd(),
+        "env": {name: os.environ.get(name) for name in FORWARDED_ENVIRONMENT},
+        "color": sys.stdout.isatty(),
+    }
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        with sock.makefile("rwb") as connection:
+            connection.write(json.dumps(request).encode("UTF-8") + b"\n")
+            connection.flush()
+            for line in connection:
+                message = json.loads(line)
+                if "exit" in message:
+                    return int(message["exit"])
+                # Colors were already chosen by the daemon for this terminal
+                click.echo(message.get("out", message.get("err")), nl=False, err="err" in message, color=True)
+    raise OSError(f"The validation daemon on {path} closed the connection")
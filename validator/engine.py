@@ -0,0 +1,131 @@
+"""Validation engines: xmlschema, and libxml2 through the optional lxml package."""
+
+import importlib.util
+import os
+import threading
+import weakref
+from io import BytesIO
+from typing import IO, TYPE_CHECKING, List, Optional, Union
+from urllib.parse import unquote, urlparse
+from xml.etree.ElementTree import ParseError
+
+from .timing import phase
+
+if TYPE_CHECKING:
+    # Neither engine is loaded before a document is validated
+    import xmlschema
+    from lxml import etree
+    from xmlschema.validators.exceptions import XMLSchemaValidationError
+
+# Names accepted by --engine: auto uses libxml2 whenever lxml is installed
+ENGINES = ("xmlschema", "lxml", "auto")
+
+# libxml2 schemas compiled from xmlschema schemas, None for those libxml2 cannot compile
+_compiled: "weakref.WeakKeyDictionary[xmlschema.XMLSchema, Optional[etree.XMLSchema]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def lxml_available() -> bool:
+    """Return whether the lxml package is installed."""
+    return importlib.util.find_spec("lxml") is not None
+
+
+def engine_version(engine: str) -> str:
+    """Return the versions of the libraries validating documents with an engine, see :data:`ENGINES`."""
+    import xmlschema
+
+    version = f"xmlschema {xmlschema.__version__}"
+    if engine != "xmlschema" and lxml_available():
+        from lxml import etree
+
+        version += " libxml2 " + ".".join(str(part) for part in etree.LIBXML_VERSION)
+    return version
+
+
+def format_error(reason: str, path: Optional[str], line: Optional[int] = None) -> str:
+    """Return the message of a validation error, in the same format for all engines.
+
+    :param reason: What is wrong with the document
+    :param path: Path of the element in the document, if known
+    :param line: Line of the element in the document, if known
+    """
+    location = path or "the document"
+    if line:
+        location += f" (line {line})"
+    return f"failed validating {location}:\n\nReason: {reason}\n"
+
+
+def xmlschema_error(error: "XMLSchemaValidationError") -> str:
+    """Return the message of a validation error found by xmlschema."""
+    return format_error(error.reason or error.message, error.path, error.sourceline)
+
+
+def _schema_file(schema: "xmlschema.XMLSchema") -> Optional[str]:
+    """Return the local file a schema was compiled from, if any."""
+    from .schema_pack import pack_schema_name, pack_schemas
+
+    name = pack_schema_name(schema)
+    if name is not None:
+        # Precompiled schemas keep the URL of the tree the package was built in
+        return str(pack_schemas()[name])
+    if not schema.url:
+        return None
+    url = urlparse(schema.url)
+    if url.scheme not in ("", "file"):
+        return None
+    path = unquote(url.path)
+    return path if os.path.isfile(path) else None
+
+
+def lxml_schema(schema: "xmlschema.XMLSchema") -> Optional["etree.XMLSchema"]:
+    """Return a schema compiled by libxml2, compiling it on first use in this process.
+
+    libxml2 supports XSD 1.0 only and resolves imports itself, so schemas using XSD 1.1, schemas not
+    read from a local file and schemas it rejects are left to xmlschema.
+
+    :param schema: Schema compiled by xmlschema
+    :returns: The libxml2 schema, or None if lxml is not installed or cannot compile the schema
+    """
+    with _lock:
+        if schema in _compiled:
+            return _compiled[schema]
+        compiled = None
+        path = _schema_file(schema)
+        if lxml_available() and schema.XSD_VERSION == "1.0" and path is not None:
+            from lxml import etree
+
+            try:
+                compiled = etree.XMLSchema(etree.parse(path, etree.XMLParser(no_network=True)))
+            except etree.LxmlError:
+                compiled = None
+        _compiled[schema] = compiled
+        return compiled
+
+
+def lxml_errors(
+    compiled: "etree.XMLSchema", source: Union[str, IO[bytes]], from_url: bool, max_errors: int
+) -> List[str]:
+    """Validate a document with libxml2.
+
+    :param compiled: Schema compiled by libxml2, see :func:`lxml_schema`
+    :param source: Path of a local file, content downloaded from an URL, or a binary reader of the document
+    :param from_url: Whether a string source is downloaded content rather than a path
+    :param max_errors: Number of errors returned for an invalid document
+    :returns: Messages of the validation errors
+    :raises ParseError: If the document is not well-formed
+    """
+    from lxml import etree
+
+    downloaded = isinstance(source, str) and from_url
+    # Downloaded content is already decoded, whatever its XML declaration says
+    parser = etree.XMLParser(encoding="UTF-8" if downloaded else None, resolve_entities=False, no_network=True)
+    if isinstance(source, str) and downloaded:
+        source = BytesIO(source.encode("UTF-8"))
+    try:
+        with phase("parse"):
+            document = etree.parse(source, parser)
+    except etree.XMLSyntaxError as err:
+        raise ParseError(str(err))
+    if compiled.validate(document):
+        return []
+    return [format_error(entry.message, entry.path, entry.line) for entry in compiled.error_log[:max_errors]]
@@ -0,0 +1,455 @@
+"""Fetching of XML documents and schemas from local paths and URLs."""
+
+import io
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, DefaultDict, Iterator, List, Optional, Tuple, Union, cast
+from urllib.parse import urlparse
+
+from .compression import decompress, decompressed, detect_compression
+from .ftp import open_ftp
+from .http_cache import HTTPCache
+from .timing import PhaseTimes, phase, recording
+from .utils import cache_dir
+
+if TYPE_CHECKING:
+    # requests is only imported once an URL is downloaded
+    import ftplib
+
+    import requests
+
+DEFAULT_POOL_SIZE = 10
+
+# Bytes read from the network at a time by streamed downloads
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_session: Optional["requests.Session"] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_http_cache: Optional[HTTPCache] = HTTPCache(cache_dir() / "http")
+
+
+@dataclass
+class PoolStats:
+    """Usage of the HTTP connection pools of the shared session."""
+
+    hosts: int = 0
+    connections: int = 0
+    requests: int = 0
+
+    def __str__(self) -> str:
+        """Return a one line description of the pool usage."""
+        return (
+            f"HTTP connection pool: {self.requests} request(s) over "
+            f"{self.connections} connection(s) to {self.hosts} host(s)."
+        )
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE, reset: bool = False) -> None:
+    """Set the number of kept-alive connections per host, resetting the shared session if it changed.
+
+    A process running several commands, such as the validation daemon, keeps its connections
+    from one command to the next while they use the same pool size.
+
+    :param pool_size: Connections kept open per host, and the number of hosts whose pools are kept
+    :param reset: Close the connections of the shared session even if the pool size is unchanged
+    """
+    global _session, _pool_size
+    with _session_lock:
+        if pool_size == _pool_size and not reset:
+            return
+        if _session is not None:
+            _session.close()
+        _session = None
+        _pool_size = pool_size
+
+
+def get_session() -> "requests.Session":
+    """Return the HTTP session shared by all fetches of this process.
+
+    Connections are kept alive and reused for later requests to the same host. A process forked
+    after the session was created gets a session of its own, as sockets cannot be shared.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def pool_stats() -> PoolStats:
+    """Return the usage of the connection pools of the shared session in this process."""
+    stats = PoolStats()
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            return stats
+        adapter = _session.get_adapter("http://")
+    from requests.adapters import HTTPAdapter
+
+    assert isinstance(adapter, HTTPAdapter)  # nosec
+    pools = adapter.poolmanager.pools
+    for key in pools.keys():
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        stats.hosts += 1
+        stats.connections += pool.num_connections
+        stats.requests += pool.num_requests
+    return stats
+
+
+def configure_http_cache(enabled: bool = True, offline: bool = False) -> Optional[HTTPCache]:
+    """Enable or disable the on-disk HTTP cache shared by all fetches of this process.
+
+    :param enabled: Whether downloads are cached and revalidated with conditional requests
+    :param offline: Serve URLs only from the cache, which enables it
+    :returns: The HTTP cache in use, if any
+    """
+    global _http_cache
+    _http_cache = HTTPCache(cache_dir() / "http", offline) if enabled or offline else None
+    return _http_cache
+
+
+def http_cache() -> Optional[HTTPCache]:
+    """Return the HTTP cache in use, if any."""
+    return _http_cache
+
+
+def http_get(url: str, stream: bool = False) -> "requests.Response":
+    """Download an URL through the shared session and HTTP cache."""
+    if _http_cache is not None:
+        return _http_cache.get(get_session(), url, stream)
+    return get_session().get(url, stream=stream)
+
+
+def _decode_xml(data: bytes) -> str:
+    """Decode a decompressed XML document with the encoding of its XML declaration."""
+    declaration = re.match(rb"<\?xml[^>]*encoding\s*=\s*[\"']([A-Za-z0-9._-]+)", data.lstrip(b"\xef\xbb\xbf"))
+    try:
+        return data.decode(declaration.group(1).decode("ascii") if declaration else "utf-8-sig")
+    except LookupError:
+        return data.decode("utf-8-sig")
+
+
+def _decompressed_text(data: bytes) -> Optional[str]:
+    """Return the text of a compressed document, or None if it is not compressed."""
+    compression = detect_compression(data[:6])
+    return None if compression is None else _decode_xml(decompress(data, compression))
+
+
+def _not_xml_error(resp: "requests.Response") -> Exception:
+    """Return the error reported for an URL whose content type is not XML."""
+    return Exception(
+        f"Error: Content of the URL ({resp.url})\n" + "is not in XML format. " + "Make sure the URL is correct.\n"
+    )
+
+
+def _process_http_reponse(url: str, scheme: str) -> str:
+    """Process response from HTTP/HTTPS url."""
+    import requests
+
+    resp = http_get(url)
+    cnt_type = ["text/plain", "xml"]
+    if resp.status_code != requests.codes.ok:
+        resp.raise_for_status()
+    # compressed documents are served with the content type of the archive
+    with phase("decode"):
+        text = _decompressed_text(resp.content)
+    if text is not None:
+        return text
+    # we only raise upon error of protocol and content type
+    # content type can also be text/plain
+    if scheme in ["http", "https"] and not any(x in resp.headers["Content-Type"] for x in cnt_type):
+        raise _not_xml_error(resp)
+    with phase("decode"):
+        return resp.text
+
+
+class _ResponseReader(io.RawIOBase):
+    """Binary reader of the body of a streamed HTTP response, read from the network on demand."""
+
+    def __init__(self, response: "requests.Response") -> None:
+        """Wrap a response requested with ``stream=True``."""
+        super().__init__()
+        self._response = response
+        self._chunks = response.iter_content(STREAM_CHUNK_SIZE)
+        self._pending = b""
+
+    def readable(self) -> bool:
+        """Return whether the stream can be read."""
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Read downloaded data into a buffer, waiting for the network only if none is pending."""
+        if not self._pending:
+            import requests
+
+            try:
+                self._pending = next(self._chunks, b"")
+            except requests.exceptions.RequestException as err:
+                raise OSError(f"Download interrupted: {err}") from err
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def close(self) -> None:
+        """Close the download and return its connection to the pool."""
+        if not self.closed:
+            self._response.close()
+            # requests leaves the body of a response read to the end open
+            self._response.raw.close()
+        super().close()
+
+
+def _peek_compression(reader: "io.BufferedReader[Any]", url: str) -> Optional[str]:
+    """Return the compression format of a download from its first bytes, without consuming them."""
+    try:
+        return detect_compression(reader.peek(6)[:6])
+    except OSError as err:
+        raise Exception(f"Error: {url} cannot be read: {err}\n")
+
+
+def _open_http_stream(url: str, scheme: str) -> IO[bytes]:
+    """Open a streamed response from HTTP/HTTPS url as a binary reader of the XML document."""
+    import requests
+
+    resp = http_get(url, stream=True)
+    reader = io.BufferedReader(_ResponseReader(resp), STREAM_CHUNK_SIZE)  # type: ignore[type-var]
+    try:
+        if resp.status_code != requests.codes.ok:
+            resp.raise_for_status()
+        # compressed documents are served with the content type of the archive
+        compression = _peek_compression(reader, url)
+        if compression is not None:
+            return cast(IO[bytes], decompressed(reader, compression))
+        if scheme in ["http", "https"] and not any(x in resp.headers["Content-Type"] for x in ["text/plain", "xml"]):
+            raise _not_xml_error(resp)
+    except BaseException:
+        reader.close()
+        raise
+    return reader
+
+
+def _http_error(err: "requests.exceptions.HTTPError", url: str) -> Exception:
+    """Return the error reported for an URL the server responded to with an HTTP error."""
+    return Exception(str(err) + "" + url + "\nMake sure the URL is correct.\n")
+
+
+def _ftp_error(err: "ftplib.Error", url: str) -> Exception:
+    """Return the error reported for an URL the server responded to with an FTP error."""
+    return Exception(str(err) + f" ({url})\nMake sure the URL is correct.\n")
+
+
+def _open_ftp(url: str) -> "io.BufferedReader[Any]":
+    """Start downloading a file from an FTP URL, returning a reader of its content."""
+    if _http_cache is not None and _http_cache.offline:
+        raise Exception(f"Error: {url} cannot be downloaded in offline mode.\n")
+    return open_ftp(url)
+
+
+def _open_ftp_stream(url: str) -> IO[bytes]:
+    """Open a file from an FTP URL as a binary reader of the XML document."""
+    reader = _open_ftp(url)
+    try:
+        compression = _peek_compression(reader, url)
+    except BaseException:
+        reader.close()
+        raise
+    return cast(IO[bytes], decompressed(reader, compression)) if compression is not None else reader
+
+
+def _download_ftp(url: str) -> str:
+    """Download an XML document from an FTP URL."""
+    import ftplib
+
+    try:
+        with _open_ftp(url) as reader:
+            byte_str = reader.read()
+    except ftplib.Error as err:
+        # If request responds with FTP error
+        raise _ftp_error(err, url)
+    with phase("decode"):
+        return _decompressed_text(byte_str) or byte_str.decode("UTF-8")  # Or use the encoding you expect
+
+
+def _download_http(url: str, scheme: str) -> str:
+    """Download an XML document from an HTTP/HTTPS URL."""
+    import requests
+
+    try:
+        return _process_http_reponse(url, scheme)
+    except requests.exceptions.HTTPError as err:
+        # If request responds with HTTP error
+        raise _http_error(err, url)
+
+
+def xmlFromURL(url: str, arg_type: str) -> Tuple[str, str]:
+    """Deterimine if argument is an URL and return content from the URL."""
+    scheme = urlparse(url).scheme
+
+    try:
+        # Handle FTP, file URLs and local paths, which are never downloaded
+        if scheme not in ("http", "https", "ftp"):
+            raise ValueError
+        elif scheme == "ftp":
+            return _download_ftp(url), url
+        else:
+            return _download_http(url, scheme), url
+
+    except ValueError:
+        # If argument is a file URL type or not an URL at all
+        if scheme == "file":
+            url = url.replace("file://", "")
+
+        file_path = Path(url)
+        if not file_path.is_file():
+            error = f"Error: Invalid value for {arg_type}\n" + f"Path {url} does not exist.\n"
+            raise Exception(error)
+        else:
+            return str(file_path.absolute()), url
+
+
+def stream_xml_from_url(url: str, arg_type: str) -> Tuple[Union[str, IO[bytes]], str]:
+    """Open an XML document for reading, streaming it if it is downloaded over HTTP/HTTPS or FTP.
+
+    Streamed documents are returned as a binary reader which downloads the document while it is
+    read, other arguments are handled as in :func:`xmlFromURL`.
+    """
+    scheme = urlparse(url).scheme
+    if scheme in ("http", "https"):
+        import requests
+
+        try:
+            return _open_http_stream(url, scheme), url
+        except requests.exceptions.HTTPError as err:
+            # If request responds with HTTP error
+            raise _http_error(err, url)
+    if scheme == "ftp":
+        import ftplib
+
+        try:
+            return _open_ftp_stream(url), url
+        except ftplib.Error as err:
+            # If request responds with FTP error
+            raise _ftp_error(err, url)
+    return xmlFromURL(url, arg_type)
+
+
+@dataclass
+class FetchedDocument:
+    """XML document resolved from a local path or downloaded from an URL."""
+
+    # Path or URL as requested by the user
+    source: str
+    # Absolute path of a local file, or the content downloaded from an URL
+    content: str
+    from_url: bool
+    # Seconds spent resolving or downloading the document
+    fetch_time: float = 0.0
+    # Reader of a document still being downloaded, validated instead of the content
+    stream: Optional[IO[bytes]] = None
+    # Wall and CPU time spent fetching and decoding the document
+    phases: Optional[PhaseTimes] = None
+
+
+def fetch_document(xml_file: str, stream: bool = False) -> FetchedDocument:
+    """Resolve a local XML file or download an XML document from an URL.
+
+    :param xml_file: Path or URL of the XML document
+    :param stream: Open HTTP(S) and FTP downloads as a stream read while validating, instead of downloading
+        them first. The caller is responsible for closing the stream of the returned document.
+    :raises Exception: With a message for the user if the document is not available
+    """
+    start = time.perf_counter()
+    with recording(PhaseTimes()) as times, phase("fetch"):
+        if stream:
+            opened, requested_url = stream_xml_from_url(xml_file, "XML_FILE")
+        else:
+            opened, requested_url = xmlFromURL(xml_file, "XML_FILE")
+    if not isinstance(opened, str):
+        # Only the time to the first bytes, the download goes on while validating
+        return FetchedDocument(requested_url, requested_url, True, time.perf_counter() - start, opened, times)
+    content = opened
+    return FetchedDocument(
+        requested_url, content, not content.startswith("/"), time.perf_counter() - start, None, times
+    )
+
+
+def prefetch_documents(
+    documents: List[str], workers: int = 8, per_host: int = 4, queue_size: int = 16
+) -> Iterator[Tuple[str, Union[FetchedDocument, Exception]]]:
+    """Fetch XML documents concurrently ahead of their validation.
+
+    Downloads run in a pool of threads and are handed over through a bounded queue, so that network
+    latency overlaps with validation while at most ``queue_size`` fetched documents wait in memory.
+
+    :param documents: Paths or URLs of the XML documents
+    :param workers: Number of concurrent fetches
+    :param per_host: Number of concurrent fetches from any single host
+    :param queue_size: Number of fetched documents buffered ahead of the consumer
+    :returns: Iterator in completion order over the requested paths or URLs, each paired with the
+        fetched document or with the error raised when the document is not available
+    """
+    pending: "queue.SimpleQueue[str]" = queue.SimpleQueue()
+    for document in documents:
+        pending.put(document)
+    fetched: "queue.Queue[Optional[Tuple[str, Union[FetchedDocument, Exception]]]]" = queue.Queue(maxsize=queue_size)
+    host_limits: DefaultDict[str, threading.Semaphore] = defaultdict(lambda: threading.Semaphore(per_host))
+    limits_lock = threading.Lock()
+    stop = threading.Event()
+
+    def hand_over(item: Optional[Tuple[str, Union[FetchedDocument, Exception]]]) -> None:
+        """Put an item into the queue, waiting for room unless the consumer has gone away."""
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def fetch_worker() -> None:
+        """Fetch documents until none are left."""
+        while not stop.is_set():
+            try:
+                document = pending.get_nowait()
+            except queue.Empty:
+                break
+            with limits_lock:
+                limit = host_limits[urlparse(document).netloc]
+            item: Union[FetchedDocument, Exception]
+            with limit:
+                try:
+                    item = fetch_document(document)
+                except Exception as error:
+                    item = error
+            hand_over((document, item))
+        hand_over(None)
+
+    threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(max(1, min(workers, len(documents))))]
+    for thread in threads:
+        thread.start()
+    try:
+        running = len(threads)
+        while running:
+            item = fetched.get()
+            if item is None:
+                running -= 1
+            else:
+                yield item
+    finally:
+        stop.set()
@@ -0,0 +1,363 @@
+"""FTP downloads over a pool of reused control connections."""
+
+import io
+import os
+import posixpath
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, DefaultDict, Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import ParseResult, quote, unquote, urlparse
+
+if TYPE_CHECKING:
+    # ftplib, which loads ssl, is only imported once something is downloaded over FTP
+    import ftplib
+
+DEFAULT_FTP_BLOCK_SIZE = 64 * 1024
+# Seconds without a reply or data after which an FTP transfer is considered interrupted
+FTP_TIMEOUT = 60
+# Seconds a connection may stay idle in the pool before it is checked with NOOP when reused
+KEEPALIVE_INTERVAL = 15
+
+# Host, port, user and password of the server a control connection is logged in to
+_HostKey = Tuple[str, int, str, str]
+
+
+@dataclass(frozen=True)
+class FTPOptions:
+    """Settings of FTP downloads."""
+
+    # Bytes read from the data connection at a time
+    block_size: int = DEFAULT_FTP_BLOCK_SIZE
+    # Open data connections from the client rather than from the server
+    passive: bool = True
+    # Number of times an interrupted transfer is resumed before giving up
+    retries: int = 3
+    # Number of control connections open at the same time to any single host
+    connections: int = 4
+
+
+@dataclass
+class FTPPoolStats:
+    """Usage of the FTP connection pool."""
+
+    hosts: int = 0
+    connections: int = 0
+    transfers: int = 0
+
+    def __str__(self) -> str:
+        """Return a one line description of the pool usage."""
+        return (
+            f"FTP connection pool: {self.transfers} transfer(s) over "
+            f"{self.connections} connection(s) to {self.hosts} host(s)."
+        )
+
+
+def _host_key(url: ParseResult) -> _HostKey:
+    """Return the server and credentials an FTP URL is downloaded with, the credentials percent-decoded."""
+    return url.hostname or "", url.port or 0, unquote(url.username or ""), unquote(url.password or "")
+
+
+class FTPPool:
+    """Logged-in FTP control connections kept per host for later transfers.
+
+    A connection is handed out to one transfer or listing at a time and goes back to the pool once
+    the server has confirmed the transfer, so that many files on one host share a few logins.
+    A connection idle for more than :data:`KEEPALIVE_INTERVAL` seconds is checked with ``NOOP``
+    before it is reused and replaced if the server has closed it. At most ``connections`` control
+    connections are open to any single host, further transfers wait for one to be released.
+    """
+
+    def __init__(self, connections: int = 4) -> None:
+        """Initialise an empty pool.
+
+        :param connections: Number of control connections open at the same time to any single host
+        """
+        self.connections = connections
+        self._idle: DefaultDict[_HostKey, List[Tuple["ftplib.FTP", float]]] = defaultdict(list)
+        self._limits: Dict[_HostKey, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self.stats = FTPPoolStats()
+        self._hosts: Set[_HostKey] = set()
+
+    def _limit(self, key: _HostKey) -> threading.BoundedSemaphore:
+        """Return the semaphore limiting the connections to a host."""
+        with self._lock:
+            if key not in self._limits:
+                self._limits[key] = threading.BoundedSemaphore(self.connections)
+            return self._limits[key]
+
+    def acquire(self, url: ParseResult) -> "ftplib.FTP":
+        """Return a logged-in control connection to the server of an URL, reusing an idle one if possible.
+
+        The connection must be handed back with :meth:`release`.
+        """
+        import ftplib
+
+        key = _host_key(url)
+        self._limit(key).acquire()
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle[key]:
+                        break
+                    ftp, idle_since = self._idle[key].pop()
+                if time.monotonic() - idle_since < KEEPALIVE_INTERVAL:
+                    return ftp
+                try:
+                    ftp.voidcmd("NOOP")
+                    return ftp
+                except ftplib.all_errors:
+                    ftp.close()
+
+            ftp = ftplib.FTP(timeout=FTP_TIMEOUT)
+            try:
+                ftp.connect(key[0], key[1])
+                ftp.login(key[2], key[3])
+                ftp.voidcmd("TYPE I")
+            except BaseException:
+                ftp.close()
+                raise
+            with self._lock:
+                self._hosts.add(key)
+                self.stats.hosts = len(self._hosts)
+                self.stats.connections += 1
+            return ftp
+        except BaseException:
+            self._limit(key).release()
+            raise
+
+    def count_transfer(self) -> None:
+        """Count a transfer started over a connection of the pool."""
+        with self._lock:
+            self.stats.transfers += 1
+
+    def release(self, url: ParseResult, ftp: "ftplib.FTP", reusable: bool = True) -> None:
+        """Hand back a control connection, which is closed unless it is reusable."""
+        key = _host_key(url)
+        if reusable:
+            with self._lock:
+                self._idle[key].append((ftp, time.monotonic()))
+        else:
+            ftp.close()
+        self._limit(key).release()
+
+    @contextmanager
+    def connection(self, url: ParseResult) -> Iterator["ftplib.FTP"]:
+        """Borrow a control connection for a block, which is closed if the block raises."""
+        ftp = self.acquire(url)
+        try:
+            yield ftp
+        except BaseException:
+            self.release(url, ftp, reusable=False)
+            raise
+        self.release(url, ftp)
+
+    def close(self) -> None:
+        """Close the idle connections."""
+        import ftplib
+
+        with self._lock:
+            idle = [ftp for connections in self._idle.values() for ftp, _ in connections]
+            self._idle.clear()
+        for ftp in idle:
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                ftp.close()
+
+
+_options = FTPOptions()
+_pool: Optional[FTPPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def configure_ftp(
+    block_size: int = DEFAULT_FTP_BLOCK_SIZE,
+    passive: bool = True,
+    retries: int = 3,
+    connections: int = 4,
+    reset: bool = False,
+) -> None:
+    """Set how files are downloaded over FTP by this process, resetting the connection pool if it changed.
+
+    Logged-in connections are kept from one command to the next while the settings are unchanged.
+
+    :param block_size: Bytes read from the data connection at a time
+    :param passive: Use passive mode, in which the client opens the data connections
+    :param retries: Number of times an interrupted transfer is resumed with ``REST``
+    :param connections: Number of control connections open at the same time to any single host
+    :param reset: Close the connections of the pool even if the settings are unchanged
+    """
+    global _options, _pool
+    options = FTPOptions(block_size, passive, retries, connections)
+    with _pool_lock:
+        if options == _options and not reset:
+            return
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
+        _options = options
+
+
+def get_pool() -> FTPPool:
+    """Return the FTP connection pool shared by all downloads of this process.
+
+    A process forked after the pool was created gets a pool of its own, as sockets cannot be shared.
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool, _pool_pid = FTPPool(_options.connections), os.getpid()
+        return _pool
+
+
+def ftp_pool_stats() -> FTPPoolStats:
+    """Return the usage of the FTP connection pool in this process."""
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            return FTPPoolStats()
+        return _pool.stats
+
+
+class FTPReader(io.RawIOBase):
+    """Binary reader of a file downloaded over FTP, read from the data connection on demand.
+
+    A transfer interrupted by a dropped connection, a timeout or a transfer error reply is
+    resumed from the current position with a ``REST`` command, at most ``retries`` times.
+    """
+
+    def __init__(self, url: str, options: FTPOptions, pool: FTPPool) -> None:
+        """Start transferring the file of an ``ftp://`` URL over a connection from the pool."""
+        super().__init__()
+        self._url = urlparse(url)
+        # Path on the server, as the URL percent-encodes it
+        self._path = unquote(self._url.path)
+        self._options = options
+        self._pool = pool
+        self._retries = options.retries
+        self._position = 0
+        self._size: Optional[int] = None
+        self._ftp: Optional["ftplib.FTP"] = None
+        self._conn: Optional[socket.socket] = None
+        try:
+            self._start()
+        except BaseException:
+            self._stop()
+            raise
+
+    def _start(self) -> None:
+        """Start transferring the file from the current position."""
+        import ftplib
+
+        self._ftp = self._pool.acquire(self._url)
+        self._ftp.set_pasv(self._options.passive)
+        if self._size is None:
+            try:
+                self._size = self._ftp.size(self._path)
+            except ftplib.error_perm:
+                # SIZE is not supported, a truncated transfer is then only noticed from the reply
+                pass
+        self._conn = self._ftp.transfercmd("RETR " + self._path, self._position or None)
+        self._pool.count_transfer()
+
+    def _stop(self, reusable: bool = False) -> None:
+        """Close the data connection and hand back the control connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._ftp is not None:
+            self._pool.release(self._url, self._ftp, reusable)
+            self._ftp = None
+
+    def _resume(self, error: BaseException) -> None:
+        """Restart an interrupted transfer from the current position.
+
+        :raises OSError: If the transfer cannot be resumed within the allowed retries
+        """
+        import ftplib
+
+        while True:
+            self._stop()
+            if self._retries <= 0:
+                raise OSError(f"Download interrupted: {error}") from error
+            self._retries -= 1
+            try:
+                self._start()
+                return
+            except ftplib.all_errors as err:
+                error = err
+
+    def _finish(self) -> None:
+        """Close the data connection of a transfer read to the end and check the reply of the server."""
+        assert self._conn is not None and self._ftp is not None  # nosec
+        self._conn.close()
+        self._conn = None
+        self._ftp.voidresp()
+        self._stop(reusable=True)
+
+    def readable(self) -> bool:
+        """Return whether the stream can be read."""
+        return True
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Read at most one block of the file into a buffer, returning the number of bytes read."""
+        import ftplib
+
+        view = memoryview(buffer)[: self._options.block_size]
+        while self._conn is not None:
+            try:
+                count = self._conn.recv_into(view)
+            except ftplib.all_errors as err:
+                self._resume(err)
+                continue
+            if count:
+                self._position += count
+                return count
+            if self._size is not None and self._position < self._size:
+                self._resume(EOFError(f"connection closed after {self._position} of {self._size} bytes"))
+                continue
+            try:
+                self._finish()
+            except ftplib.all_errors as err:
+                self._resume(err)
+        return 0
+
+    def close(self) -> None:
+        """Stop the transfer, closing its connections unless it has been read to the end."""
+        if not self.closed:
+            self._stop()
+        super().close()
+
+
+def open_ftp(url: str) -> "io.BufferedReader[Any]":
+    """Start downloading a file from an FTP URL over the shared connection pool, returning a reader of its content."""
+    options = _options
+    return io.BufferedReader(FTPReader(url, options, get_pool()), options.block_size)  # type: ignore[type-var]
+
+
+def list_ftp_directory(url: str) -> List[str]:
+    """Return the URLs of the entries of a directory on an FTP server, listed over the shared connection pool.
+
+    :param url: URL of the directory
+    """
+    import ftplib
+
+    parsed = urlparse(url)
+    directory = parsed.path.rstrip("/") or "/"
+    with get_pool().connection(parsed) as ftp:
+        ftp.set_pasv(_options.passive)
+        try:
+            names = ftp.nlst(unquote(directory))
+        except ftplib.error_perm as err:
+            # Some servers answer an empty directory with an error
+            if not str(err).startswith("550"):
+                raise
+            names = []
+    base = url.split("://", 1)[0] + "://" + parsed.netloc
+    # The directory is kept as the URL encodes it, the names listed by the server are encoded likewise
+    return sorted(base + posixpath.join(directory, quote(posixpath.basename(name))) for name in names)
@@ -0,0 +1,261 @@
+"""On-disk cache of HTTP responses revalidated with conditional requests."""
+
+import hashlib
+import json
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Dict, Iterator, Optional, Tuple, Union
+
+from .utils import atomic_writer, prune_lru, touch
+
+if TYPE_CHECKING:
+    # requests is only imported once something is downloaded
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from urllib3 import BaseHTTPResponse
+
+# Response headers kept with a cached body
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Cache-Control")
+# Total size in bytes of the cached responses
+DEFAULT_MAX_SIZE = 256 * 1024**2
+
+
+def _max_age(cache_control: str) -> Optional[int]:
+    """Return the max-age of a Cache-Control header, 0 if the response must be revalidated."""
+    directives = cache_control.lower()
+    if "no-cache" in directives:
+        return 0
+    match = re.search(r"max-age\s*=\s*(\d+)", directives)
+    return int(match.group(1)) if match else None
+
+
+def _metadata(url: str, headers: "CaseInsensitiveDict", encoding: Optional[str]) -> bytes:
+    """Return the first line of a cache entry, holding the headers needed to revalidate the response."""
+    meta = {
+        "url": url,
+        "stored": time.time(),
+        "encoding": encoding,
+        "headers": {name: headers[name] for name in _STORED_HEADERS if name in headers},
+    }
+    return json.dumps(meta).encode("UTF-8") + b"\n"
+
+
+class _CachingStream:
+    """Raw body of a streamed response, which stores the body in the cache as it is read.
+
+    The entry is only written once the body has been read to the end, a download closed
+    before its end leaves the cache unchanged.
+    """
+
+    def __init__(self, raw: "BaseHTTPResponse", cache: "HTTPCache", entry: Path, metadata: bytes) -> None:
+        """Wrap the raw urllib3 response of a download to store in an entry of a cache."""
+        self._raw = raw
+        self._cache = cache
+        self._writer = atomic_writer(entry)
+        self._file: Optional[IO[bytes]] = None
+        try:
+            self._file = self._writer.__enter__()
+            self._file.write(metadata)
+        except OSError:
+            self._finish(completed=False)
+
+    def _finish(self, completed: bool) -> None:
+        """Replace the cache entry by the stored body, or discard it if the body is incomplete."""
+        if self._file is None:
+            return
+        file, self._file = self._file, None
+        try:
+            if completed:
+                size = file.tell()
+                self._writer.__exit__(None, None, None)
+                self._cache._stored(size)
+            else:
+                error = EOFError("Download not completed")
+                self._writer.__exit__(type(error), error, None)
+        except OSError:
+            # The cache only saves downloads, fetching goes on without it
+            pass
+
+    def stream(self, amt: int, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        """Yield chunks of the body, storing each of them."""
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            if self._file is not None:
+                try:
+                    self._file.write(chunk)
+                except OSError:
+                    self._finish(completed=False)
+            yield chunk
+        self._finish(completed=True)
+
+    def release_conn(self) -> None:
+        """Return the connection to the pool."""
+        self._raw.release_conn()
+
+    def close(self) -> None:
+        """Close the download, discarding the entry unless the whole body was read."""
+        self._finish(completed=False)
+        self._raw.close()
+
+
+class HTTPCache:
+    """Cache of successful HTTP GET responses.
+
+    A response is stored when it carries an ``ETag``, a ``Last-Modified`` date or a
+    ``Cache-Control: max-age``, unless it is marked ``no-store``. Within its max-age a cached
+    response is served without contacting the server; afterwards it is revalidated with
+    ``If-None-Match``/``If-Modified-Since`` and only downloaded again if it has changed.
+    In offline mode responses are served from the cache whatever their age, and URLs missing
+    from the cache cannot be fetched. Least recently used responses are evicted to keep the
+    cache within its maximum size.
+    """
+
+    def __init__(self, path: Path, offline: bool = False, max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        """Initialise a cache in the given directory.
+
+        :param path: Directory for the cached responses, created on first write
+        :param offline: Serve responses only from the cache
+        :param max_size: Total size in bytes the cache is pruned to after the first write and then
+            each time a tenth of it has been written, None for no limit
+        """
+        self.path = path
+        self.offline = offline
+        self.max_size = max_size
+        # Bytes written since the cache was last pruned, starting over the threshold so that the
+        # first write also prunes what earlier runs left
+        self._unpruned = max_size or 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def _entry(self, url: str) -> Path:
+        """Return the file of the cached response for an URL."""
+        return self.path / (hashlib.sha256(url.encode("UTF-8")).hexdigest() + ".entry")
+
+    def _load(self, url: str, stream: bool = False) -> Optional[Tuple[Dict[str, Any], Union[bytes, IO[bytes]]]]:
+        """Return the metadata and body of a cached response, the body as an opened file when streaming."""
+        try:
+            f = self._entry(url).open("rb")
+        except OSError:
+            return None
+        try:
+            meta = json.loads(f.readline())
+            if meta.get("url") != url:
+                f.close()
+                return None
+            if stream:
+                return meta, f
+            with f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            f.close()
+            return None
+
+    def _save(
+        self, url: str, headers: "CaseInsensitiveDict", encoding: Optional[str], body: Union[bytes, IO[bytes]]
+    ) -> None:
+        """Store a response body with the headers needed to revalidate it."""
+        try:
+            with atomic_writer(self._entry(url)) as f:
+                f.write(_metadata(url, headers, encoding))
+                if isinstance(body, bytes):
+                    f.write(body)
+                else:
+                    start = body.tell()
+                    shutil.copyfileobj(body, f)
+                    body.seek(start)
+                size = f.tell()
+            self._stored(size)
+        except OSError:
+            # The cache only saves downloads, fetching goes on without it
+            pass
+
+    def _stored(self, size: int) -> None:
+        """Count a stored response, pruning the cache once a tenth of its maximum size has been written since."""
+        if self.max_size is None:
+            return
+        self._unpruned += size
+        if self._unpruned > self.max_size // 10:
+            self._unpruned = 0
+            self.prune(self.max_size)
+
+    @staticmethod
+    def _response(url: str, meta: Dict[str, Any], body: Union[bytes, IO[bytes]]) -> "requests.Response":
+        """Build a response object from a cached response."""
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        response = requests.Response()
+        response.status_code = requests.codes.ok
+        response.url = url
+        response.headers = CaseInsensitiveDict(meta["headers"])
+        response.encoding = meta["encoding"]
+        if isinstance(body, bytes):
+            response._content = body
+        else:
+            response.raw = body
+        return response
+
+    def get(self, session: "requests.Session", url: str, stream: bool = False) -> "requests.Response":
+        """Return the response for an URL, from the cache when it is still current.
+
+        :param session: Session for requests to the server
+        :param url: URL to get
+        :param stream: Return before the body is read, as for ``requests`` streamed downloads, a streamed
+            download is stored once it has been read to the end
+        :raises Exception: In offline mode, if the URL is not in the cache
+        """
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        cached = self._load(url, stream)
+        if cached is not None:
+            meta, body = cached
+            max_age = _max_age(meta["headers"].get("Cache-Control", ""))
+            if self.offline or (max_age is not None and time.time() - meta["stored"] < max_age):
+                self.hits += 1
+                touch(self._entry(url))
+                return self._response(url, meta, body)
+        if self.offline:
+            raise Exception(f"Error: {url} is not in the HTTP cache and cannot be downloaded in offline mode.\n")
+
+        conditions = {}
+        if cached is not None:
+            if "ETag" in meta["headers"]:
+                conditions["If-None-Match"] = meta["headers"]["ETag"]
+            if "Last-Modified" in meta["headers"]:
+                conditions["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        try:
+            response = session.get(url, headers=conditions, stream=stream)
+        except BaseException:
+            if cached is not None and not isinstance(body, bytes):
+                body.close()
+            raise
+
+        if response.status_code == requests.codes.not_modified and cached is not None:
+            self.revalidated += 1
+            response.close()
+            headers = CaseInsensitiveDict(meta["headers"])
+            headers.update({name: response.headers[name] for name in _STORED_HEADERS if name in response.headers})
+            self._save(url, headers, meta["encoding"], body)
+            return self._response(url, meta | {"headers": dict(headers)}, body)
+        if cached is not None and not isinstance(body, bytes):
+            body.close()
+
+        self.misses += 1
+        cache_control = response.headers.get("Cache-Control", "")
+        cacheable = (
+            "ETag" in response.headers or "Last-Modified" in response.headers or _max_age(cache_control) is not None
+        )
+        if response.status_code == requests.codes.ok and cacheable and "no-store" not in cache_control.lower():
+            if stream:
+                metadata = _metadata(url, response.headers, response.encoding)
+                response.raw = _CachingStream(response.raw, self, self._entry(url), metadata)
+            else:
+                self._save(url, response.headers, response.encoding, response.content)
+        return response
+
+    def prune(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> Tuple[int, int]:
+        """Evict least recently used responses, see :func:`prune_lru`."""
+        return prune_lru(self.path, "*.entry", max_size, max_age)
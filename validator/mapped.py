@@ -0,0 +1,146 @@
+"""Memory-mapped reading of large local XML files."""
+
+import codecs
+import io
+import mmap
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+# Local files of at least this many bytes are memory-mapped instead of read through a file buffer
+MMAP_THRESHOLD = 1024**2
+# Bytes at the start of a document searched for its root element
+PRESCAN_SIZE = 64 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+_DECLARATION = re.compile(r"""<\?xml\s[^>]*?encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+# Comments, processing instructions and a document type declaration without an internal subset
+_MISC = re.compile(r"\s*(?:<!--.*?-->|<\?.*?\?>|<!DOCTYPE[^\[>]*>)", re.DOTALL)
+_START_TAG = re.compile(r"\s*<([^\s/>!?]+)((?:\s+[^\s=/>]+\s*=\s*(?:\"[^\"]*\"|'[^']*'))*)\s*/?>")
+_ATTRIBUTE = re.compile(r"""([^\s=]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+
+@dataclass(frozen=True)
+class Prolog:
+    """Encoding and root element of a document, found without parsing it."""
+
+    encoding: str
+    # Root element in ``{namespace}name`` notation
+    root: str
+    # Value of an xsi:schemaLocation or xsi:noNamespaceSchemaLocation attribute of the root element
+    schema_location: Optional[str] = None
+
+
+def scan_prolog(head: Union[bytes, memoryview]) -> Optional[Prolog]:
+    """Find the encoding and the root element in the first bytes of a document.
+
+    Only the XML declaration, comments, processing instructions and a document type declaration
+    are skipped before the first start tag, whose namespace is resolved from its own attributes.
+
+    :param head: First bytes of the document, see :data:`PRESCAN_SIZE`
+    :returns: The prolog, or None if the start of the document is not understood
+    """
+    data = bytes(head)
+    encoding = next((name for bom, name in _BOMS if data.startswith(bom)), None)
+    if encoding is None:
+        declared = _DECLARATION.match(data[:200].decode("latin-1"))
+        encoding = declared.group(1).lower() if declared else "utf-8"
+    try:
+        text = codecs.getincrementaldecoder(encoding)(errors="strict").decode(data)
+    except (LookupError, UnicodeDecodeError):
+        return None
+    position = 1 if text.startswith("\ufeff") else 0
+    while match := _MISC.match(text, position):
+        position = match.end()
+    start = _START_TAG.match(text, position)
+    if start is None:
+        return None
+
+    prefix, _, name = start.group(1).rpartition(":")
+    namespaces = {}
+    schema_location = None
+    for attribute in _ATTRIBUTE.finditer(start.group(2)):
+        attr_name, value = attribute.group(1), attribute.group(2) or attribute.group(3) or ""
+        if attr_name == "xmlns":
+            namespaces[""] = value
+        elif attr_name.startswith("xmlns:"):
+            namespaces[attr_name[6:]] = value
+        elif attr_name.endswith((":schemaLocation", ":noNamespaceSchemaLocation")):
+            schema_location = value
+    if prefix and prefix not in namespaces:
+        # Declared on no element the scan has seen
+        return None
+    namespace = namespaces.get(prefix, "")
+    return Prolog(encoding, f"{{{namespace}}}{name}" if namespace else name, schema_location)
+
+
+class MappedFile(io.RawIOBase):
+    """Reader of a memory-mapped local file.
+
+    Reads are served from the page cache without system calls, and the mapped pages are shared
+    by every process reading the same file. :attr:`buffer` gives the mapped content itself, which
+    a parser can be fed from without copying it.
+    """
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """Map a non-empty file into memory."""
+        super().__init__()
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mmap, "madvise"):
+            self._mmap.madvise(mmap.MADV_SEQUENTIAL)
+        self.buffer = memoryview(self._mmap)
+        self.name = str(path)
+        self._position = 0
+
+    def readable(self) -> bool:
+        """Return whether the file can be read."""
+        return True
+
+    def seekable(self) -> bool:
+        """Return whether the file can be rewound."""
+        # xmlschema checks this when finalizing a lazy parse, which may happen after closing
+        return not self.closed
+
+    def readinto(self, buffer: bytearray) -> int:  # type: ignore[override]
+        """Copy mapped data into a buffer, returning the number of bytes read."""
+        start = self._position
+        end = max(start, min(start + len(buffer), len(self.buffer)))
+        buffer[: end - start] = self.buffer[start:end]
+        self._position = end
+        return end - start
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """Return mapped data with a single copy."""
+        start = self._position
+        end = len(self.buffer) if size is None or size < 0 else min(len(self.buffer), start + size)
+        data = self.buffer[start:end].tobytes()
+        self._position = max(start, end)
+        return data
+
+    def tell(self) -> int:
+        """Return the position in the file."""
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Move to a position in the file."""
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self.buffer)
+        self._position = max(0, offset)
+        return self._position
+
+    def close(self) -> None:
+        """Unmap the file."""
+        if not self.closed:
+            self.buffer.release()
+            self._mmap.close()
+        super().close()
@@ -0,0 +1,48 @@
+"""URL opener handing the downloads of xmlschema, such as schema imports, to the shared HTTP session and FTP pool."""
+
+import urllib.error
+import urllib.request
+from email.message import Message
+from io import BytesIO
+from urllib.response import addinfourl
+
+from .fetch import http_get
+from .ftp import open_ftp
+
+
+class _SessionHandler(urllib.request.BaseHandler):
+    """Open HTTP(S) and FTP URLs requested by xmlschema, such as schema imports, like any other download."""
+
+    # Take precedence over the default urllib handlers
+    handler_order = 100
+
+    def http_open(self, req: urllib.request.Request) -> addinfourl:
+        """Download an URL through the shared session and HTTP cache."""
+        import requests
+
+        try:
+            resp = http_get(req.full_url)
+            resp.raise_for_status()
+        except requests.exceptions.RequestException as err:
+            raise urllib.error.URLError(str(err))
+        return addinfourl(BytesIO(resp.content), resp.headers, req.full_url, resp.status_code)  # type: ignore
+
+    https_open = http_open
+
+    def ftp_open(self, req: urllib.request.Request) -> addinfourl:
+        """Download an FTP URL over the shared connection pool."""
+        import ftplib
+
+        try:
+            reader = open_ftp(req.full_url)
+        except ftplib.all_errors as err:
+            raise urllib.error.URLError(str(err))
+        return addinfourl(reader, Message(), req.full_url)
+
+
+def url_opener() -> urllib.request.OpenerDirector:
+    """Return an URL opener for xmlschema that shares the connection pools and HTTP cache."""
+    opener = urllib.request.OpenerDirector()
+    for handler in (_SessionHandler(), urllib.request.FileHandler(), urllib.request.UnknownHandler()):
+        opener.add_handler(handler)
+    return opener
@@ -0,0 +1,128 @@
+"""Index of a schema directory by the global elements its schemas declare."""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Type, Union
+from xml.etree import ElementTree
+
+import xmlschema
+
+from .mapped import Prolog
+from .schema_cache import get_schema
+from .utils import atomic_write, cache_dir
+
+XSD_NAMESPACE = "{http://www.w3.org/2001/XMLSchema}"
+
+
+class SchemaNotFound(LookupError):
+    """No schema of a registry declares the root element of a document."""
+
+
+def _declared_elements(path: Path) -> List[str]:
+    """Return the global elements declared by a schema file, in ``{namespace}name`` notation."""
+    root = ElementTree.parse(path).getroot()
+    namespace = root.get("targetNamespace")
+    return [
+        f"{{{namespace}}}{child.get('name')}" if namespace else str(child.get("name"))
+        for child in root
+        if child.tag == f"{XSD_NAMESPACE}element" and child.get("name")
+    ]
+
+
+def _signature(directory: Path) -> List[Tuple[str, int, int]]:
+    """Return the name, modification time and size of the schema files of a directory."""
+    files = []
+    for path in sorted(directory.glob("*.xsd")):
+        stat = path.stat()
+        files.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return files
+
+
+class SchemaRegistry:
+    """Schemas of a directory indexed by the global elements they declare, such as ``SAMPLE_SET``.
+
+    The index is built by reading the top level declarations of each ``*.xsd`` file without compiling
+    it, and is persisted under the cache directory until a schema file is added, removed or changed.
+    An element declared by several schemas is attributed to the first one in file name order.
+    Schemas are compiled on first use through the shared schema cache, so that every document with
+    the same root element is validated against a single compiled schema.
+    """
+
+    def __init__(self, directory: Union[str, Path], elements: Dict[str, str], persistent: bool = True) -> None:
+        """Initialise a registry from an index.
+
+        :param directory: Directory of the schema files
+        :param elements: File names of the schemas by the elements they declare
+        :param persistent: Whether compiled schemas may be loaded from and saved to the persistent store
+        """
+        self.directory = Path(directory).resolve()
+        self.elements = elements
+        self.persistent = persistent
+
+    @staticmethod
+    def _index_file(directory: Path) -> Path:
+        """Return the file of the persisted index of a directory."""
+        digest = hashlib.sha256(str(directory).encode("UTF-8")).hexdigest()
+        return cache_dir() / "registry" / (digest + ".json")
+
+    @classmethod
+    def build(cls: Type["SchemaRegistry"], directory: Union[str, Path], persistent: bool = True) -> "SchemaRegistry":
+        """Index the schema files of a directory.
+
+        :raises ElementTree.ParseError: If a schema file is not well-formed
+        """
+        directory = Path(directory).resolve()
+        elements: Dict[str, str] = {}
+        for path in sorted(directory.glob("*.xsd")):
+            for element in _declared_elements(path):
+                elements.setdefault(element, path.name)
+        return cls(directory, elements, persistent)
+
+    @classmethod
+    def load(cls: Type["SchemaRegistry"], directory: Union[str, Path], persistent: bool = True) -> "SchemaRegistry":
+        """Return the registry of a directory, from its persisted index when the schema files are unchanged."""
+        directory = Path(directory).resolve()
+        signature = [list(entry) for entry in _signature(directory)]
+        index_file = cls._index_file(directory)
+        try:
+            index = json.loads(index_file.read_text("UTF-8"))
+            if index["directory"] == str(directory) and index["files"] == signature:
+                return cls(directory, index["elements"], persistent)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        registry = cls.build(directory, persistent)
+        index = {"directory": str(directory), "files": signature, "elements": registry.elements}
+        try:
+            atomic_write(index_file, json.dumps(index).encode("UTF-8"))
+        except OSError:
+            # The index only saves reading the schema files, detection goes on without it
+            pass
+        return registry
+
+    def fingerprint(self) -> str:
+        """Return a hash identifying the registry by the content of its schema files."""
+        digest = hashlib.sha256(str(self.directory).encode("UTF-8"))
+        for path in sorted(self.directory.glob("*.xsd")):
+            digest.update(b"\0" + path.name.encode("UTF-8") + b"\0" + hashlib.sha256(path.read_bytes()).digest())
+        digest.update(b"\0" + xmlschema.__version__.encode("UTF-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prolog: Optional[Prolog]) -> Optional[Path]:
+        """Return the schema file declaring the root element of a document, if any."""
+        if prolog is None or prolog.root not in self.elements:
+            return None
+        return self.directory / self.elements[prolog.root]
+
+    def schema_for(self, prolog: Optional[Prolog]) -> xmlschema.XMLSchema:
+        """Return the compiled schema declaring the root element of a document.
+
+        :param prolog: Prolog of the document, see :func:`scan_prolog`
+        :raises SchemaNotFound: If no schema of the directory declares the root element
+        """
+        path = self.lookup(prolog)
+        if path is None:
+            root = f"root element {prolog.root!r}" if prolog is not None else "root element"
+            raise SchemaNotFound(f"Error: No schema in {self.directory} declares the {root} of the document.\n")
+        return get_schema(str(path), persistent=self.persistent)
@@ -0,0 +1,216 @@
+"""Persistent cache of validation verdicts of unchanged local documents."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+
+from .utils import cache_dir
+
+if TYPE_CHECKING:
+    import xmlschema
+
+    from .registry import SchemaRegistry
+    from .validation import ValidationOptions, ValidationResult
+
+DEFAULT_MAX_SIZE = 64 * 1024**2
+# Seconds a file must have been left alone before its size and modification time are trusted to identify its content
+RACY_INTERVAL = 2.0
+# Bytes counted for each row on top of its text, for size bounded eviction
+_ROW_OVERHEAD = 64
+
+_TABLES = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY, status TEXT NOT NULL, schema TEXT, errors TEXT NOT NULL,
+    size INTEGER NOT NULL, used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL, used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+CREATE INDEX IF NOT EXISTS files_used ON files (used);
+"""
+
+# Identities of schemas and registries, computed once per object
+_fingerprints: "weakref.WeakKeyDictionary[object, Optional[str]]" = weakref.WeakKeyDictionary()
+
+
+def _fingerprint(schema: Union["xmlschema.XMLSchema", "SchemaRegistry"]) -> Optional[str]:
+    """Return a hash identifying a schema or registry, None if it cannot be identified from local files."""
+    from .registry import SchemaRegistry
+    from .schema_cache import schema_fingerprint
+    from .schema_pack import PACK_VERSION, pack_schema_name
+
+    if schema not in _fingerprints:
+        if isinstance(schema, SchemaRegistry):
+            _fingerprints[schema] = schema.fingerprint()
+        elif (name := pack_schema_name(schema)) is not None:
+            # Precompiled pack schemas are only rebuilt with a new pack version
+            _fingerprints[schema] = f"pack {PACK_VERSION} {name}"
+        else:
+            _fingerprints[schema] = schema_fingerprint(schema)
+    return _fingerprints[schema]
+
+
+class ResultCache:
+    """Verdicts and errors of validated local documents, in an SQLite database.
+
+    Verdicts are keyed by the SHA-256 hash of the document together with a hash of the schema files, the
+    versions of the validation engine and the options changing the outcome, so that a document is only
+    validated again once any of them changes. The hash of a file is kept with its size and modification
+    time, and recomputed only when either changes. Each process has its own connection, so that batch
+    workers read and write the cache concurrently.
+    """
+
+    def __init__(self, path: Path, max_size: Optional[int] = DEFAULT_MAX_SIZE) -> None:
+        """Initialise a cache in a database file.
+
+        :param path: Database file, created on first use
+        :param max_size: Size in bytes the cache is pruned to by :meth:`prune`, None for no limit
+        """
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _db(self) -> sqlite3.Connection:
+        """Return the connection of this process, opening it on first use."""
+        if self._connection is None or self._pid != os.getpid():
+            # A connection inherited from the parent process must not be used, nor closed
+            self.path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_TABLES)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def _digest(self, path: str) -> str:
+        """Return the hash of a file, from the cache if its size and modification time are unchanged."""
+        stat = os.stat(path)
+        db = self._db()
+        row = db.execute("SELECT size, mtime_ns, digest FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[:2] == (stat.st_size, stat.st_mtime_ns):
+            db.execute("UPDATE files SET used = ? WHERE path = ?", (time.time(), path))
+            return str(row[2])
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        # A file changed again within the resolution of its modification time would go unnoticed
+        if time.time() - stat.st_mtime > RACY_INTERVAL:
+            db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, digest, time.time()),
+            )
+        return digest
+
+    def key(
+        self,
+        xml_file: str,
+        schema: Union["xmlschema.XMLSchema", "SchemaRegistry"],
+        options: "ValidationOptions",
+    ) -> Optional[str]:
+        """Return the key of the verdict of a local document, None if it cannot be cached.
+
+        Documents downloaded from an URL and schemas not built from local files only are not cached.
+        """
+        from .engine import engine_version
+
+        if not os.path.isfile(xml_file):
+            return None
+        fingerprint = _fingerprint(schema)
+        if fingerprint is None:
+            return None
+        with self._lock:
+            try:
+                digest = self._digest(os.path.abspath(xml_file))
+            except (OSError, sqlite3.Error):
+                return None
+        identity = [digest, fingerprint, engine_version(options.engine), options.stream, options.max_errors]
+        return hashlib.sha256(json.dumps(identity).encode("UTF-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[Tuple[str, Optional[str], List[str]]]:
+        """Return the status, schema name and errors stored under a key, if any."""
+        with self._lock:
+            try:
+                db = self._db()
+                row = db.execute("SELECT status, schema, errors FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+            except sqlite3.Error:
+                row = None
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0], row[1], json.loads(row[2])
+
+    def save(self, key: str, result: "ValidationResult") -> None:
+        """Store the verdict of a document, unless it depends on more than the document and the schema."""
+        from .validation import Status
+
+        if result.status not in (Status.VALID, Status.INVALID, Status.MALFORMED, Status.UNKNOWN):
+            return None
+        errors = json.dumps(result.errors)
+        size = len(key) + len(errors) + len(result.schema or "") + _ROW_OVERHEAD
+        with self._lock:
+            try:
+                self._db().execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, result.status.value, result.schema, errors, size, time.time()),
+                )
+            except sqlite3.Error:
+                # The cache only saves validating again, a locked or full database is not an error
+                pass
+
+    def prune(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> Tuple[int, int]:
+        """Evict least recently used verdicts and file hashes.
+
+        :param max_size: Remove the oldest entries until the cache holds at most this many bytes
+        :param max_age: Remove entries not used within this many seconds
+        :returns: Number of entries and bytes removed
+        """
+        if not self.path.exists():
+            return 0, 0
+        with self._lock:
+            db = self._db()
+            entries = db.execute(
+                "SELECT used, size FROM results UNION ALL "
+                f"SELECT used, length(path) + {_ROW_OVERHEAD} FROM files ORDER BY used DESC"
+            ).fetchall()
+            cutoffs = [time.time() - max_age] if max_age is not None else []
+            total = 0
+            for used, size in entries:
+                total += size
+                if max_size is not None and total > max_size:
+                    # This entry and all older ones
+                    cutoffs.append(used)
+                    break
+            if not cutoffs:
+                return 0, 0
+            removed = freed = 0
+            for table, size in (("results", "size"), ("files", f"length(path) + {_ROW_OVERHEAD}")):
+                count, bytes_ = db.execute(
+                    f"SELECT count(*), coalesce(sum({size}), 0) FROM {table} WHERE used <= ?", (max(cutoffs),)  # nosec
+                ).fetchone()
+                db.execute(f"DELETE FROM {table} WHERE used <= ?", (max(cutoffs),))  # nosec
+                removed += count
+                freed += bytes_
+        return removed, freed
+
+    def close(self) -> None:
+        """Close the connection of this process."""
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+result_cache = ResultCache(cache_dir() / "results.sqlite3")
@@ -0,0 +1,271 @@
+"""Cache of compiled XML Schemas shared by all validation code paths."""
+
+import hashlib
+import pickle  # nosec
+import platform
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote, urlparse
+from xml.etree import ElementTree
+
+import xmlschema
+
+from .opener import url_opener
+from .utils import atomic_write, cache_dir, prune_lru, touch
+
+# Schemas bundled with xmlschema itself are covered by the xmlschema version in the store key
+_XMLSCHEMA_URI = Path(xmlschema.__file__).parent.as_uri()
+_XSD_IMPORT = "{http://www.w3.org/2001/XMLSchema}import"
+_XSD_REFERENCES = (
+    _XSD_IMPORT,
+    "{http://www.w3.org/2001/XMLSchema}include",
+    "{http://www.w3.org/2001/XMLSchema}redefine",
+)
+
+
+def _hash_file(path: str) -> Optional[str]:
+    """Return the SHA-256 hex digest of a file, or None if it cannot be read."""
+    try:
+        return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def _components(schema: xmlschema.XMLSchema) -> Dict[str, str]:
+    """Map the local files a compiled schema was built from to their content hashes."""
+    components = {}
+    for component in schema.maps.iter_schemas():
+        url = component.url or ""
+        if url.startswith("file:") and not url.startswith(_XMLSCHEMA_URI):
+            path = unquote(urlparse(url).path)
+            digest = _hash_file(path)
+            if digest is not None:
+                components[path] = digest
+    return components
+
+
+def _unchanged(components: Dict[str, str]) -> bool:
+    """Return whether the local files a schema was built from still have the recorded content."""
+    return all(_hash_file(path) == digest for path, digest in components.items())
+
+
+def schema_fingerprint(schema: xmlschema.XMLSchema) -> Optional[str]:
+    """Return a hash identifying a compiled schema by the content of the files it was built from.
+
+    :returns: The hash, or None if the schema was not built from local files only, or one of them is gone
+    """
+    urls = {component.url or "" for component in schema.maps.iter_schemas()}
+    urls = {url for url in urls if not url.startswith(_XMLSCHEMA_URI)}
+    components = _components(schema)
+    if not urls or len(components) != len(urls):
+        return None
+    identity = [sorted(components.items()), xmlschema.__version__]
+    return hashlib.sha256(repr(identity).encode("UTF-8")).hexdigest()
+
+
+def _local_imports(path: str, tags: Tuple[str, ...] = (_XSD_IMPORT,)) -> List[str]:
+    """Return the local schema files imported by a schema file, in document order.
+
+    :param tags: Elements referencing other schema files, imports only by default
+    """
+    try:
+        root = ElementTree.parse(path).getroot()
+    except (OSError, ElementTree.ParseError):
+        return []
+    imports = []
+    for child in root:
+        location = child.get("schemaLocation")
+        if child.tag not in tags or not location or urlparse(location).scheme:
+            continue
+        imported = Path(path).parent / location
+        if imported.is_file():
+            imports.append(str(imported.resolve()))
+    return imports
+
+
+def local_schema_files(path: str) -> Set[str]:
+    """Return a schema file and the local schema files it imports or includes, transitively, without compiling it."""
+    files: Set[str] = set()
+    pending = [str(Path(path).resolve())]
+    while pending:
+        current = pending.pop()
+        if current not in files:
+            files.add(current)
+            pending.extend(_local_imports(current, _XSD_REFERENCES))
+    return files
+
+
+class SchemaStore:
+    """Persistent store of serialized compiled schemas.
+
+    Entries are keyed by schema location and content hash together with the xmlschema and
+    Python versions, because pickled schemas are only loadable by the versions that wrote them.
+    Each entry records the hashes of the local files the schema imports or includes, and an entry
+    is discarded as soon as any of them has changed. Loading an entry refreshes its modification
+    time, which :meth:`prune` uses for least recently used eviction.
+    """
+
+    def __init__(self, path: Path, max_size: Optional[int] = 256 * 1024**2) -> None:
+        """Initialise a store in the given directory.
+
+        :param path: Directory for the serialized schemas, created on first write
+        :param max_size: Total size in bytes the store is pruned to after each write, None for no limit
+        """
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, location: str, digest: str) -> Path:
+        """Return the file of the entry for a schema location and content hash."""
+        version = f"{location}\0{digest}\0{xmlschema.__version__}\0{platform.python_version()}"
+        return self.path / (hashlib.sha256(version.encode("UTF-8")).hexdigest() + ".pickle")
+
+    def load(self, location: str, digest: str) -> Optional[xmlschema.XMLSchema]:
+        """Return the stored schema, or None if it is missing or out of date."""
+        entry = self._entry(location, digest)
+        try:
+            with entry.open("rb") as f:
+                components, schema = pickle.load(f)  # nosec
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Unreadable or truncated entry, written by an interrupted process
+            entry.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        if not _unchanged(components):
+            entry.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        touch(entry)
+        self.hits += 1
+        return schema
+
+    def save(self, location: str, digest: str, schema: xmlschema.XMLSchema) -> None:
+        """Serialize a compiled schema into the store."""
+        data = pickle.dumps((_components(schema), schema), protocol=pickle.HIGHEST_PROTOCOL)
+        atomic_write(self._entry(location, digest), data)
+        if self.max_size is not None:
+            self.prune(self.max_size)
+
+    def prune(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> Tuple[int, int]:
+        """Evict least recently used entries.
+
+        :param max_size: Remove the oldest entries until the store is at most this many bytes
+        :param max_age: Remove entries not used within this many seconds
+        :returns: Number of entries and bytes removed
+        """
+        return prune_lru(self.path, "*.pickle", max_size, max_age)
+
+
+class SchemaCache:
+    """In-process cache of compiled XML Schemas.
+
+    Schemas are keyed by their resolved location together with a hash of their content,
+    so an unchanged schema is compiled only once per process while an edited one is rebuilt.
+    The local files a cached schema imports or includes are checked the same way before it is
+    returned, so a long running process notices an edited import too.
+    Schemas not yet compiled in this process are looked up from the optional persistent store
+    before falling back to compilation.
+
+    A local schema importing a single other local schema, as every ENA schema imports
+    ``SRA.common.xsd``, is compiled on top of the cached imported schema, whose global components
+    are then shared instead of being parsed and built again for each schema importing it.
+    """
+
+    def __init__(self, store: Optional[SchemaStore] = None) -> None:
+        """Initialise an empty cache backed by an optional persistent store."""
+        # Compiled schemas with the hashes of the local files they were built from
+        self._schemas: Dict[Tuple[str, str], Tuple[xmlschema.XMLSchema, Dict[str, str]]] = {}
+        # Imported schemas whose components are shared by the schemas importing them
+        self._imported: Dict[Tuple[str, str], Tuple[xmlschema.XMLSchema, Dict[str, str]]] = {}
+        self._compiling: Set[str] = set()
+        self._lock = threading.Lock()
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source: str, url: Optional[str] = None, persistent: bool = True) -> xmlschema.XMLSchema:
+        """Return the compiled schema for the given source.
+
+        :param source: Path of a local schema file, or the schema text when ``url`` is given
+        :param url: URL the schema text was fetched from
+        :param persistent: Whether the persistent store may be used
+        :returns: Compiled schema, shared between all callers asking for the same schema
+        """
+        if url is None:
+            location = str(Path(source).resolve())
+            content = Path(location).read_bytes()
+        else:
+            location = url
+            content = source.encode("UTF-8")
+        key = (location, hashlib.sha256(content).hexdigest())
+
+        with self._lock:
+            entry = self._schemas.get(key)
+            if entry is not None and _unchanged(entry[1]):
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+            store = self.store if persistent else None
+            schema = store.load(*key) if store is not None else None
+            if schema is None:
+                # Remote imports are downloaded through the shared session and HTTP cache
+                if url is None:
+                    schema = self._compile(location)
+                else:
+                    schema = xmlschema.XMLSchema(source, base_url=url.rsplit("/", 1)[0], opener=url_opener())
+                if store is not None:
+                    try:
+                        store.save(*key, schema)
+                    except Exception:  # nosec
+                        # The store only saves compilation time, validation goes on without it
+                        pass
+            self._schemas[key] = (schema, _components(schema))
+            return schema
+
+    def _compile(self, location: str) -> xmlschema.XMLSchema:
+        """Compile a local schema file, sharing the components of the local schema it imports."""
+        imports = [path for path in _local_imports(location) if path not in self._compiling]
+        self._compiling.add(location)
+        try:
+            parent = self._shared_import(imports[0]) if len(imports) == 1 else None
+            return xmlschema.XMLSchema(location, opener=url_opener(), parent=parent)
+        finally:
+            self._compiling.discard(location)
+
+    def _shared_import(self, path: str) -> xmlschema.XMLSchema:
+        """Return the compiled schema of an imported local schema file, compiling it once per content."""
+        key = (path, hashlib.sha256(Path(path).read_bytes()).hexdigest())
+        entry = self._imported.get(key)
+        if entry is None or not _unchanged(entry[1]):
+            schema = self._compile(path)
+            entry = self._imported[key] = (schema, _components(schema))
+        return entry[0]
+
+    def clear(self) -> None:
+        """Drop all cached schemas and reset the counters."""
+        with self._lock:
+            self._schemas.clear()
+            self._imported.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached schemas."""
+        return len(self._schemas)
+
+
+# Cache shared by the command line tool and library users within one process
+schema_cache = SchemaCache(SchemaStore(cache_dir() / "schemas"))
+
+
+def get_schema(source: str, url: Optional[str] = None, persistent: bool = True) -> xmlschema.XMLSchema:
+    """Return a compiled schema from the process wide schema cache."""
+    return schema_cache.get(source, url, persistent)
@@ -0,0 +1,92 @@
+"""ENA, SRA and EGA metadata schemas shipped with the package, with precompiled schema objects."""
+
+import pickle  # nosec
+import platform
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    # The command line lists the pack without loading the validation engine
+    import xmlschema
+
+# Version of the bundled schema files, raised whenever they are updated from the archives
+PACK_VERSION = "1.0"
+PACK_DIR = Path(__file__).parent / "schemas"
+
+_loaded: Dict[str, "xmlschema.XMLSchema"] = {}
+_lock = threading.Lock()
+
+
+def pack_schemas() -> Dict[str, Path]:
+    """Return the schema files of the pack by their names, such as ``sra.sample`` for ``SRA.sample.xsd``."""
+    return {path.stem.lower(): path for path in sorted(PACK_DIR.glob("*.xsd"))}
+
+
+def compiled_dir(directory: Path) -> Path:
+    """Return the directory of the schema objects precompiled for the running xmlschema and Python versions.
+
+    Pickled schemas are only loadable by the versions that wrote them, so each combination has its own.
+    """
+    import xmlschema
+
+    python = ".".join(platform.python_version_tuple()[:2])
+    return directory / "compiled" / f"{PACK_VERSION}-xmlschema{xmlschema.__version__}-py{python}"
+
+
+def compile_pack(directory: Path) -> List[Path]:
+    """Compile the schemas of a pack directory and serialize them next to it, see :func:`compiled_dir`.
+
+    This is run when the package is built, so that installed packs load without compiling anything.
+
+    :returns: Files of the serialized schemas
+    """
+    from .schema_cache import SchemaCache
+
+    target = compiled_dir(directory)
+    target.mkdir(parents=True, exist_ok=True)
+    # A cache of its own, so that the common schema is built once without touching the persistent store
+    cache = SchemaCache()
+    written = []
+    for path in sorted(directory.glob("*.xsd")):
+        schema = cache.get(str(path), persistent=False)
+        output = target / (path.stem.lower() + ".pickle")
+        output.write_bytes(pickle.dumps(schema, protocol=pickle.HIGHEST_PROTOCOL))
+        written.append(output)
+    return written
+
+
+def pack_schema_name(schema: "xmlschema.XMLSchema") -> Optional[str]:
+    """Return the name of a schema loaded precompiled from the pack, None for any other schema."""
+    with _lock:
+        return next((name for name, loaded in _loaded.items() if loaded is schema), None)
+
+
+def load_pack_schema(name: str, persistent: bool = True) -> "xmlschema.XMLSchema":
+    """Return the compiled schema of the pack with a name, case insensitively.
+
+    The precompiled object is loaded when the package was built with the running xmlschema and Python
+    versions. Otherwise the bundled schema file is compiled through the shared schema cache, which keeps
+    it in the persistent store for later runs. Neither needs network access.
+
+    :param name: Name of the schema, see :func:`pack_schemas`
+    :param persistent: Whether a schema compiled from its file may be loaded from and saved to the persistent store
+    :raises KeyError: If the pack has no schema with that name
+    """
+    from .schema_cache import get_schema
+
+    name = name.lower()
+    path = pack_schemas()[name]
+    with _lock:
+        schema = _loaded.get(name)
+        if schema is None:
+            try:
+                with (compiled_dir(PACK_DIR) / (name + ".pickle")).open("rb") as f:
+                    schema = pickle.load(f)  # nosec
+            except FileNotFoundError:
+                schema = None
+            if schema is not None:
+                _loaded[name] = schema
+    if schema is None:
+        schema = get_schema(str(path), persistent=persistent)
+    return schema
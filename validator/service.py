@@ -0,0 +1,283 @@
+"""HTTP service validating posted XML documents on a pool of pre-warmed worker processes."""
+
+import json
+import multiprocessing
+import os
+import signal
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Any, Dict, Optional, Tuple, Union, cast
+from urllib.parse import parse_qs, urlparse
+
+import xmlschema
+
+from .compression import decompressed, detect_compression
+from .fetch import FetchedDocument
+from .mapped import MMAP_THRESHOLD
+from .registry import SchemaRegistry
+from .schema_cache import get_schema
+from .schema_pack import PACK_DIR, load_pack_schema, pack_schemas
+from .validation import ValidationOptions, ValidationResult, validate_document, validate_fetched
+
+DEFAULT_MAX_BODY_SIZE = 100 * 1024**2
+# Bytes of a request body read from the connection at a time
+BODY_CHUNK_SIZE = 64 * 1024
+
+# Compiled schemas by id and the registry choosing among them, set once by the pool initializer
+_worker_schemas: Dict[str, xmlschema.XMLSchema] = {}
+_worker_registry: Optional[SchemaRegistry] = None
+
+
+def load_schemas(schema_dir: Optional[str] = None) -> Tuple[Dict[str, xmlschema.XMLSchema], SchemaRegistry]:
+    """Compile the schemas offered by the service, by id.
+
+    Ids are the names of the bundled schema pack, such as ``sra.sample``, and the lower case file names
+    without extension of the schemas of ``schema_dir``, which take precedence.
+
+    :returns: Compiled schemas by id, and the registry choosing among them by root element
+    """
+    schemas = {name: load_pack_schema(name) for name in pack_schemas()}
+    if schema_dir is None:
+        return schemas, SchemaRegistry.load(PACK_DIR)
+    for path in sorted(Path(schema_dir).glob("*.xsd")):
+        schemas[path.stem.lower()] = get_schema(str(path))
+    return schemas, SchemaRegistry.load(schema_dir)
+
+
+def _init_worker(schemas: Dict[str, xmlschema.XMLSchema], registry: SchemaRegistry) -> None:
+    """Keep the compiled schemas for all requests handled by this worker."""
+    global _worker_schemas, _worker_registry
+    _worker_schemas, _worker_registry = schemas, registry
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _validate_request(
+    source: str, schema_id: Optional[str], body: Optional[bytes], path: Optional[str], options: ValidationOptions
+) -> ValidationResult:
+    """Validate a request body held in memory or spooled to a file, or else the document at the URL ``source``.
+
+    :param source: Name of the document reported in the result, or its URL
+    :param schema_id: Id of the schema, None to choose it by the root element
+    :param body: Body of the request, if it is held in memory
+    :param path: File the body of the request was spooled to
+    :param options: How to validate the document
+    """
+    schema: Union[xmlschema.XMLSchema, SchemaRegistry]
+    if schema_id is None:
+        assert _worker_registry is not None  # nosec
+        schema = _worker_registry
+    else:
+        schema = _worker_schemas[schema_id]
+    if body is not None:
+        compression = detect_compression(body[:6])
+        stream = cast(IO[bytes], decompressed(BytesIO(body), compression)) if compression else BytesIO(body)
+        return validate_fetched(FetchedDocument(source, "", True, stream=stream), schema, options)
+    if path is not None:
+        return validate_fetched(FetchedDocument(source, path, False), schema, options)
+    return validate_document(source, schema, options)
+
+
+def _result_json(result: ValidationResult, schema_id: Optional[str]) -> Dict[str, Any]:
+    """Return the JSON representation of a validation result."""
+    return {
+        "source": result.source,
+        "status": result.status.value,
+        "valid": result.valid,
+        "schema": schema_id if schema_id is not None or result.schema is None else Path(result.schema).stem.lower(),
+        "errors": result.errors,
+        "validate_time": round(result.validate_time, 6),
+    }
+
+
+class ServiceError(Exception):
+    """Request the service answers with an HTTP error status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialise an error answered with a status code and a message."""
+        super().__init__(message)
+        self.status = status
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """Handle the requests of the validation service."""
+
+    server: "ValidationService"
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        """Send a JSON response."""
+        data = json.dumps(body).encode("UTF-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        """Log requests only when the service is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self) -> None:
+        """List the schemas offered by the service, or report its load."""
+        path = urlparse(self.path).path
+        if path == "/schemas":
+            self._send_json(200, {"schemas": sorted(self.server.schemas)})
+        elif path == "/health":
+            self._send_json(200, self.server.load())
+        else:
+            self._send_json(404, {"error": f"No such resource: {path}"})
+
+    def do_POST(self) -> None:
+        """Validate the XML document in the body of the request, or at the URL given as a parameter."""
+        url = urlparse(self.path)
+        if url.path != "/validate":
+            self.close_connection = True
+            self._send_json(404, {"error": f"No such resource: {url.path}"})
+            return None
+        if not self.server.slots.acquire(blocking=False):
+            # Answered without reading the body, which a busy service should not spend time on
+            self.close_connection = True
+            self._send_json(503, {"error": "The validation service is busy."}, {"Retry-After": "1"})
+            return None
+        try:
+            result, schema_id = self._validate(parse_qs(url.query))
+            self._send_json(200, _result_json(result, schema_id))
+        except ServiceError as err:
+            self.close_connection = True
+            self._send_json(err.status, {"error": str(err)})
+        finally:
+            self.server.slots.release()
+
+    def _validate(self, query: Dict[str, Any]) -> Tuple[ValidationResult, Optional[str]]:
+        """Validate the document of a request on the worker pool.
+
+        :raises ServiceError: If the request cannot be validated
+        """
+        schema_id = query.get("schema", [None])[0]
+        if schema_id is not None:
+            schema_id = schema_id.lower()
+            if schema_id not in self.server.schemas:
+                raise ServiceError(400, f"Unknown schema: {schema_id}")
+        try:
+            max_errors = max(1, int(query.get("max_errors", ["1"])[0]))
+        except ValueError:
+            raise ServiceError(400, "max_errors must be a number")
+        options = ValidationOptions(max_errors=max_errors)
+
+        document_url = query.get("url", [None])[0]
+        if document_url is not None:
+            if urlparse(document_url).scheme not in ("http", "https", "ftp"):
+                raise ServiceError(400, "Only http, https and ftp URLs can be validated")
+            if self.headers.get("Content-Length", "0") != "0":
+                # The body is not read, so the connection cannot carry further requests
+                self.close_connection = True
+            return self.server.run(document_url, schema_id, None, None, options), schema_id
+
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            raise ServiceError(411, "The request body needs a Content-Length")
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ServiceError(411, "The request body needs a Content-Length")
+        if length > self.server.max_body_size:
+            raise ServiceError(413, f"The request body is larger than {self.server.max_body_size} bytes")
+        source = query.get("name", ["request"])[0]
+        if length < MMAP_THRESHOLD:
+            return self.server.run(source, schema_id, self.rfile.read(length), None, options), schema_id
+
+        # Large bodies go to a file as they arrive, which the worker then maps instead of receiving a copy
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as spool:
+            try:
+                remaining = length
+                while remaining:
+                    chunk = self.rfile.read(min(BODY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ServiceError(400, "The request body ended early")
+                    spool.write(chunk)
+                    remaining -= len(chunk)
+                spool.close()
+                return self.server.run(source, schema_id, None, spool.name, options), schema_id
+            finally:
+                os.unlink(spool.name)
+
+
+class ValidationService(ThreadingHTTPServer):
+    """HTTP service validating documents against precompiled schemas on a pool of worker processes.
+
+    ``POST /validate?schema=ID`` validates the XML document in the request body, which may be compressed,
+    and ``POST /validate?schema=ID&url=URL`` the document at an URL. Without ``schema`` the schema is
+    chosen by the root element of the document. ``GET /schemas`` lists the schema ids.
+
+    The schemas are compiled before the workers start, which inherit them when the platform forks. At most
+    ``workers + queue_size`` requests are validated or waiting at a time; further requests are answered
+    with ``503 Service Unavailable`` without reading their body.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        workers: int = 1,
+        queue_size: int = 16,
+        max_body_size: int = DEFAULT_MAX_BODY_SIZE,
+        schema_dir: Optional[str] = None,
+        verbose: bool = False,
+    ) -> None:
+        """Compile the schemas, start the workers and listen on an address.
+
+        :param address: Host and port to listen on, port 0 for any free port
+        :param workers: Number of worker processes
+        :param queue_size: Number of requests waiting for a worker before the service answers 503
+        :param max_body_size: Largest request body accepted, in bytes
+        :param schema_dir: Directory of schemas offered in addition to the bundled schema pack
+        :param verbose: Log each request to stderr
+        """
+        self.schemas, registry = load_schemas(schema_dir)
+        self.workers = workers
+        self.max_body_size = max_body_size
+        self.verbose = verbose
+        self.capacity = workers + queue_size
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.pool = multiprocessing.Pool(workers, _init_worker, (self.schemas, registry))
+        try:
+            super().__init__(address, _RequestHandler)
+        except BaseException:
+            self.pool.terminate()
+            raise
+
+    def run(
+        self,
+        source: str,
+        schema_id: Optional[str],
+        body: Optional[bytes],
+        path: Optional[str],
+        options: ValidationOptions,
+    ) -> ValidationResult:
+        """Validate a document on the worker pool, waiting for the result, see :func:`_validate_request`."""
+        with self._lock:
+            self._pending += 1
+        try:
+            return self.pool.apply(_validate_request, (source, schema_id, body, path, options))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def load(self) -> Dict[str, int]:
+        """Return the number of workers and of requests being validated or waiting."""
+        with self._lock:
+            return {"workers": self.workers, "pending": self._pending, "capacity": self.capacity}
+
+    def server_close(self) -> None:
+        """Stop listening and stop the workers."""
+        super().server_close()
+        self.pool.terminate()
+        self.pool.join()
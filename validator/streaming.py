@@ -0,0 +1,80 @@
+"""Streaming validation of large record set documents such as SAMPLE_SET or RUN_SET."""
+
+from typing import IO, Any, Dict, Iterator, Optional, Tuple, Union
+from xml.etree import ElementTree
+
+import xmlschema
+from xmlschema.validators import XsdGroup
+from xmlschema.validators.exceptions import XMLSchemaValidationError
+
+from .mapped import MappedFile
+
+XSI_NAMESPACE = "{http://www.w3.org/2001/XMLSchema-instance}"
+# Bytes of a memory-mapped document handed to the parser at a time
+FEED_SIZE = 1024**2
+
+
+def _iterparse(source: Union[str, IO[bytes]]) -> Iterator[Tuple[str, Any]]:
+    """Parse a document incrementally, feeding a memory-mapped document to the parser without copying it."""
+    if not isinstance(source, MappedFile):
+        yield from ElementTree.iterparse(source, events=("start", "end"))
+        return
+    parser: Any = ElementTree.XMLPullParser(events=("start", "end"))
+    for start in range(0, len(source.buffer), FEED_SIZE):
+        end = start + FEED_SIZE
+        parser.feed(source.buffer[start:end])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def iter_record_errors(
+    source: Union[str, IO[bytes]], schema: xmlschema.XMLSchema
+) -> Iterator[XMLSchemaValidationError]:
+    """Validate a document record by record without building the whole tree.
+
+    The document is parsed incrementally. The root element is checked against its global
+    declaration in the schema, and each top level child record is validated against the
+    matching element declaration as soon as it has been parsed, after which it is discarded.
+    Peak memory is therefore bounded by the size of the largest record rather than of the document.
+
+    Constraints that span records, such as the order and number of records under the root
+    and identity constraints between records, are not checked in this mode.
+
+    :param source: Path of the XML document or a binary file object, such as a :class:`MappedFile`
+    :param schema: Compiled schema to validate against
+    :returns: Iterator over the validation errors
+    :raises ParseError: If the document is not well-formed
+    """
+    root = None
+    records: Dict[Optional[str], Any] = {}
+    depth = 0
+
+    for event, elem in _iterparse(source):
+        if event == "start":
+            depth += 1
+            if root is not None:
+                continue
+            root = elem
+            root_decl = schema.maps.elements.get(elem.tag)
+            if root_decl is None:
+                yield XMLSchemaValidationError(schema, elem, f"{elem.tag!r} is not an element of the schema")
+                return
+            attributes = {name: value for name, value in elem.attrib.items() if not name.startswith(XSI_NAMESPACE)}
+            yield from root_decl.attributes.iter_errors(attributes)
+            content = getattr(root_decl.type, "content", None)
+            if isinstance(content, XsdGroup):
+                records = {decl.name: decl for decl in content.iter_elements()}
+            continue
+
+        depth -= 1
+        if depth != 1:
+            continue
+        decl = records.get(elem.tag)
+        if decl is None:
+            yield XMLSchemaValidationError(schema, elem, f"Unexpected child element {elem.tag!r}")
+        else:
+            yield from decl.iter_errors(elem)
+        # Drop the record just validated so that the tree never grows beyond one record
+        assert root is not None  # nosec
+        root.clear()
@@ -0,0 +1,84 @@
+"""Wall and CPU time spent in each phase of validating documents."""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Phases in the order a document goes through them
+PHASES = ("fetch", "decode", "schema", "check", "parse", "validate")
+
+_local = threading.local()
+
+
+class PhaseTimes:
+    """Wall and CPU seconds spent in each phase.
+
+    The time of a phase excludes the time of the phases nested in it, such as decoding a download
+    within fetching it, so that the phases add up to the time of the whole run. CPU time is that of
+    the thread running the phase, which keeps concurrent downloads from being counted twice.
+    """
+
+    def __init__(self) -> None:
+        """Initialise with no time spent in any phase."""
+        self.wall: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+
+    def record(self, name: str, wall: float, cpu: float) -> None:
+        """Add time spent in a phase."""
+        self.wall[name] = self.wall.get(name, 0.0) + wall
+        self.cpu[name] = self.cpu.get(name, 0.0) + cpu
+
+    def add(self, other: "PhaseTimes") -> None:
+        """Add the time spent in each phase of another measurement."""
+        for name in other.wall:
+            self.record(name, other.wall[name], other.cpu[name])
+
+    def phases(self) -> List[str]:
+        """Return the phases any time was spent in, in the order of :data:`PHASES`."""
+        return sorted(self.wall, key=lambda name: PHASES.index(name) if name in PHASES else len(PHASES))
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        """Return the wall and CPU seconds of each phase, as serialized to JSON."""
+        return {name: {"wall": round(self.wall[name], 6), "cpu": round(self.cpu[name], 6)} for name in self.phases()}
+
+    def __str__(self) -> str:
+        """Return the wall and CPU seconds of each phase on one line."""
+        return ", ".join(f"{name} {self.wall[name]:.3f}/{self.cpu[name]:.3f} s" for name in self.phases()) or "-"
+
+
+@contextmanager
+def recording(times: PhaseTimes) -> Iterator[PhaseTimes]:
+    """Record the phases run by this thread within the block into a measurement."""
+    previous: Tuple[Optional[PhaseTimes], List[List[float]]] = (
+        getattr(_local, "times", None),
+        getattr(_local, "nested", []),
+    )
+    _local.times, _local.nested = times, []
+    try:
+        yield times
+    finally:
+        _local.times, _local.nested = previous
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the time spent in the block to a phase of the measurement this thread records into, if any."""
+    times: Optional[PhaseTimes] = getattr(_local, "times", None)
+    if times is None:
+        yield
+        return
+    nested: List[List[float]] = _local.nested
+    # Wall and CPU time of the phases nested in this one
+    inner = [0.0, 0.0]
+    nested.append(inner)
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        nested.pop()
+        times.record(name, wall - inner[0], cpu - inner[1])
+        if nested:
+            nested[-1][0] += wall
+            nested[-1][1] += cpu
@@ -0,0 +1,98 @@
+"""Helpers shared by the validator modules."""
+
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def cache_dir() -> Path:
+    """Return the root directory for persistent caches.
+
+    ``XML_VALIDATE_CACHE_DIR`` overrides the default ``$XDG_CACHE_HOME/xml-validate``
+    (``~/.cache/xml-validate`` when ``XDG_CACHE_HOME`` is not set).
+    """
+    override = os.environ.get("XML_VALIDATE_CACHE_DIR")
+    if override:
+        return Path(override)
+    xdg_cache = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(xdg_cache) / "xml-validate"
+
+
+def parse_size(value: str) -> int:
+    """Parse a human readable size such as ``512K`` or ``1G`` into bytes."""
+    match = re.fullmatch(r"\s*(\d+)\s*([KMG]?)B?\s*", value.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value}")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def prune_lru(
+    path: Path, pattern: str, max_size: Optional[int] = None, max_age: Optional[float] = None
+) -> Tuple[int, int]:
+    """Evict least recently used cache files, by modification time.
+
+    :param path: Cache directory
+    :param pattern: Glob pattern of the cache files
+    :param max_size: Remove the oldest files until the files take at most this many bytes
+    :param max_age: Remove files not used within this many seconds
+    :returns: Number of files and bytes removed
+    """
+    entries: List[Tuple[float, int, Path]] = []
+    for entry in path.glob(pattern):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    removed = freed = 0
+    for mtime, size, entry in entries:
+        expired = max_age is not None and now - mtime > max_age
+        oversize = max_size is not None and total > max_size
+        if not expired and not oversize:
+            continue
+        entry.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def touch(path: Path) -> None:
+    """Mark a cache file as recently used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+@contextmanager
+def atomic_writer(path: Path) -> Iterator[IO[bytes]]:
+    """Open a cache file for writing, which replaces the file only once the block completes.
+
+    Concurrent readers never see a partial file, and nothing is written if the block raises.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """Write a cache file so that concurrent readers never see a partial file."""
+    with atomic_writer(path) as f:
+        f.write(data)
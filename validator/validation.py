@@ -0,0 +1,300 @@
+"""Validation of a single XML document against a compiled schema."""
+
+import os
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from enum import Enum
+from io import BytesIO
+from itertools import islice
+from types import GeneratorType
+from typing import IO, TYPE_CHECKING, Iterator, List, Optional, Union, cast
+from xml.etree.ElementTree import Element, ParseError
+from xml.parsers import expat
+
+import xmlschema
+from xmlschema.validators.exceptions import XMLSchemaValidationError
+
+from .compression import DECOMPRESSION_ERRORS, file_compression, open_decompressed
+from .engine import lxml_errors, lxml_schema, xmlschema_error
+from .fetch import FetchedDocument, fetch_document
+from .mapped import MMAP_THRESHOLD, PRESCAN_SIZE, MappedFile, scan_prolog
+from .registry import SchemaNotFound, SchemaRegistry
+from .streaming import iter_record_errors
+from .timing import PhaseTimes, phase, recording
+
+if TYPE_CHECKING:
+    from lxml import etree
+
+# Bytes of a streamed download kept in memory before it is spooled to disk for a lazy parse
+SPOOL_SIZE = 16 * 1024**2
+
+
+class Status(str, Enum):
+    """Outcome of validating an XML document."""
+
+    VALID = "valid"
+    INVALID = "invalid"
+    # The document is not well-formed XML
+    MALFORMED = "malformed"
+    # The document could not be read or downloaded
+    UNAVAILABLE = "unavailable"
+    # Validation itself failed unexpectedly
+    ERROR = "error"
+    # No schema of the registry declares the root element of the document
+    UNKNOWN = "unknown schema"
+
+
+@dataclass
+class ValidationResult:
+    """Result of validating one XML document."""
+
+    source: str
+    status: Status
+    errors: List[str] = field(default_factory=list)
+    from_url: bool = False
+    # Seconds spent fetching the document, checking that it is well-formed and validating it
+    fetch_time: float = 0.0
+    validate_time: float = 0.0
+    check_time: float = 0.0
+    # File name of the schema chosen for the document by a schema registry
+    schema: Optional[str] = None
+    # Whether the verdict was read from the result cache instead of validating the document
+    cached: bool = False
+    # Wall and CPU time of each phase, when requested by :attr:`ValidationOptions.timings`
+    phases: Optional[PhaseTimes] = None
+
+    @property
+    def valid(self) -> bool:
+        """Whether the document is valid against the schema."""
+        return self.status is Status.VALID
+
+
+@dataclass(frozen=True)
+class ValidationOptions:
+    """Options controlling how a document is validated."""
+
+    # Validate record by record in bounded memory, see :func:`iter_record_errors`
+    stream: bool = False
+    # Parse lazily, so that validation stops as soon as enough errors have been found
+    fail_fast: bool = False
+    # Number of errors collected for an invalid document
+    max_errors: int = 1
+    # Validation engine, one of :data:`ENGINES`; documents libxml2 cannot validate fall back to xmlschema
+    engine: str = "xmlschema"
+    # Reuse the verdicts of unchanged local documents, see :class:`ResultCache`
+    result_cache: bool = False
+    # Measure the wall and CPU time of each phase, see :class:`PhaseTimes`
+    timings: bool = False
+
+
+def _open_local(path: str, stack: ExitStack) -> Union[str, IO[bytes]]:
+    """Return a local XML file as a path, as a decompressing reader if it is compressed, or mapped if it is large."""
+    compression = file_compression(path)
+    if compression is not None:
+        return cast(IO[bytes], stack.enter_context(open_decompressed(path, compression)))
+    if os.path.getsize(path) >= MMAP_THRESHOLD:
+        return cast(IO[bytes], stack.enter_context(MappedFile(path)))
+    return path
+
+
+def _undeclared_root(source: MappedFile, schema: xmlschema.XMLSchema) -> List[XMLSchemaValidationError]:
+    """Return the error for a mapped document whose root element the schema does not declare, found without parsing.
+
+    Documents with schema location hints are left to the parser, which may load further schemas from them.
+    """
+    prolog = scan_prolog(source.buffer[:PRESCAN_SIZE])
+    if prolog is None or prolog.schema_location is not None or prolog.root in schema.maps.elements:
+        return []
+    return [XMLSchemaValidationError(schema, Element(prolog.root), f"{prolog.root!r} is not an element of the schema")]
+
+
+def _open_fetched(document: FetchedDocument, options: ValidationOptions, stack: ExitStack) -> Union[str, IO[bytes]]:
+    """Return the source to validate a fetched document from, closed with the stack."""
+    if document.stream is None:
+        return document.content if document.from_url else _open_local(document.content, stack)
+    stream = stack.enter_context(document.stream)
+    if options.fail_fast and not options.stream:
+        # A lazy resource reads its source more than once, which a download cannot do
+        spool = stack.enter_context(tempfile.SpooledTemporaryFile(SPOOL_SIZE))
+        shutil.copyfileobj(stream, spool)
+        spool.seek(0)
+        return cast(IO[bytes], spool)
+    return stream
+
+
+def _head(source: Union[str, IO[bytes]], from_url: bool) -> bytes:
+    """Return the first bytes of a document to scan for its root element, without consuming them."""
+    if isinstance(source, MappedFile):
+        return source.buffer[:PRESCAN_SIZE].tobytes()
+    if isinstance(source, str):
+        if from_url:
+            return source[:PRESCAN_SIZE].encode("UTF-8")
+        with open(source, "rb") as f:
+            return f.read(PRESCAN_SIZE)
+    peek = getattr(source, "peek", None)
+    if peek is not None:
+        return peek(PRESCAN_SIZE)[:PRESCAN_SIZE]
+    start = source.tell()
+    head = source.read(PRESCAN_SIZE)
+    source.seek(start)
+    return head
+
+
+def _check_well_formed(source: Union[str, IO[bytes]], from_url: bool) -> bool:
+    """Parse a document without building a tree, so that a malformed document is rejected before validation.
+
+    Only documents that can be read again are checked: local files, mapped files and downloaded content.
+    Streams are left to the parser of the validation, which reports the same errors.
+
+    :returns: Whether the document was checked
+    :raises ParseError: With the line and column of the first error, if the document is not well-formed
+    """
+    # Namespace processing, as a prefix without a declaration is an error for the validation parser too
+    parser = expat.ParserCreate(namespace_separator="}")
+    try:
+        if isinstance(source, MappedFile):
+            parser.Parse(source.buffer, True)
+        elif isinstance(source, str) and from_url:
+            parser.Parse(source, True)
+        elif isinstance(source, str):
+            # Larger files are mapped
+            with open(source, "rb") as f:
+                parser.Parse(f.read(), True)
+        else:
+            return False
+    except expat.ExpatError as err:
+        error = ParseError(str(err))
+        error.code, error.position = err.code, (err.lineno, err.offset)
+        raise error
+    return True
+
+
+def _lxml_schema(schema: xmlschema.XMLSchema, options: ValidationOptions) -> Optional["etree.XMLSchema"]:
+    """Return the libxml2 schema validating documents in place of a schema, None to validate with xmlschema.
+
+    Streamed validation stays with xmlschema, as libxml2 builds the tree of the whole document first.
+    """
+    if options.engine == "xmlschema" or options.stream:
+        return None
+    return lxml_schema(schema)
+
+
+def _iter_errors(
+    xml_resp: Union[str, IO[bytes]], from_url: bool, schema: xmlschema.XMLSchema, options: ValidationOptions
+) -> Iterator[XMLSchemaValidationError]:
+    """Return an iterator over the validation errors of a document."""
+    if options.stream:
+        source = BytesIO(xml_resp.encode("UTF-8")) if isinstance(xml_resp, str) and from_url else xml_resp
+        return iter_record_errors(source, schema)
+    if options.fail_fast:
+        return schema.iter_errors(xmlschema.XMLResource(xml_resp, lazy=True))
+    # Built here rather than by the schema, to tell the time spent parsing from the time spent validating
+    with phase("parse"):
+        resource = xmlschema.XMLResource(
+            xml_resp, defuse=schema.defuse, timeout=schema.timeout, opener=schema.opener, iterparse=schema.iterparse
+        )
+    return schema.iter_errors(resource)
+
+
+def validate_fetched(
+    document: FetchedDocument,
+    schema: Union[xmlschema.XMLSchema, SchemaRegistry],
+    options: ValidationOptions = ValidationOptions(),
+) -> ValidationResult:
+    """Validate an already fetched XML document against a compiled schema.
+
+    :param document: Local file or downloaded content of the XML document
+    :param schema: Compiled schema to validate against, or a registry to choose it from by the root element
+    :param options: How to validate the document
+    :returns: Validation result, errors are reported in the result instead of raised
+    """
+    result = ValidationResult(document.source, Status.VALID, [], document.from_url, document.fetch_time)
+    times = PhaseTimes()
+    if document.phases is not None:
+        times.add(document.phases)
+    start = time.perf_counter()
+    try:
+        with recording(times), phase("validate"), ExitStack() as stack:
+            source = _open_fetched(document, options, stack)
+            if isinstance(schema, SchemaRegistry):
+                prolog = scan_prolog(_head(source, document.from_url))
+                path = schema.lookup(prolog)
+                result.schema = path.name if path is not None else None
+                with phase("schema"):
+                    schema = schema.schema_for(prolog)
+            compiled = _lxml_schema(schema, options)
+            # libxml2 checks well-formedness itself before validating, and the lazy and incremental parses of
+            # --fail-fast and --stream report syntax errors where they are, without reading the document twice
+            if compiled is None and not options.fail_fast and not options.stream:
+                checked = time.perf_counter()
+                try:
+                    with phase("check"):
+                        _check_well_formed(source, document.from_url)
+                finally:
+                    result.check_time = time.perf_counter() - checked
+            if isinstance(source, MappedFile) and (undeclared := _undeclared_root(source, schema)):
+                errors = [xmlschema_error(err) for err in undeclared]
+            elif compiled is not None:
+                errors = lxml_errors(compiled, source, document.from_url, options.max_errors)
+            else:
+                found = _iter_errors(source, document.from_url, schema, options)
+                errors = [xmlschema_error(err) for err in islice(found, options.max_errors)]
+                if isinstance(found, GeneratorType):
+                    # Stop a partly consumed lazy parse before its file is closed
+                    found.close()
+        if errors:
+            result.status, result.errors = Status.INVALID, errors
+    except ParseError as err:
+        result.status, result.errors = Status.MALFORMED, [str(err)]
+    except xmlschema.exceptions.XMLSchemaException as err:
+        result.status, result.errors = Status.ERROR, [str(err)]
+    except SchemaNotFound as err:
+        result.status, result.errors = Status.UNKNOWN, [str(err)]
+    except DECOMPRESSION_ERRORS as err:
+        result.status, result.errors = Status.UNAVAILABLE, [f"Error: {document.source} cannot be read: {err}\n"]
+    result.validate_time = time.perf_counter() - start - result.check_time
+    if options.timings:
+        result.phases = times
+    return result
+
+
+def validate_document(
+    xml_file: str, schema: Union[xmlschema.XMLSchema, SchemaRegistry], options: ValidationOptions = ValidationOptions()
+) -> ValidationResult:
+    """Validate an XML file or URL against a compiled schema.
+
+    HTTP(S) documents are streamed into the parser while they are downloaded. With the result cache
+    enabled, an unchanged local document gets its previous verdict without being parsed.
+
+    :param xml_file: Path or URL of the XML document, as given by the user
+    :param schema: Compiled schema to validate against, or a registry to choose it from by the root element
+    :param options: How to validate the document
+    :returns: Validation result, errors are reported in the result instead of raised
+    """
+    key = None
+    if options.result_cache:
+        from .result_cache import result_cache
+
+        start = time.perf_counter()
+        key = result_cache.key(xml_file, schema, options)
+        if key is not None and (cached := result_cache.load(key)) is not None:
+            status, schema_name, errors = cached
+            return ValidationResult(
+                xml_file,
+                Status(status),
+                errors,
+                validate_time=time.perf_counter() - start,
+                schema=schema_name,
+                cached=True,
+            )
+    try:
+        document = fetch_document(xml_file, stream=True)
+    except Exception as error:
+        return ValidationResult(xml_file, Status.UNAVAILABLE, [str(error)])
+    result = validate_fetched(document, schema, options)
+    if key is not None:
+        result_cache.save(key, result)
+    return result
@@ -0,0 +1,329 @@
+"""Re-validation of XML documents when they or the schemas they use change."""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+import xmlschema
+
+from .batch import expand_inputs
+from .registry import SchemaRegistry
+from .schema_cache import get_schema, local_schema_files
+from .validation import ValidationResult
+
+# Seconds without further changes before changed files are validated, so that a burst of writes
+# such as an editor saving through a temporary file is handled once
+DEBOUNCE = 0.2
+# Seconds between two scans of the watched files when inotify is not available
+POLL_INTERVAL = 0.5
+
+# inotify events of a directory: a file in it written and closed, created, moved, deleted, or the watch removed
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+# struct inotify_event, followed by its NUL padded file name
+_EVENT = struct.Struct("iIII")
+
+
+class InotifyWatcher:
+    """Changed files reported by the Linux kernel through inotify.
+
+    Directories are watched rather than files, so that a file replaced by renaming another one over
+    it, as many editors save, is still reported. Directories given to the watcher are watched
+    recursively, including subdirectories created later.
+    """
+
+    def __init__(self, paths: Iterable[str]) -> None:
+        """Start watching files and directories.
+
+        :raises OSError: If inotify is not available, or the limit of watches is reached
+        """
+        library = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._directories: Dict[int, str] = {}
+        self._trees: List[str] = []
+        try:
+            self.add(paths)
+        except OSError:
+            self.close()
+            raise
+
+    def add(self, paths: Iterable[str]) -> None:
+        """Watch more files and directories, directories recursively."""
+        for path in map(os.path.abspath, paths):
+            if os.path.isdir(path):
+                if not self._in_tree(path):
+                    self._trees.append(path)
+                    self._add_tree(path)
+            elif os.path.dirname(path) not in self._directories.values():
+                self._add(os.path.dirname(path))
+
+    def _add(self, directory: str) -> None:
+        """Watch the files of a directory."""
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), directory)
+        self._directories[wd] = directory
+
+    def _add_tree(self, directory: str) -> List[str]:
+        """Watch a directory and its subdirectories.
+
+        :returns: Files found in them
+        """
+        files: List[str] = []
+        for parent, _, names in os.walk(directory):
+            self._add(parent)
+            files.extend(os.path.join(parent, name) for name in names)
+        return files
+
+    def _in_tree(self, directory: str) -> bool:
+        """Return whether a directory is watched recursively."""
+        return any(directory == tree or directory.startswith(tree + os.sep) for tree in self._trees)
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """Wait for files to change.
+
+        :param timeout: Seconds to wait, None to wait until a file changes
+        :returns: Paths of the changed files, empty after the timeout
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            end = offset + length
+            name = os.fsdecode(data[offset:end].rstrip(b"\0"))
+            offset = end
+            if mask & _IN_IGNORED:
+                self._directories.pop(wd, None)
+                continue
+            directory = self._directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if not mask & _IN_ISDIR:
+                changed.add(path)
+            elif mask & (_IN_CREATE | _IN_MOVED_TO) and self._in_tree(directory):
+                # Files written before the new directory was watched would go unnoticed otherwise
+                changed.update(self._add_tree(path))
+        return changed
+
+    def close(self) -> None:
+        """Stop watching."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Changed files found by comparing their size and modification time at regular intervals."""
+
+    def __init__(self, paths: Iterable[str], interval: float = POLL_INTERVAL) -> None:
+        """Start watching files and directories, directories recursively.
+
+        :param interval: Seconds between two scans
+        """
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def add(self, paths: Iterable[str]) -> None:
+        """Watch more files and directories, directories recursively."""
+        added = [path for path in map(os.path.abspath, paths) if path not in self.paths]
+        if added:
+            self.paths.extend(added)
+            self._snapshot.update(PollingWatcher(added)._snapshot)
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Return the size and modification time of each watched file."""
+        files = {}
+        for path in self.paths:
+            names = [path]
+            if os.path.isdir(path):
+                names = [os.path.join(parent, name) for parent, _, entries in os.walk(path) for name in entries]
+            for name in names:
+                try:
+                    stat = os.stat(name)
+                except OSError:
+                    continue
+                files[name] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def wait(self, timeout: Optional[float]) -> Set[str]:
+        """Wait for files to change.
+
+        :param timeout: Seconds to wait, None to wait until a file changes
+        :returns: Paths of the changed, created or deleted files, empty after the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining <= 0:
+                return set()
+            time.sleep(remaining)
+
+    def close(self) -> None:
+        """Stop watching."""
+
+
+Watcher = Union[InotifyWatcher, PollingWatcher]
+
+
+def open_watcher(paths: Iterable[str], polling: bool = False) -> Watcher:
+    """Watch files and directories with inotify where available, by polling otherwise.
+
+    :param polling: Whether to poll even when inotify is available, as for network file systems
+    """
+    paths = list(paths)
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(paths)
+        except OSError:
+            # No inotify in this libc, or no watches left under fs.inotify.max_user_watches
+            pass
+    return PollingWatcher(paths)
+
+
+def debounced(watcher: Watcher, delay: float = DEBOUNCE) -> Iterator[Set[str]]:
+    """Yield the files changed in each burst of changes, once no file has changed for ``delay`` seconds."""
+    while True:
+        changed = watcher.wait(None)
+        while more := watcher.wait(delay):
+            changed |= more
+        if changed:
+            yield changed
+
+
+class WatchSession:
+    """XML documents validated again when they or the schemas they use change.
+
+    The compiled schema is kept from one validation to the next. When a schema file or a local
+    schema it imports or includes changes, the schema is compiled again and only the documents
+    depending on that file are validated again.
+    """
+
+    def __init__(
+        self,
+        inputs: List[str],
+        schema: Union[xmlschema.XMLSchema, SchemaRegistry],
+        schema_file: Optional[str],
+        validate: Callable[[List[str], Union[xmlschema.XMLSchema, SchemaRegistry]], Iterable[ValidationResult]],
+        persistent: bool = True,
+    ) -> None:
+        """Initialise a session, see :meth:`add` for the results of the first validation.
+
+        :param inputs: XML paths, globs, directories and manifests, as given by the user
+        :param schema: Compiled schema the documents are validated against, or a registry
+        :param schema_file: Local file of the compiled schema, None for a registry or a bundled schema
+        :param validate: Validates documents against a schema and returns their results
+        :param persistent: Whether compiled schemas may be loaded from and saved to the persistent store
+        """
+        self.inputs = inputs
+        self.schema = schema
+        self.schema_file = schema_file
+        self.validate = validate
+        self.persistent = persistent
+        self.results: Dict[str, ValidationResult] = {}
+        # Schema files each schema depends on, by file name of the schema in the registry
+        self._schema_files: Dict[Optional[str], Set[str]] = {}
+
+    def add(self, results: Iterable[ValidationResult]) -> None:
+        """Record the results of validating documents."""
+        for result in results:
+            self.results[result.source] = result
+
+    def _dependencies(self, document: str) -> Set[str]:
+        """Return the schema files the result of a document depends on."""
+        if self.schema_file is not None:
+            if None not in self._schema_files:
+                self._schema_files[None] = local_schema_files(self.schema_file)
+            return self._schema_files[None]
+        if not isinstance(self.schema, SchemaRegistry):
+            return set()
+        result = self.results.get(document)
+        name = result.schema if result is not None else None
+        if name not in self._schema_files:
+            if name is None:
+                # A document whose root element no schema declared may be declared by a new schema
+                self._schema_files[name] = {str(path) for path in self.schema.directory.glob("*.xsd")}
+            else:
+                self._schema_files[name] = local_schema_files(str(self.schema.directory / name))
+        return self._schema_files[name]
+
+    def paths(self) -> Set[str]:
+        """Return the files and directories to watch."""
+        paths = {os.path.abspath(document) for document in self.results}
+        for arg in self.inputs:
+            if arg.startswith("@"):
+                paths.add(os.path.abspath(arg[1:]))
+            elif os.path.isdir(arg):
+                paths.add(os.path.abspath(arg))
+        if isinstance(self.schema, SchemaRegistry):
+            paths.add(str(self.schema.directory))
+        for document in self.results:
+            paths.update(self._dependencies(document))
+        return paths
+
+    def update(self, changed: Set[str]) -> List[ValidationResult]:
+        """Validate the documents affected by changed files, compiling their schema again if it changed.
+
+        :param changed: Absolute paths of the changed files
+        :returns: Results of the documents validated again, and of documents added since the last update
+        :raises ElementTree.ParseError: If a changed schema is not well-formed
+        :raises xmlschema.XMLSchemaException: If a changed schema is not a valid schema
+        """
+        documents, _ = expand_inputs(self.inputs)
+        stale = set()
+        schemas = {os.path.realpath(path) for path in changed if path.endswith(".xsd")}
+        if schemas:
+            stale = {document for document in documents if self._dependencies(document) & schemas}
+            self._schema_files.clear()
+        if stale:
+            if isinstance(self.schema, SchemaRegistry):
+                self.schema = SchemaRegistry.load(self.schema.directory, self.persistent)
+            elif self.schema_file is not None:
+                self.schema = get_schema(self.schema_file, persistent=self.persistent)
+        affected = [
+            document
+            for document in documents
+            if document not in self.results or document in stale or os.path.abspath(document) in changed
+        ]
+        self.results = {document: self.results[document] for document in documents if document in self.results}
+        if not affected:
+            return []
+        results = list(self.validate(affected, self.schema))
+        self.add(results)
+        return results